@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+'''
+A benchmark harness of TADEK tools using an in-process fake device, which
+serves synthetic accessible trees, instead of a real one.
+
+Results are saved to a JSON file, and results of a previous version can be
+compared with current ones, e.g.:
+
+    $ python benchmarks/benchmark.py --output new.json --compare old.json
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+from tadek.core import config
+from tadek.core import accessible
+from tadek.engine.testexec import STATUS_PASSED
+
+import explore
+import history
+import schedule
+from tree import walkAccessibles
+from dumpfile import DumpWriter
+from nodetable import NodeTable
+from fakedevice import FakeDevice
+
+#: Registered benchmarks, pairs of names and functions
+BENCHMARKS = []
+
+def benchmark(name):
+    '''
+    Returns a decorator registering a benchmark of the given name.
+
+    A benchmark function takes options of the harness and a temporary
+    directory, prepares data and returns a function to measure.
+    '''
+    def decorator(function):
+        BENCHMARKS.append((name, function))
+        return function
+    return decorator
+
+def _quiet(function, *args):
+    '''
+    Calls the given function with its standard output discarded, ignoring
+    its exit.
+    '''
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        try:
+            function(*args)
+        except SystemExit:
+            pass
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+def _device(opts, latency=None):
+    return FakeDevice(fanout=opts.fanout, depth=opts.depth,
+                      latency=opts.latency if latency is None else latency)
+
+def _tree(opts):
+    return _device(opts, 0.0).getAccessible(accessible.Path(), -1)
+
+def _dumpRequest(opts, **options):
+    device = _device(opts)
+    options.update({"path": '/', "dump-all": True})
+    return lambda: _quiet(explore.performRequest, device, dict(options))
+
+@benchmark("dump")
+def benchDump(opts, tmpdir):
+    return _dumpRequest(opts)
+
+@benchmark("dump-stream")
+def benchDumpStream(opts, tmpdir):
+    return _dumpRequest(opts, stream=True)
+
+@benchmark("dump-parallel")
+def benchDumpParallel(opts, tmpdir):
+    return _dumpRequest(opts, parallel=4)
+
+@benchmark("render")
+def benchRender(opts, tmpdir):
+    tree = _tree(opts)
+    return lambda: _quiet(explore.printAccessibleTree, tree)
+
+@benchmark("save")
+def benchSave(opts, tmpdir):
+    tree = _tree(opts)
+    fn = os.path.join(tmpdir, "dump.xml")
+    return lambda: DumpWriter(fn).write(walkAccessibles(tree))
+
+@benchmark("save-gz")
+def benchSaveCompressed(opts, tmpdir):
+    tree = _tree(opts)
+    fn = os.path.join(tmpdir, "dump.xml.gz")
+    return lambda: DumpWriter(fn).write(walkAccessibles(tree))
+
+@benchmark("table")
+def benchTable(opts, tmpdir):
+    tree = _tree(opts)
+    return lambda: NodeTable().load(tree)
+
+@benchmark("render-table")
+def benchRenderTable(opts, tmpdir):
+    view = NodeTable().load(_tree(opts))
+    return lambda: _quiet(explore.printAccessibleTree, view)
+
+@benchmark("save-table")
+def benchSaveTable(opts, tmpdir):
+    view = NodeTable(elements=True).load(_tree(opts))
+    fn = os.path.join(tmpdir, "dump.xml")
+    return lambda: DumpWriter(fn).write(walkAccessibles(view))
+
+class _Suite(object):
+    '''
+    A class of synthetic test suites.
+    '''
+    def __init__(self, id, count):
+        self.id = id
+        self._count = count
+
+    def count(self):
+        return self._count
+
+def _suites(opts):
+    return [_Suite("app.module%d.Suite%d" % (i / 10, i), 1 + i % 7)
+            for i in xrange(opts.suites)]
+
+@benchmark("schedule")
+def benchSchedule(opts, tmpdir):
+    suites = _suites(opts)
+    devices = [_device(opts) for i in xrange(opts.devices)]
+    return lambda: schedule.splitSuites(suites, devices)
+
+@benchmark("schedule-history")
+def benchScheduleHistory(opts, tmpdir):
+    suites = _suites(opts)
+    devices = [_device(opts) for i in xrange(opts.devices)]
+    store = history.ResultHistory(os.path.join(tmpdir, "history.db"))
+    for run in xrange(history.RECENT_RUNS):
+        runId = store.startRun()
+        for i, suite in enumerate(suites):
+            for case in xrange(suite.count()):
+                store.addResult(runId, "%s.case%d" % (suite.id, case), "fake",
+                                history.STATUSES_FAILED[0] if (i + run) % 5
+                                else STATUS_PASSED, 0.1 * (i % 13))
+    def run():
+        schedule.splitSuites(suites, devices, store)
+        schedule.orderSuites(suites, store)
+    return run
+
+def measure(function, repeat):
+    '''
+    Calls the given function the given number of times.
+
+    :return: A dictionary of the minimum, mean and maximum times in seconds
+    :rtype: dictionary
+    '''
+    times = []
+    for i in xrange(repeat):
+        started = time.time()
+        function()
+        times.append(time.time() - started)
+    return {"min": min(times), "mean": sum(times) / len(times),
+            "max": max(times), "runs": repeat}
+
+def compare(results, fn):
+    '''
+    Prints changes of minimum times of results against ones of the given file.
+    '''
+    fd = open(fn)
+    try:
+        previous = json.load(fd)
+    finally:
+        fd.close()
+    print '\n' + (" COMPARED TO %s " % fn).center(80, '-')
+    for name in sorted(results):
+        old = previous["results"].get(name)
+        if old is None:
+            print "%-24s%12s" % (name, "new")
+            continue
+        change = (results[name]["min"] - old["min"]) * 100.0 / old["min"]
+        print "%-24s%12.3fs%12.3fs%+11.1f%%" % (name, old["min"],
+                                               results[name]["min"], change)
+
+if __name__ == "__main__":
+    parser = optparse.OptionParser(usage="%prog [OPTION]... [BENCHMARK]...",
+                                   description="Runs benchmarks of TADEK tools "
+                                   "using a fake device. Benchmarks: %s"
+                                   % ", ".join([name for name, function
+                                                in BENCHMARKS]))
+    parser.add_option("--fanout", type="int", default=5,
+                      help="Number of children of tree nodes, 5 by default")
+    parser.add_option("--depth", type="int", default=4,
+                      help="Depth of trees, 4 by default")
+    parser.add_option("--latency", type="float", default=0.001,
+                      help="Simulated latency of requests in seconds, "
+                           "0.001 by default")
+    parser.add_option("--suites", type="int", default=1000,
+                      help="Number of test suites to schedule, 1000 by default")
+    parser.add_option("--devices", type="int", default=8,
+                      help="Number of devices to schedule on, 8 by default")
+    parser.add_option("-r", "--repeat", type="int", default=5,
+                      help="Number of measured runs of benchmarks, "
+                           "5 by default")
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="Save results to the given JSON file")
+    parser.add_option("-c", "--compare", metavar="FILE",
+                      help="Compare results with ones of the given JSON file")
+    opts, args = parser.parse_args()
+    names = [name for name, function in BENCHMARKS]
+    for name in args:
+        if name not in names:
+            parser.error("unknown benchmark: %s" % name)
+
+    tmpdir = tempfile.mkdtemp(prefix="tadek-benchmark-")
+    results = {}
+    print "%-24s%12s%12s%12s" % ("BENCHMARK", "MIN", "MEAN", "MAX")
+    try:
+        for name, function in BENCHMARKS:
+            if args and name not in args:
+                continue
+            results[name] = measure(function(opts, tmpdir), opts.repeat)
+            print "%-24s%11.3fs%11.3fs%11.3fs" % (name, results[name]["min"],
+                                                  results[name]["mean"],
+                                                  results[name]["max"])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if opts.output:
+        fd = open(opts.output, 'w')
+        try:
+            json.dump({"version": config.VERSION,
+                       "python": platform.python_version(),
+                       "time": time.time(),
+                       "parameters": {"fanout": opts.fanout,
+                                      "depth": opts.depth,
+                                      "latency": opts.latency,
+                                      "suites": opts.suites,
+                                      "devices": opts.devices},
+                       "results": results}, fd, indent=4, sort_keys=True)
+        finally:
+            fd.close()
+        print "Results saved to %s" % opts.output
+    if opts.compare:
+        compare(results, opts.compare)
@@ -0,0 +1,156 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import time
+import threading
+
+from tadek.core import accessible
+
+__all__ = ["FakeDevice"]
+
+#: Roles of synthetic accessibles with and without children
+BRANCH_ROLE = "PANEL"
+LEAF_ROLE = "PUSH_BUTTON"
+
+class _FakeAccessible(accessible.Accessible):
+    '''
+    A class of synthetic accessibles holding their children in memory.
+    '''
+    def children(self, force=False):
+        return iter(self._fakeChildren)
+
+
+class FakeDevice(object):
+    '''
+    An in-process stand-in for tadek.connection.device.Device serving
+    a synthetic accessible tree of the given depth and fan-out, in which
+    every request is delayed by the given latency.
+    '''
+    def __init__(self, name="fake", fanout=5, depth=4, latency=0.0):
+        '''
+        :param fanout: A number of children of every non-leaf accessible
+        :type fanout: integer
+        :param depth: A depth of the tree, the root has depth 0
+        :type depth: integer
+        :param latency: Simulated latency of a request in seconds
+        :type latency: float
+        '''
+        self.name = name
+        self.address = ("127.0.0.1", 0)
+        self.fanout = fanout
+        self.depth = depth
+        self.latency = latency
+        self._connected = False
+        self._lock = threading.Lock()
+        #: A number of requests sent to the device
+        self.requests = 0
+
+    def __str__(self):
+        return self.name
+
+    def size(self):
+        '''
+        Returns a number of accessibles in the whole tree.
+
+        :rtype: integer
+        '''
+        return sum([self.fanout ** level for level in xrange(self.depth + 1)])
+
+    def _request(self):
+        self._lock.acquire()
+        try:
+            self.requests += 1
+        finally:
+            self._lock.release()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _accessible(self, indexes, depth):
+        '''
+        Creates an accessible of the given path with descendants down to
+        the given depth, all descendants if it is negative.
+        '''
+        count = self.fanout if len(indexes) < self.depth else 0
+        states = ["ENABLED", "SHOWING", "VISIBLE"]
+        if indexes and indexes[-1] == 0:
+            states.append("FOCUSABLE")
+        name = "node-" + '-'.join([str(index) for index in indexes])
+        obj = _FakeAccessible(accessible.Path(*[str(index)
+                                                for index in indexes]),
+                              name=name, description="Synthetic %s" % name,
+                              role=BRANCH_ROLE if count else LEAF_ROLE,
+                              count=count, states=states)
+        obj._fakeChildren = []
+        if depth != 0:
+            for index in xrange(count):
+                obj._fakeChildren.append(self._accessible(indexes + [index],
+                                                          depth - 1))
+        return obj
+
+    def connect(self):
+        self._request()
+        self._connected = True
+
+    def disconnect(self):
+        self._request()
+        self._connected = False
+
+    def isConnected(self):
+        return self._connected
+
+    def getAccessible(self, path, depth=0, **attrs):
+        self._request()
+        indexes = [int(index) for index in str(path).split('/')[1:] if index]
+        if len(indexes) > self.depth or [index for index in indexes
+                                         if index >= self.fanout]:
+            return None
+        return self._accessible(indexes, depth)
+
+    def setAccessible(self, path, **attrs):
+        self._request()
+        return True
+
+    def doAccessible(self, path, action):
+        self._request()
+        return True
+
+    def mouseEvent(self, path, x, y, button, event):
+        self._request()
+        return True
+
+    def keyboardEvent(self, path, keycode, modifiers=()):
+        self._request()
+        return True
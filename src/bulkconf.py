@@ -0,0 +1,559 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shlex
+import marshal
+import sqlite3
+import ConfigParser
+from cStringIO import StringIO
+from collections import OrderedDict
+
+from tadek.core import log
+from tadek.core import config
+
+__all__ = ["SettingsCache", "SettingsTransaction", "parseSettings",
+           "loadSettings", "readOperations", "performOperations"]
+
+#: A directory of user configuration files of TADEK programs
+CONFIG_DIR = os.path.join(os.path.expanduser('~'), ".tadek", "config")
+
+#: A name of the directory of settings common for all programs
+COMMON = "common"
+
+#: An extension of configuration files
+CONF_EXTENSION = ".conf"
+
+#: A default file of the cache of parsed configuration files
+CACHE_FILE = os.path.join(os.path.expanduser('~'), ".tadek",
+                          "tadek-conf", "cache.db")
+
+#: A name of the journal of a commit in a directory of configuration files
+JOURNAL_NAME = ".tadek-conf.journal"
+
+#: Operations and minimum and maximum numbers of their arguments
+OPERATIONS = {
+    "get": (0, 3),
+    "set": (2, 4),
+    "remove": (1, 3),
+}
+
+# An extension of temporary files replacing configuration files
+_TMP_EXTENSION = ".tmp"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, stamp TEXT, "
+        "data BLOB)",
+)
+
+def _stamp(fn):
+    '''
+    Returns a stamp identifying the current version of the given file.
+    '''
+    stat = os.stat(fn)
+    return "%d:%r:%d" % (stat.st_size, stat.st_mtime, stat.st_ino)
+
+def _settingsDir(program=None, dir=None):
+    '''
+    Returns a directory of user configuration files of the given program,
+    or of settings common for all programs.
+    '''
+    return os.path.join(dir or CONFIG_DIR, program or COMMON)
+
+def parseSettings(fn):
+    '''
+    Parses the given configuration file. Options of the DEFAULT section
+    are returned as the section of their own and are not copied to other
+    sections.
+
+    :param fn: A name of the configuration file
+    :type fn: string
+    :return: A list of pairs of names of sections and lists of pairs of names
+        and values of their options
+    :rtype: list
+    '''
+    log.debug("Parse configuration file: %s" % fn)
+    parser = ConfigParser.RawConfigParser()
+    fd = open(fn)
+    try:
+        parser.readfp(fd)
+    finally:
+        fd.close()
+    data = []
+    if parser.defaults():
+        data.append((ConfigParser.DEFAULTSECT, parser.defaults().items()))
+    # Both items() and options() of the parser merge options of the DEFAULT
+    # section into each section, so options are taken from sections as
+    # they are in the file
+    for section in parser.sections():
+        data.append((section, [(option, value) for option, value
+                               in parser._sections[section].iteritems()
+                               if option != "__name__"]))
+    return data
+
+def _writeFile(fn, content):
+    '''
+    Writes the given content to the given file and flushes it to a disk.
+    '''
+    fd = open(fn, 'w')
+    try:
+        fd.write(content)
+        fd.flush()
+        os.fsync(fd.fileno())
+    finally:
+        fd.close()
+
+def _readFile(fn):
+    '''
+    Returns a content of the given file, or None if it does not exist.
+    '''
+    if not os.path.isfile(fn):
+        return None
+    fd = open(fn)
+    try:
+        return fd.read()
+    finally:
+        fd.close()
+
+def _writeSettings(fn, data):
+    '''
+    Writes the given parsed settings to a temporary file next to the given
+    configuration file.
+
+    :return: A name of the temporary file
+    :rtype: string
+    '''
+    parser = ConfigParser.RawConfigParser()
+    for section, options in data:
+        if section != ConfigParser.DEFAULTSECT:
+            parser.add_section(section)
+        for option, value in options:
+            parser.set(section, option, value)
+    content = StringIO()
+    parser.write(content)
+    tmpFn = fn + _TMP_EXTENSION
+    _writeFile(tmpFn, content.getvalue())
+    return tmpFn
+
+def _recover(dir):
+    '''
+    Restores configuration files of the given directory from the journal
+    of a commit which has not been completed, if there is one.
+
+    :return: True if files were restored, False otherwise
+    :rtype: boolean
+    '''
+    journal = os.path.join(dir, JOURNAL_NAME)
+    if os.path.exists(journal + _TMP_EXTENSION):
+        # The journal was not completed, so no file was replaced yet
+        os.remove(journal + _TMP_EXTENSION)
+    content = _readFile(journal)
+    if content is None:
+        return False
+    log.warning("Restoring configuration files of an interrupted commit: %s"
+                % dir)
+    for fn, original in marshal.loads(content):
+        tmpFn = fn + _TMP_EXTENSION
+        if original is None:
+            if os.path.exists(fn):
+                os.remove(fn)
+            if os.path.exists(tmpFn):
+                os.remove(tmpFn)
+        else:
+            _writeFile(tmpFn, original)
+            os.rename(tmpFn, fn)
+    os.remove(journal)
+    return True
+
+
+class SettingsCache(object):
+    '''
+    A class of a persistent cache of parsed configuration files.
+
+    A file is parsed again only if its size, modification time or inode
+    changed since it was cached.
+    '''
+    def __init__(self, fn=None):
+        '''
+        :param fn: A name of the cache file, CACHE_FILE by default
+        :type fn: string
+        '''
+        self.fn = fn or CACHE_FILE
+        dirname = os.path.dirname(self.fn)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._db = sqlite3.connect(self.fn)
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        #: A number of files parsed because they were not cached
+        self.parsed = 0
+
+    def close(self):
+        '''
+        Closes the cache.
+        '''
+        self._db.close()
+
+    def load(self, fn):
+        '''
+        Returns parsed settings of the given configuration file, parsing
+        it only if it is not cached or it changed.
+
+        :param fn: A name of the configuration file
+        :type fn: string
+        :return: Parsed settings like parseSettings() returns
+        :rtype: list
+        '''
+        fn = os.path.abspath(fn)
+        stamp = _stamp(fn)
+        row = self._db.execute("SELECT stamp, data FROM files WHERE path=?",
+                               (fn,)).fetchone()
+        if row is not None and row[0] == stamp:
+            return marshal.loads(str(row[1]))
+        data = parseSettings(fn)
+        self.parsed += 1
+        self._store(fn, stamp, data)
+        return data
+
+    def _store(self, fn, stamp, data):
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                         (fn, stamp, sqlite3.Binary(marshal.dumps(data))))
+        self._db.commit()
+
+    def store(self, fn, data):
+        '''
+        Stores the given parsed settings of the given configuration file
+        which has just been written.
+        '''
+        fn = os.path.abspath(fn)
+        self._store(fn, _stamp(fn), data)
+
+    def discard(self, fn):
+        '''
+        Removes the given configuration file from the cache.
+        '''
+        self._db.execute("DELETE FROM files WHERE path=?",
+                         (os.path.abspath(fn),))
+        self._db.commit()
+
+
+def loadSettings(name, program=None, cache=None, dir=None):
+    '''
+    Reads user settings of the given name of the given program through
+    the cache of parsed configuration files. Settings common for all
+    programs are read if the program has no such file, like TADEK programs
+    do. Options of the DEFAULT section are merged into other sections.
+
+    :param name: A name of the settings file
+    :type name: string
+    :param program: A name of the program, the current one by default
+    :type program: string
+    :param cache: A cache of parsed configuration files, the default one
+        is used if not given
+    :type cache: SettingsCache
+    :param dir: A directory of configuration files of programs, CONFIG_DIR
+        by default
+    :type dir: string
+    :return: A dictionary of sections and dictionaries of their options,
+        or None if there is no such file or it cannot be read
+    :rtype: dictionary
+    '''
+    log.debug("Load settings file '%s' of program: %s" % (name, program))
+    if program is None:
+        program = config.getProgramName()
+    for fn in [os.path.join(_settingsDir(dirProgram, dir),
+                            name + CONF_EXTENSION)
+               for dirProgram in (program, COMMON)]:
+        if os.path.isfile(fn):
+            break
+    else:
+        return None
+    ownCache = cache is None
+    try:
+        if ownCache:
+            cache = SettingsCache()
+        try:
+            data = cache.load(fn)
+        finally:
+            if ownCache:
+                cache.close()
+    except (EnvironmentError, sqlite3.Error, ConfigParser.Error), err:
+        log.warning("Failed to read settings file '%s': %s" % (fn, err))
+        return None
+    sections = dict(data)
+    defaults = sections.pop(ConfigParser.DEFAULTSECT, ())
+    settings = {}
+    for section, options in sections.iteritems():
+        settings[section] = dict(defaults)
+        settings[section].update(options)
+    return settings
+
+
+class SettingsTransaction(object):
+    '''
+    A class of transactions changing user configuration files of a program.
+
+    Files are read once and changed in memory. Options of the DEFAULT
+    section are kept in it, so they are never copied to other sections.
+    Changed files are written on commit, each one once: to a temporary
+    file first and then renamed into place. Original files are kept in
+    a journal until all files are replaced, so files of a commit which
+    failed or was interrupted are restored, the latter by the next
+    transaction of the same program.
+    '''
+    def __init__(self, program=None, cache=None, dir=None):
+        '''
+        :param program: A name of the program, settings common for all
+            programs are changed by default
+        :type program: string
+        :param cache: A cache of parsed configuration files
+        :type cache: SettingsCache
+        :param dir: A directory of configuration files of programs,
+            CONFIG_DIR by default
+        :type dir: string
+        '''
+        self.dir = _settingsDir(program, dir)
+        self.cache = cache
+        # Settings of files by their names, None if a file does not exist
+        self._files = {}
+        self._changed = set()
+        _recover(self.dir)
+
+    def _fileName(self, name):
+        return os.path.join(self.dir, name + CONF_EXTENSION)
+
+    def _load(self, name):
+        '''
+        Returns settings of the given file as a dictionary of sections, or
+        None if the file does not exist.
+        '''
+        if name not in self._files:
+            fn = self._fileName(name)
+            if not os.path.isfile(fn):
+                data = None
+            elif self.cache is not None:
+                data = self.cache.load(fn)
+            else:
+                data = parseSettings(fn)
+            if data is not None:
+                data = OrderedDict([(section, OrderedDict(options))
+                                    for section, options in data])
+            self._files[name] = data
+        return self._files[name]
+
+    def _items(self, name):
+        '''
+        Returns settings of the given file like parseSettings() returns.
+        '''
+        return [(section, options.items())
+                for section, options in self._files[name].iteritems()]
+
+    def get(self, name=None, section=None, option=None):
+        '''
+        Returns a sorted list of names of files, sections of the given file
+        or options of the given section, or a value of the given option.
+
+        :return: The list or the value, or None if there is no such file,
+            section or option
+        :rtype: list or string
+        '''
+        if name is None:
+            names = set([fn[:-len(CONF_EXTENSION)]
+                         for fn in (os.listdir(self.dir)
+                                    if os.path.isdir(self.dir) else ())
+                         if fn.endswith(CONF_EXTENSION)])
+            names.update(self._files)
+            return sorted([name for name in names
+                           if self._load(name) is not None])
+        data = self._load(name)
+        if data is None or section is None:
+            return data and sorted(data)
+        options = data.get(section)
+        if options is None or option is None:
+            return options and sorted(options)
+        return options.get(option)
+
+    def set(self, name, section, option=None, value=None):
+        '''
+        Sets a value of the given option, creating the file, the section
+        and the option if they do not exist.
+        '''
+        data = self._load(name)
+        if data is None:
+            data = self._files[name] = OrderedDict()
+        options = data.setdefault(section, OrderedDict())
+        if option is not None:
+            options[option] = value if value is not None else ''
+        self._changed.add(name)
+
+    def remove(self, name, section=None, option=None):
+        '''
+        Removes the given file, section or option.
+
+        :return: True if it existed, False otherwise
+        :rtype: boolean
+        '''
+        data = self._load(name)
+        if data is None:
+            return False
+        if section is None:
+            self._files[name] = None
+        elif option is None:
+            if data.pop(section, None) is None:
+                return False
+        elif option not in data.get(section, {}):
+            return False
+        else:
+            del data[section][option]
+        self._changed.add(name)
+        return True
+
+    def commit(self):
+        '''
+        Writes changed files.
+        '''
+        log.debug("Commit changes of configuration files: %s"
+                  % ", ".join(sorted(self._changed)))
+        if not os.path.isdir(self.dir):
+            os.makedirs(self.dir)
+        changes = []
+        try:
+            for name in sorted(self._changed):
+                fn, tmpFn = self._fileName(name), None
+                if self._files[name] is not None:
+                    tmpFn = _writeSettings(fn, self._items(name))
+                changes.append((name, fn, tmpFn, _readFile(fn)))
+            journal = os.path.join(self.dir, JOURNAL_NAME)
+            _writeFile(journal + _TMP_EXTENSION,
+                       marshal.dumps([(fn, original) for name, fn, tmpFn,
+                                      original in changes]))
+            # Files are replaced only once the journal is complete
+            os.rename(journal + _TMP_EXTENSION, journal)
+        except:
+            for name, fn, tmpFn, original in changes:
+                if tmpFn is not None:
+                    os.remove(tmpFn)
+            raise
+        try:
+            for name, fn, tmpFn, original in changes:
+                if tmpFn is not None:
+                    os.rename(tmpFn, fn)
+                elif original is not None:
+                    os.remove(fn)
+        except:
+            log.error("Failed to replace configuration files, "
+                      "restoring replaced ones")
+            _recover(self.dir)
+            raise
+        os.remove(journal)
+        if self.cache is not None:
+            try:
+                for name, fn, tmpFn, original in changes:
+                    if tmpFn is not None:
+                        self.cache.store(fn, self._items(name))
+                    else:
+                        self.cache.discard(fn)
+            except sqlite3.Error, err:
+                log.warning("Failed to update settings cache: %s" % err)
+        log.info("Written %d configuration files" % len(changes))
+        self._changed.clear()
+
+
+def readOperations(fn):
+    '''
+    Reads operations from the given file, or the standard input if it is
+    '-'. Each line of the file is an operation followed by its arguments,
+    like options of tadek-conf: 'get [FILE [SECTION [OPTION]]]',
+    'set FILE SECTION [OPTION [VALUE]]' or 'remove FILE [SECTION [OPTION]]'.
+    Empty lines and lines starting with '#' are skipped.
+
+    :return: A list of tuples of a number of a line, an operation and a list
+        of its arguments
+    :rtype: list
+    :raise ValueError: If any of operations is invalid
+    '''
+    operations = []
+    fd = sys.stdin if fn == '-' else open(fn)
+    try:
+        for n, line in enumerate(iter(fd.readline, '')):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            args = shlex.split(line)
+            operation, args = args[0], args[1:]
+            if operation not in OPERATIONS:
+                raise ValueError("Invalid operation in line %d: %s"
+                                 % (n + 1, operation))
+            minimum, maximum = OPERATIONS[operation]
+            if not minimum <= len(args) <= maximum:
+                raise ValueError("Invalid number of arguments of '%s' "
+                                 "operation in line %d" % (operation, n + 1))
+            operations.append((n + 1, operation, args))
+    finally:
+        if fd is not sys.stdin:
+            fd.close()
+    return operations
+
+def performOperations(transaction, operations):
+    '''
+    Performs the given operations in the given transaction and prints
+    results of 'get' operations. Changes are not committed.
+
+    :param transaction: A transaction to perform the operations in
+    :type transaction: SettingsTransaction
+    :param operations: Operations returned by readOperations()
+    :type operations: list
+    :raise ValueError: If a path of a 'get' operation does not exist
+    '''
+    for n, operation, args in operations:
+        log.info("Perform operation in line %d: %s %s"
+                 % (n, operation, ' '.join(args)))
+        if operation == "set":
+            transaction.set(*args)
+        elif operation == "remove":
+            transaction.remove(*args)
+        else:
+            value = transaction.get(*args)
+            if value is None:
+                raise ValueError("Path does not exist in line %d: /%s"
+                                 % (n, '/'.join(args)))
+            if isinstance(value, list):
+                for item in value:
+                    print " /%s" % '/'.join(args + [item])
+            else:
+                print " /%s: %s" % ('/'.join(args), value)
@@ -0,0 +1,308 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import ast
+import sqlite3
+import hashlib
+
+from tadek import testcases
+from tadek.core import log
+
+from history import testFilter, testArgs
+
+__all__ = ["TestIndex", "testRoots"]
+
+#: A default file of the index of test cases
+INDEX_FILE = os.path.join(os.path.expanduser('~'), ".tadek",
+                          "tadek-runner", "discovery.db")
+
+#: Names of base classes of test suites
+SUITE_CLASSES = ("TestSuite",)
+
+#: Names of classes of test cases
+CASE_CLASSES = ("TestCase",)
+
+#: Kinds of indexed tests
+KIND_MODULE = "module"
+KIND_SUITE = "suite"
+KIND_CASE = "case"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, "
+        "mtime REAL, size INTEGER, hash TEXT)",
+    "CREATE TABLE IF NOT EXISTS tests (name TEXT, module TEXT, kind TEXT, "
+        "path TEXT)",
+    "CREATE INDEX IF NOT EXISTS tests_name ON tests (name)",
+    "CREATE INDEX IF NOT EXISTS tests_path ON tests (path)",
+)
+
+def _baseName(node):
+    '''
+    Returns a name of a class or a function referred by the given node.
+    '''
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+def _parseSuite(node, suites):
+    '''
+    Returns names, relative to the given test suite class, and kinds of its
+    test cases and nested test suites, including ones inherited from test
+    suites defined in the same module.
+    '''
+    tests = []
+    for base in node.bases:
+        for name, kind in suites.get(_baseName(base), ()):
+            if (name, kind) not in tests:
+                tests.append((name, kind))
+    for child in node.body:
+        if isinstance(child, ast.ClassDef):
+            if [base for base in child.bases if _baseName(base) in suites]:
+                tests.append((child.name, KIND_SUITE))
+                tests.extend([(child.name + '.' + name, kind) for name, kind
+                              in _parseSuite(child, suites)])
+        elif (isinstance(child, ast.Assign) and
+              isinstance(child.value, ast.Call) and
+              _baseName(child.value.func) in CASE_CLASSES):
+            for target in child.targets:
+                if isinstance(target, ast.Name):
+                    tests.append((target.id, KIND_CASE))
+    return tests
+
+def parseModule(source, module):
+    '''
+    Finds test suites and test cases defined in the given source code of
+    a module without importing it.
+
+    :param source: A source code of the module
+    :type source: string
+    :param module: A name of the module
+    :type module: string
+    :return: A list of pairs of names and kinds of tests, empty if the module
+        defines no tests
+    :rtype: list
+    '''
+    tests = []
+    # Subclasses of suites defined in the module are suites as well
+    suites = dict([(name, ()) for name in SUITE_CLASSES])
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        if [base for base in node.bases if _baseName(base) in suites]:
+            suites[node.name] = _parseSuite(node, suites)
+            name = module + '.' + node.name
+            tests.append((name, KIND_SUITE))
+            tests.extend([(name + '.' + child, kind)
+                          for child, kind in suites[node.name]])
+    if tests:
+        tests.insert(0, (module, KIND_MODULE))
+    return tests
+
+def testRoots(locations):
+    '''
+    Returns directories of test cases of the given locations and of the
+    default location.
+
+    :param locations: Paths to locations of test cases
+    :type locations: list
+    :return: A list of directories of test cases
+    :rtype: list
+    '''
+    roots = []
+    for path in list(locations) + list(testcases.__path__):
+        if os.path.isdir(os.path.join(path, "testcases")):
+            path = os.path.join(path, "testcases")
+        path = os.path.abspath(path)
+        if path not in roots:
+            roots.append(path)
+    return roots
+
+def _moduleFiles(root):
+    '''
+    Yields paths of Python files under the given directory of test cases
+    along with names of their modules.
+    '''
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        package = os.path.relpath(dirpath, root).replace(os.sep, '.')
+        package = '' if package == '.' else package
+        for filename in sorted(filenames):
+            if not filename.endswith(".py"):
+                continue
+            if filename == "__init__.py":
+                module = package
+            else:
+                module = '.'.join([name for name in (package, filename[:-3])
+                                   if name])
+            if module:
+                yield os.path.join(dirpath, filename), module
+
+
+class TestIndex(object):
+    '''
+    A class of a persistent index of test suites and test cases found in
+    modules of locations of test cases.
+
+    Modules are parsed, not imported. A module is parsed again only if its
+    modification time or size changed and its hash is different.
+    '''
+    def __init__(self, fn=INDEX_FILE):
+        '''
+        :param fn: A name of the index file
+        :type fn: string
+        '''
+        self.fn = fn
+        dirname = os.path.dirname(fn)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._db = sqlite3.connect(fn)
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def close(self):
+        '''
+        Closes the index.
+        '''
+        self._db.close()
+
+    def update(self, roots):
+        '''
+        Updates the index with modules of the given directories of test cases.
+
+        :param roots: Directories of test cases
+        :type roots: list
+        :return: A number of parsed modules
+        :rtype: integer
+        '''
+        log.debug("Update index of test cases: %s" % ", ".join(roots))
+        files = dict([(row[0], row[1:]) for row in
+                      self._db.execute("SELECT path, mtime, size, hash "
+                                       "FROM files").fetchall()])
+        seen = set()
+        parsed = 0
+        for root in roots:
+            for path, module in _moduleFiles(root):
+                if path in seen:
+                    continue
+                seen.add(path)
+                stat = os.stat(path)
+                known = files.get(path)
+                if known and known[:2] == (stat.st_mtime, stat.st_size):
+                    continue
+                fd = open(path, 'rb')
+                try:
+                    source = fd.read()
+                finally:
+                    fd.close()
+                digest = hashlib.sha1(source).hexdigest()
+                self._db.execute("INSERT OR REPLACE INTO files VALUES "
+                                 "(?, ?, ?, ?)", (path, stat.st_mtime,
+                                                  stat.st_size, digest))
+                if known and known[2] == digest:
+                    continue
+                parsed += 1
+                try:
+                    tests = parseModule(source, module)
+                except SyntaxError, err:
+                    # Such a module is imported in order to report the error
+                    log.warning("Failed to parse '%s' module: %s"
+                                % (module, err))
+                    tests = [(module, KIND_MODULE)]
+                self._db.execute("DELETE FROM tests WHERE path=?", (path,))
+                self._db.executemany("INSERT INTO tests VALUES (?, ?, ?, ?)",
+                                     [(name, module, kind, path)
+                                      for name, kind in tests])
+        for path in set(files) - seen:
+            self._db.execute("DELETE FROM files WHERE path=?", (path,))
+            self._db.execute("DELETE FROM tests WHERE path=?", (path,))
+        self._db.commit()
+        log.info("Parsed %d modules of test cases" % parsed)
+        return parsed
+
+    def tests(self, names=(), kind=None):
+        '''
+        Returns names of indexed tests which are or belong to the given ones,
+        all tests if no names are given.
+
+        :param names: Names of tests, modules or packages
+        :type names: list
+        :param kind: A kind of tests to return, all kinds by default
+        :type kind: string
+        :return: A sorted list of pairs of names and kinds of tests
+        :rtype: list
+        '''
+        conditions, args = [], []
+        if names:
+            conditions.append("(%s)" % " OR ".join([testFilter("name")]
+                                                   * len(names)))
+            for name in names:
+                args.extend(testArgs(name))
+        if kind:
+            conditions.append("kind=?")
+            args.append(kind)
+        query = "SELECT DISTINCT name, kind FROM tests"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self._db.execute(query + " ORDER BY name", args).fetchall()
+
+    def resolve(self, names=()):
+        '''
+        Resolves the given names of tests to names which require importing
+        only modules defining them. Names of packages are replaced with names
+        of their modules which define tests. Unknown names are left as they
+        are.
+
+        :param names: Names of tests, modules or packages
+        :type names: list
+        :return: A list of names of tests
+        :rtype: list
+        '''
+        if not names:
+            return [name for name, kind in self.tests(kind=KIND_MODULE)]
+        resolved = []
+        for name in names:
+            if self._db.execute("SELECT 1 FROM tests WHERE name=?",
+                                (name,)).fetchone():
+                resolved.append(name)
+                continue
+            modules = [module for module, kind in
+                       self.tests([name], KIND_MODULE)]
+            resolved.extend(modules or [name])
+        return resolved
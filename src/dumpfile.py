@@ -0,0 +1,182 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import os
+import bz2
+import gzip
+from xml.etree import cElementTree as etree
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+from tadek.core import log
+from tadek.core import accessible
+
+import timing
+
+__all__ = ["openDump", "splitElement", "splitAccessible", "DumpWriter"]
+
+def openDump(fn, mode='r'):
+    '''
+    Opens a dump file of the given name. The file is compressed using gzip,
+    bzip2 or xz if its name ends with '.gz', '.bz2' or '.xz' respectively.
+
+    :param fn: A name of the dump file
+    :type fn: string
+    :param mode: A mode in which the file is opened, 'r' or 'w'
+    :type mode: string
+    :return: A file object of the dump
+    :rtype: file
+    '''
+    ext = os.path.splitext(fn)[1].lower()
+    mode += 'b'
+    if ext == ".gz":
+        return gzip.open(fn, mode)
+    elif ext == ".bz2":
+        return bz2.BZ2File(fn, mode)
+    elif ext == ".xz":
+        if lzma is None:
+            raise IOError("Module lzma is required to open xz files: %s" % fn)
+        return lzma.LZMAFile(fn, mode)
+    return open(fn, mode)
+
+#: A tag of an element marking where children of an accessible are placed
+PLACEHOLDER_TAG = "tadek-children-placeholder"
+
+class _Placeholder(object):
+    '''
+    A stand-in for children of an accessible being marshalled.
+    '''
+    def marshal(self):
+        return etree.Element(PLACEHOLDER_TAG)
+
+_PLACEHOLDER = _Placeholder()
+
+class _Childless(object):
+    '''
+    A wrapper of an accessible whose children are replaced by a placeholder.
+    '''
+    def __init__(self, accessible):
+        self._accessible = accessible
+
+    def __getattr__(self, name):
+        return getattr(self._accessible, name)
+
+    def children(self, force=True):
+        return iter((_PLACEHOLDER,))
+
+    def marshal(self):
+        # Marshal the wrapper like an accessible, also if it wraps a view
+        # of a node table, which marshals a whole tree
+        return accessible.Accessible.marshal.im_func(self)
+
+def splitElement(element):
+    '''
+    Serializes the given element of an accessible containing a placeholder
+    of its children.
+
+    :return: Serialized parts of the element which precede and follow
+        the placeholder
+    :rtype: tuple
+    '''
+    parts = etree.tostring(element).split("<%s />" % PLACEHOLDER_TAG, 1)
+    if len(parts) == 1:
+        parts.append('')
+    return tuple(parts)
+
+def splitAccessible(obj):
+    '''
+    Marshals the given accessible without its children.
+
+    :return: Serialized parts of the accessible which precede and follow
+        its children
+    :rtype: tuple
+    '''
+    # Views of node tables keep serialized parts of accessibles, unless
+    # their tables do not store elements
+    parts = getattr(obj, "elementParts", None)
+    if parts is not None:
+        try:
+            return parts()
+        except ValueError:
+            pass
+    return splitElement(_Childless(obj).marshal())
+
+class DumpWriter(object):
+    '''
+    A class for writing an accessible tree to a dump file incrementally,
+    accessible by accessible, in the same format as a marshalled tree.
+    '''
+    def __init__(self, fn):
+        '''
+        :param fn: A name of the dump file
+        :type fn: string
+        '''
+        self.fn = fn
+        #: A number of accessibles written to the file
+        self.count = 0
+
+    @timing.timed("save")
+    def write(self, accessibles):
+        '''
+        Writes accessibles from the given iterable of pairs of an accessible
+        and its level in the tree, which have to be ordered in pre-order.
+        '''
+        log.debug("Write accessible tree to dump file: %s" % self.fn)
+        fd = openDump(self.fn, 'w')
+        try:
+            fd.write('<?xml version="1.0" encoding="us-ascii"?>\n')
+            tails = []
+            for accessible, level in accessibles:
+                while len(tails) > level:
+                    fd.write(tails.pop())
+                head, tail = splitAccessible(accessible)
+                fd.write(head)
+                tails.append(tail)
+                self.count += 1
+            while tails:
+                fd.write(tails.pop())
+            fd.write('\n')
+        finally:
+            fd.close()
+        log.info("Written %d accessibles to dump file: %s"
+                 % (self.count, self.fn))
@@ -35,15 +35,39 @@
 ################################################################################
 
 import os
+import re
+import sys
+import json
+import time
+import Queue
+import threading
 
 from tadek.core import log
 from tadek.core import constants
 from tadek.core import accessible
 from tadek.core import utils
 
-from utils import exitWithStatus, exitWithError, printSeparator
+import timing
+from tree import walkAccessibles, fetchChildren
+from query import Query, findAccessibles, clearSnapshots
+from fetch import TreeFetcher, CHUNK_DEPTH
+from dumpfile import DumpWriter
+from nodetable import NodeTable, NodeView
+from treediff import jsonValue
+from watch import performWatch, MIN_INTERVAL
+from wait import Condition, waitFor, TIMEOUT, INTERVAL
+from utils import exitWithStatus, exitWithError, printSeparator, RequestError
+from utils import startCapture, stopCapture
 
-__all__ = ["performRequest"]
+__all__ = ["performRequest", "performBatch", "performFanOut",
+           "executeRequest", "keyCode", "RequestError", "FORMATS",
+           "MOUSE_EVENTS"]
+
+#: Formats of outputs of requests
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+FORMAT_NDJSON = "ndjson"
+FORMATS = (FORMAT_TEXT, FORMAT_JSON, FORMAT_NDJSON)
 
 def _printInlineAttr(accessible, attr, name=None):
     '''
@@ -145,44 +169,42 @@ def printAccessibleDetails(accessible, attribute):
         if not func(accessible, name, *attr[2:]) and name == attribute:
             print "Element has no %s" % name
 
-def _countColumnLens(accessible, lens):
-    '''
-    Counts length of each of column displaying a basic attibute of accessibles. 
-    '''
-    for i, attr in enumerate(_ATTRS_BASIC):
-        item = getattr(accessible, attr[0])
-        if not item:
-            continue
-        if not isinstance(item, basestring):
-            item = str(item)
-        lens[i] = max(len(item), lens[i])
-    for child in accessible.children(force=False):
-        _countColumnLens(child, lens)
-
-def _printAccessibleAligned(accessible, lens):
+def _encodeRow(items):
     '''
-    Aligns and prints the given accessible recursively.
+    Returns a list of the given encoded values of basic attributes.
     '''
     row = []
-    for i, attr in enumerate(_ATTRS_BASIC):
-        item = getattr(accessible, attr[0])
+    for item in items:
         if item is None:
             item = ''
         if not isinstance(item, basestring):
             item = str(item)
-        row.append(utils.encode(item).ljust(lens[i]))
-    print _COLUMN_SEPARATOR.join(row)
-    for child in accessible.children(force=False):
-        _printAccessibleAligned(child, lens)
+        row.append(utils.encode(item))
+    return row
 
-def printAccessibleTree(accessible):
+def _accessibleRow(accessible):
     '''
-    Prints the given accessible tree recursively.
+    Returns a list of encoded basic attributes of the given accessible.
+    '''
+    return _encodeRow([getattr(accessible, attr[0]) for attr in _ATTRS_BASIC])
+
+def _accessibleRows(accessible, expand=None):
+    '''
+    Iterates over lists of encoded basic attributes of accessibles of
+    the given tree.
+    '''
+    if isinstance(accessible, NodeView):
+        # Read nodes of the table directly instead of through views
+        for record in accessible.records():
+            yield _encodeRow(record[:len(_ATTRS_BASIC)])
+        return
+    for node, level in walkAccessibles(accessible, expand=expand):
+        yield _accessibleRow(node)
+
+def _printHeader(lens):
+    '''
+    Prints the header of columns of the given lengths.
     '''
-    log.debug("Print accessible tree: %s" % accessible)
-    lens = [len(attr[2 if len(attr) > 2 else 0]) for attr in _ATTRS_BASIC]
-    _countColumnLens(accessible, lens)
-    # Print column header
     row = []
     for i, attr in enumerate(_ATTRS_BASIC):
         name = attr[2 if len(attr) > 2 else 0]
@@ -191,10 +213,425 @@ def printAccessibleTree(accessible):
     printSeparator(length)
     print _COLUMN_SEPARATOR.join(row)
     printSeparator(length)
+
+def _countColumnLens(accessible, lens, expand=None):
+    '''
+    Counts length of each of column displaying a basic attibute of accessibles. 
+    '''
+    for row in _accessibleRows(accessible, expand):
+        for i, item in enumerate(row):
+            lens[i] = max(len(item), lens[i])
+
+def _printAccessibleAligned(accessible, lens, expand=None):
+    '''
+    Aligns and prints the given accessible tree.
+    '''
+    for row in _accessibleRows(accessible, expand):
+        print _COLUMN_SEPARATOR.join([item.ljust(lens[i])
+                                      for i, item in enumerate(row)])
+
+@timing.timed("render")
+def printAccessibleTree(accessible, expand=None):
+    '''
+    Prints the given accessible tree.
+
+    If the expand function is specified, it is used to get children
+    of accessibles which are not attached to the tree.
+    '''
+    log.debug("Print accessible tree: %s" % accessible)
+    lens = [len(attr[2 if len(attr) > 2 else 0]) for attr in _ATTRS_BASIC]
+    _countColumnLens(accessible, lens, expand)
+    # Print column header
+    _printHeader(lens)
     # Print accessible tree
     log.info("Print accessible tree using column lengths: %s"
               % ", ".join([str(i) for i in lens]))
-    _printAccessibleAligned(accessible, lens)
+    _printAccessibleAligned(accessible, lens, expand)
+
+# Initial lengths of columns in the streamed accessible tree
+_STREAM_COLUMN_LENS = (24, 32, 20, 8)
+
+# A maximum number of rows aligned together in the streamed accessible tree
+_STREAM_CHUNK_SIZE = 64
+
+# A maximum time in seconds for which rows of the streamed tree are buffered
+_STREAM_CHUNK_TIME = 0.5
+
+def _printStreamChunk(chunk, lens):
+    '''
+    Widens the given column lengths to fit the chunk of rows and prints it.
+    '''
+    for row in chunk:
+        for i, item in enumerate(row):
+            lens[i] = max(len(item), lens[i])
+    for row in chunk:
+        print _COLUMN_SEPARATOR.join([item.ljust(lens[i])
+                                      for i, item in enumerate(row)])
+    sys.stdout.flush()
+
+@timing.timed("render")
+def printAccessibleStream(accessibles):
+    '''
+    Prints accessibles from the given iterable as soon as they arrive.
+
+    Column lengths are fixed ahead and widened only in bounded chunks of rows,
+    so the memory usage does not depend on a size of the tree.
+    '''
+    log.debug("Print accessible tree stream")
+    lens = list(_STREAM_COLUMN_LENS)
+    _printHeader(lens)
+    chunk = []
+    flushed = time.time()
+    for accessible in accessibles:
+        chunk.append(_accessibleRow(accessible))
+        if (len(chunk) >= _STREAM_CHUNK_SIZE
+            or time.time() - flushed >= _STREAM_CHUNK_TIME):
+            _printStreamChunk(chunk, lens)
+            chunk = []
+            flushed = time.time()
+    _printStreamChunk(chunk, lens)
+
+def _jsonAttr(accessible, attr):
+    '''
+    Returns a JSON-compatible value of the given accessible attribute.
+    '''
+    value = getattr(accessible, attr, None)
+    if value is None:
+        return None
+    if attr == "relations":
+        return [{"type": relation.type,
+                 "targets": [str(target) for target in relation]}
+                for relation in value]
+    if isinstance(value, tuple):
+        value = list(value)
+    return jsonValue(value)
+
+def _accessibleRecord(accessible, attrs=()):
+    '''
+    Returns a dictionary of basic and the given extra attributes of
+    the given accessible.
+    '''
+    record = {}
+    for attr in _ATTRS_BASIC + tuple(attrs):
+        record[attr[0]] = _jsonAttr(accessible, attr[0])
+    if "text" in record and record["text"] is not None:
+        record["editable"] = bool(accessible.editable)
+    return record
+
+def printAccessibleDetailsJson(accessible, attribute):
+    '''
+    Prints details about the given accessible as a JSON object.
+    '''
+    log.debug("Print details about accessible as JSON: %s" % accessible)
+    print json.dumps(_accessibleRecord(accessible,
+                                       [attr for attr in _ATTRS_EXTRA
+                                        if attribute in (attr[0], "all")]))
+
+@timing.timed("render")
+def printAccessibleTreeJson(accessible, depth=-1, expand=None):
+    '''
+    Prints the given accessible tree up to the given depth as one JSON
+    object, in which children of each accessible are listed in its
+    'children' item.
+    '''
+    log.debug("Print accessible tree as JSON: %s" % accessible)
+    stack = []
+    for node, level in walkAccessibles(accessible, depth, expand):
+        record = _accessibleRecord(node)
+        record["children"] = []
+        del stack[level:]
+        if stack:
+            stack[-1]["children"].append(record)
+        stack.append(record)
+    print json.dumps(stack[0])
+
+@timing.timed("render")
+def printAccessibleLines(records):
+    '''
+    Prints pairs of accessibles and their levels from the given iterable as
+    JSON objects, one per line, as soon as they arrive.
+    '''
+    log.debug("Print accessible tree as JSON lines")
+    flushed = time.time()
+    for accessible, level in records:
+        record = _accessibleRecord(accessible)
+        record["level"] = level
+        print json.dumps(record)
+        if time.time() - flushed >= _STREAM_CHUNK_TIME:
+            sys.stdout.flush()
+            flushed = time.time()
+    sys.stdout.flush()
+
+def _printStatus(message):
+    '''
+    Logs and prints the given status message of a request.
+    '''
+    log.info(message)
+    print message
+
+def _printStatusJson(status, **fields):
+    '''
+    Logs and prints the given status of a request with the given additional
+    fields as a JSON object.
+    '''
+    fields["status"] = status
+    log.info("Status of the request: %s" % fields)
+    print json.dumps(fields)
+
+def _printNoPath(path, format):
+    '''
+    Prints a status of a request to an accessible of the given path which
+    does not exist.
+    '''
+    message = "There is no such path: %s" % path
+    if format == FORMAT_TEXT:
+        _printStatus(message)
+    else:
+        _printStatusJson("FAILURE", error=message)
+
+def _readTextFile(fn):
+    '''
+    Reads content of the given text file.
+    '''
+    if not os.path.isfile(fn):
+        raise RequestError("There is no such file: %s" % fn)
+    fd = None
+    try:
+        fd = open(fn)
+        return fd.read()
+    finally:
+        if fd:
+            fd.close()
+
+def keyCode(key):
+    '''
+    Converts the given key symbol, character or keycode to a keycode.
+
+    :param key: A key symbol, a character or a decimal or hexadecimal
+        keycode
+    :type key: string
+    :return: A keycode
+    :rtype: integer
+    :raise ValueError: If the key is invalid
+    '''
+    key = key.upper()
+    if key in constants.KEY_SYMS:
+        return constants.KEY_SYMS[key]
+    elif len(key) == 1:
+        return ord(key)
+    elif key.startswith("0X"):
+        return int(key, 16)
+    return int(key)
+
+#: A list of supported mouse event requests and related event types
+MOUSE_EVENTS = (
+    ("mouse-click", "CLICK"),
+    ("mouse-double-click", "DOUBLE_CLICK"),
+    ("mouse-press", "PRESS"),
+    ("mouse-release", "RELEASE"),
+    ("mouse-absolute-motion", "ABSOLUTE_MOTION"),
+    ("mouse-relative-motion", "RELATIVE_MOTION"),
+)
+
+# Options of requests which change accessibles of a device
+_MUTATING_REQUESTS = ("action", "set-text", "set-text-file", "set-value",
+                      "key") + tuple([name for name, event in MOUSE_EVENTS])
+
+def _performDump(device, path, options):
+    '''
+    Dumps an accessible tree of the given path and prints or saves it.
+    '''
+    if "dump" in options:
+        depth = int(options["dump"])
+    else:
+        depth = -1
+    all = "output" in options
+    format = options.get("format", FORMAT_TEXT)
+    fetcher = None
+    expand = None
+    # Keep whole trees in a compact table, with elements of accessibles
+    # only if they are saved
+    table = NodeTable(elements=all)
+    if "parallel" in options or "chunk_depth" in options:
+        # Subtrees are added to the table as they arrive, so only the table
+        # and subtrees being fetched are kept at once
+        fetcher = TreeFetcher(device, int(options.get("parallel", 1)),
+                              int(options.get("chunk_depth", CHUNK_DEPTH)),
+                              table)
+        obj = fetcher.fetch(path, depth, all=all)
+    elif options.get("stream"):
+        # Fetch the tree level by level while it is walked
+        obj = device.getAccessible(path, 1 if depth else 0, all=all)
+        expand = fetchChildren(device, all)
+    else:
+        obj = device.getAccessible(path, depth, all=all)
+        if obj is not None and not isinstance(obj, NodeView):
+            obj = table.load(obj)
+    if obj is None:
+        _printNoPath(path, format)
+        return 1
+    if all:
+        fn = options["output"]
+        if format == FORMAT_TEXT:
+            printSeparator()
+        DumpWriter(fn).write(walkAccessibles(obj, depth, expand))
+        if format == FORMAT_TEXT:
+            _printStatus("Dump saved to file: %s" % fn)
+        else:
+            _printStatusJson("SUCCESS", output=fn)
+    elif format == FORMAT_NDJSON:
+        printAccessibleLines(walkAccessibles(obj, depth, expand))
+    elif format == FORMAT_JSON:
+        printAccessibleTreeJson(obj, depth, expand)
+    elif options.get("stream"):
+        printAccessibleStream(node for node, level in
+                              walkAccessibles(obj, depth, expand))
+    else:
+        printAccessibleTree(obj, expand)
+    if "parallel" in options or "chunk_depth" in options:
+        message = "Fetched in %d requests" % fetcher.requests
+        if format == FORMAT_TEXT:
+            printSeparator()
+            _printStatus(message)
+        else:
+            # Keep the output parsable
+            log.info(message)
+    return 0
+
+def _performFind(device, path, options):
+    '''
+    Finds accessibles matching a query in a tree of the given path and
+    prints them.
+    '''
+    try:
+        query = Query(options["find"])
+    except ValueError, err:
+        raise RequestError("Invalid query: %s" % err)
+    format = options.get("format", FORMAT_TEXT)
+    records = findAccessibles(device, path, query)
+    if records is None:
+        _printNoPath(path, format)
+        return 1
+    if format == FORMAT_NDJSON:
+        printAccessibleLines((record, record.level) for record in records)
+    elif format == FORMAT_JSON:
+        print json.dumps([dict(_accessibleRecord(record), level=record.level)
+                          for record in records])
+    else:
+        printAccessibleStream(records)
+        printSeparator()
+        _printStatus("Found %d elements" % len(records))
+    return 0 if records else 1
+
+def _performWait(device, path, options):
+    '''
+    Waits until a condition is met on a tree of the given path and prints
+    an outcome of waiting.
+    '''
+    try:
+        condition = Condition(options["wait-for"])
+    except ValueError, err:
+        raise RequestError("Invalid query: %s" % err)
+    format = options.get("format", FORMAT_TEXT)
+    met, records, elapsed, checks = waitFor(device, path, condition,
+                                float(options.get("wait_timeout", TIMEOUT)),
+                                float(options.get("wait_interval", INTERVAL)))
+    status = "SUCCESS" if met else "TIMEOUT"
+    if format != FORMAT_TEXT:
+        fields = {"elapsed": round(elapsed, 3), "checks": checks}
+        if condition.query is not None:
+            fields["elements"] = [dict(_accessibleRecord(record),
+                                       level=record.level)
+                                  for record in records]
+        _printStatusJson(status, **fields)
+        return 0 if met else 1
+    if records:
+        # The first element which appeared or has not disappeared yet
+        printAccessibleStream(records)
+    printSeparator()
+    print "Condition %s in %.3fs after %d checks" % (
+                            "met" if met else "not met", elapsed, checks)
+    _printStatus(status)
+    return 0 if met else 1
+
+def executeRequest(device, options):
+    '''
+    Executes a request on the given connected device using the specified
+    options and prints its outcome.
+
+    :param device: A connected device to execute the request on
+    :type device: tadek.connection.device.Device
+    :param options: Options representing the request
+    :type options: dictionary
+    :return: An exit status of the request, 0 if it succeeded
+    :rtype: integer
+    '''
+    log.debug("Execute a request on '%s' device using options: %s"
+               % (device, options))
+    path = accessible.Path(*options["path"].split('/')[1:])
+    format = options.get("format", FORMAT_TEXT)
+    if [name for name in _MUTATING_REQUESTS if name in options]:
+        # Searches after the request must not reuse snapshots from before
+        clearSnapshots(device)
+    if "action" in options:
+        status = device.doAccessible(path, options["action"])
+    elif "set-text" in options:
+        status = device.setAccessible(path, text=options["set-text"])
+    elif "set-text-file" in options:
+        text = _readTextFile(options["set-text-file"])
+        status = device.setAccessible(path, text=text)
+    elif "set-value" in options:
+        value = float(options["set-value"])
+        status = device.setAccessible(path, value=value)
+    elif "key" in options:
+        modifiers = [constants.KEY_CODES[mod]
+                        for mod in options.get("modifiers", [])]
+        status = device.keyboardEvent(path, keyCode(options["key"]),
+                                      modifiers)
+    elif "dump" in options or "dump-all" in options:
+        return _performDump(device, path, options)
+    elif "find" in options:
+        return _performFind(device, path, options)
+    elif "wait-for" in options:
+        return _performWait(device, path, options)
+    elif "watch" in options:
+        return performWatch(device, path, int(options["watch"]),
+                            float(options.get("watch_interval", MIN_INTERVAL)),
+                            options.get("diff_format",
+                                        "text" if format == FORMAT_TEXT
+                                               else "json"))
+    else:
+        for name, event in MOUSE_EVENTS:
+            if name in options:
+                x, y = options[name]
+                button = options.get("button", '')
+                status = device.mouseEvent(path, int(x), int(y),
+                                           button, event)
+                break
+        else:
+            for name in (["all"] + [attr[0] for attr in _ATTRS_EXTRA]):
+                if name in options:
+                    break
+            else:
+                raise RequestError("Invalid request options: %s" % options)
+            obj = device.getAccessible(path, 0, **{name: True})
+            if obj is None:
+                _printNoPath(path, format)
+                return 1
+            if format == FORMAT_TEXT:
+                printAccessibleDetails(obj, name)
+            else:
+                printAccessibleDetailsJson(obj, name)
+            return 0
+    if format != FORMAT_TEXT:
+        _printStatusJson("SUCCESS" if status else "FAILURE")
+        return 0 if status else 1
+    printSeparator()
+    if status:
+        _printStatus("SUCCESS")
+        return 0
+    _printStatus("FAILURE")
+    return 1
 
 def performRequest(device, options):
     '''
@@ -207,106 +644,179 @@ def performRequest(device, options):
     '''
     log.debug("Perform a request on '%s' device using options: %s"
                % (device, options))
-    path = accessible.Path(*options.pop("path").split('/')[1:])
     device.connect()
     try:
-        if "action" in options:
-            status = device.doAccessible(path, options["action"])
-        elif "set-text" in options:
-            text = options["set-text"]
-            status = device.setAccessible(path, text=text)
-        elif "set-text-file" in options:
-            fn = options["set-text-file"]
-            if not os.path.isfile(fn):
-                exitWithError("There is no such file: %s" % fn)
-            fd = None
+        try:
+            status = executeRequest(device, options)
+        except RequestError, err:
+            exitWithError(err)
+    finally:
+        if device.isConnected():
+            device.disconnect()
+    exitWithStatus(status=status)
+
+def _deviceFileName(fn, device):
+    '''
+    Returns a name of the given file specific to the given device.
+    '''
+    dirname, basename = os.path.split(fn)
+    name = re.sub("[^\w.-]", '_', str(device.name))
+    if '.' in basename:
+        basename = "%s-%s.%s" % ((basename.split('.', 1)[0], name) +
+                                 tuple(basename.split('.', 1)[1:]))
+    else:
+        basename = "%s-%s" % (basename, name)
+    return os.path.join(dirname, basename)
+
+def _performOnDevice(device, options, results):
+    '''
+    Performs a request on the given device capturing its output and puts
+    a result of the request into the given queue.
+    '''
+    start = time.time()
+    startCapture()
+    try:
+        try:
+            device.connect()
+            status = executeRequest(device, options)
+        except Exception, err:
+            log.exception(err)
+            print >> sys.stderr, err
+            status = 2
+    finally:
+        try:
+            if device.isConnected():
+                device.disconnect()
+        except Exception, err:
+            log.exception(err)
+        output, errors = stopCapture()
+        results.put((device, status, output, errors, time.time() - start))
+
+# A status of a device which has not finished a request in time
+_STATUS_TIMEOUT = 3
+
+def performFanOut(devices, options, jobs=None, timeout=None):
+    '''
+    Performs a request concurrently on the given devices and prints
+    outputs grouped by device as soon as they are available.
+
+    :param devices: Devices to perform the request on
+    :type devices: list [tadek.connection.device.Device]
+    :param options: Options representing the request
+    :type options: dictionary
+    :param jobs: A maximum number of devices handled at the same time,
+        all devices are handled at once by default
+    :type jobs: integer
+    :param timeout: Time in seconds after which devices which have not
+        finished are reported as timed out
+    :type timeout: float
+    '''
+    log.debug("Perform a request on devices %s using options: %s"
+               % (", ".join([str(d) for d in devices]), options))
+    pending = Queue.Queue()
+    for device in devices:
+        deviceOptions = dict(options)
+        if "output" in options:
+            deviceOptions["output"] = _deviceFileName(options["output"],
+                                                      device)
+        pending.put((device, deviceOptions))
+    results = Queue.Queue()
+
+    def work():
+        while True:
             try:
-                fd = open(fn)
-                text = fd.read()
-            finally:
-                if fd:
-                    fd.close()
-            status = device.setAccessible(path, text=text)
-        elif "set-value" in options:
-            value = float(options["set-value"])
-            status = device.setAccessible(path, value=value)
-        elif "mouse-click" in options:
-            x, y = options["mouse-click"]
-            button = options["button"]
-            status = device.mouseEvent(path, int(x), int(y), button, "CLICK")
-        elif "mouse-double-click" in options:
-            x, y = options["mouse-double-click"]
-            button = options["button"]
-            status = device.mouseEvent(path, int(x), int(y),
-                                       button, "DOUBLE_CLICK")
-        elif "mouse-press" in options:
-            x, y = options["mouse-press"]
-            button = options["button"]
-            status = device.mouseEvent(path, int(x), int(y), button, "PRESS")
-        elif "mouse-release" in options:
-            x, y = options["mouse-release"]
-            button = options["button"]
-            status = device.mouseEvent(path, int(x), int(y), button, "RELEASE")
-        elif "mouse-absolute-motion" in options:
-            x, y = options["mouse-absolute-motion"]
-            status = device.mouseEvent(path, int(x), int(y),
-                                       '', "ABSOLUTE_MOTION")
-        elif "mouse-relative-motion" in options:
-            x, y = options["mouse-relative-motion"]
-            status = device.mouseEvent(path, int(x), int(y),
-                                       '', "RELATIVE_MOTION")
-        elif "key" in options:
-            key = options["key"].upper()
-            if key in constants.KEY_SYMS:
-                key = constants.KEY_SYMS[key]
-            elif len(key) == 1:
-                key = ord(key)
-            elif key.startswith("0X"):
-                key = int(key, 16)
-            else:
-                key = int(key)
-            if "modifiers" in options:
-                modifiers = [constants.KEY_CODES[mod]
-                                    for mod in options["modifiers"]]
-            else:
-                modifiers = []
-            status = device.keyboardEvent(path, key, modifiers)
-        elif "dump" in options or "dump-all" in options:
-            all = False
-            if "dump" in options:
-                depth = int(options["dump"])
-            else:
-                depth = -1
-            if "output" in options:
-                fn = options["output"]
-                all = True
-            obj = device.getAccessible(path, depth, all=all)
-            if obj is None:
-                exitWithStatus("There is no such path: %s" % path, 1)
-            if all:
-                printSeparator()
-                utils.saveXml(obj.marshal(), fn)
-                exitWithStatus("Dump saved to file: %s" % fn)
+                device, deviceOptions = pending.get_nowait()
+            except Queue.Empty:
+                break
+            _performOnDevice(device, deviceOptions, results)
+
+    for i in xrange(min(jobs or len(devices), len(devices))):
+        thread = threading.Thread(target=work)
+        thread.setDaemon(True)
+        thread.start()
+    deadline = time.time() + timeout if timeout is not None else None
+    statuses = {}
+    for i in xrange(len(devices)):
+        try:
+            if deadline is None:
+                # Wait in short intervals to keep the thread interruptible
+                while True:
+                    try:
+                        result = results.get(timeout=1)
+                        break
+                    except Queue.Empty:
+                        pass
             else:
-                printAccessibleTree(obj)
-                exitWithStatus()
-        else:
-            for name in (["all"] + [attr[0] for attr in _ATTRS_EXTRA]):
-                if name in options:
-                    break
+                result = results.get(timeout=max(deadline - time.time(), 0))
+        except Queue.Empty:
+            break
+        device, status, output, errors, elapsed = result
+        statuses[device] = (status, elapsed)
+        printSeparator()
+        print "DEVICE %s: %s:%d" % ((device.name,) + tuple(device.address))
+        sys.stdout.write(output)
+        sys.stderr.write(errors)
+        print "STATUS %s: %d" % (device.name, status)
+        sys.stdout.flush()
+    printSeparator()
+    counts = [0, 0, 0, 0]
+    for device in devices:
+        status, elapsed = statuses.get(device, (_STATUS_TIMEOUT, timeout))
+        counts[status] += 1
+        print "%s\t%s\t%.3fs" % (device.name, ("SUCCESS", "FAILURE", "ERROR",
+                                               "TIMEOUT")[status], elapsed)
+    printSeparator()
+    print "Devices succeeded:\t%d" % counts[0]
+    print "Devices failed:\t\t%d" % counts[1]
+    print "Devices with errors:\t%d" % counts[2]
+    print "Devices timed out:\t%d" % counts[3]
+    exitWithStatus(status=max([status for status in xrange(len(counts))
+                               if counts[status]]))
+
+def performBatch(device, requests):
+    '''
+    Performs a sequence of requests on the given device using one connection.
+
+    :param device: A device to perform the requests on
+    :type device: tadek.connection.device.Device
+    :param requests: An iterable of pairs of a request identifier and either
+        options representing the request or an error message
+    :type requests: iterable
+    '''
+    log.debug("Perform a batch of requests on '%s' device" % device)
+    counts = [0, 0, 0]
+    device.connect()
+    try:
+        for id, options in requests:
+            printSeparator()
+            print "REQUEST %s" % id
+            if isinstance(options, basestring):
+                print >> sys.stderr, options
+                status = 2
             else:
-                exitWithError("Invalid request options: %s" % options)
-            obj = device.getAccessible(path, 0, **{name: True})
-            if obj is None:
-                exitWithStatus("There is no such path: %s" % path, 1)
-            printAccessibleDetails(obj, name)
-            exitWithStatus()
+                try:
+                    if not device.isConnected():
+                        # The connection dropped during a previous request
+                        device.connect()
+                    status = executeRequest(device, options)
+                except RequestError, err:
+                    print >> sys.stderr, err
+                    status = 2
+                except Exception, err:
+                    # Any failure of a request must not abort the batch
+                    log.exception(err)
+                    print >> sys.stderr, err
+                    status = 2
+            log.info("Request %s finished with status: %d" % (id, status))
+            print "STATUS %s: %d" % (id, status)
+            sys.stdout.flush()
+            counts[status] += 1
     finally:
         if device.isConnected():
             device.disconnect()
     printSeparator()
-    if status:
-        exitWithStatus("SUCCESS")
-    else:
-        exitWithStatus("FAILURE", 1)
+    print "Requests succeeded:\t%d" % counts[0]
+    print "Requests failed:\t%d" % counts[1]
+    print "Requests invalid:\t%d" % counts[2]
+    exitWithStatus(status=2 if counts[2] else (1 if counts[1] else 0))
 
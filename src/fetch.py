@@ -0,0 +1,237 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import Queue
+import threading
+
+from tadek.core import log
+
+from tree import walkAccessibles
+
+__all__ = ["TreeFetcher"]
+
+#: Default number of concurrent requests of a fetcher
+WORKERS = 4
+
+#: Default depth of subtrees fetched by a single request
+CHUNK_DEPTH = 2
+
+class TreeFetcher(object):
+    '''
+    A class for fetching an accessible tree subtree by subtree using
+    a bounded pool of threads which send requests concurrently.
+
+    Fetched subtrees are not joined together, use the expand() method with
+    explore.walkAccessibles() to iterate over the whole tree. If a node
+    table is given, each subtree is added to it as soon as it is fetched
+    and its accessibles are released, so the whole tree is kept only in
+    the compact table.
+    '''
+    def __init__(self, device, workers=WORKERS, chunkDepth=CHUNK_DEPTH,
+                 table=None):
+        '''
+        :param device: A connected device to fetch the tree from
+        :type device: tadek.connection.device.Device
+        :param workers: A maximum number of concurrent requests
+        :type workers: integer
+        :param chunkDepth: A depth of subtrees fetched by a single request
+        :type chunkDepth: integer
+        :param table: A table to store fetched accessibles in
+        :type table: nodetable.NodeTable
+        '''
+        if workers < 1:
+            raise ValueError("Invalid number of workers: %d" % workers)
+        if chunkDepth < 1:
+            raise ValueError("Invalid depth of subtrees: %d" % chunkDepth)
+        self.device = device
+        self.workers = workers
+        self.chunkDepth = chunkDepth
+        #: A number of requests sent to the device
+        self.requests = 0
+        self.table = table
+        self._subtrees = {}
+        # Identifiers of table nodes whose children are not fetched yet
+        self._boundaryIds = {}
+        self._rootId = None
+        self._lock = threading.Lock()
+
+    def _boundary(self, obj, depth):
+        '''
+        Returns paths of accessibles of the given subtree which have
+        children that have not been fetched yet and their remaining depths.
+        '''
+        nodes = []
+        stack = [(obj, 0)]
+        while stack:
+            node, level = stack.pop()
+            if depth >= 0 and level >= depth:
+                continue
+            children = list(node.children(force=False))
+            if children:
+                stack.extend([(child, level + 1) for child in children])
+            elif node.count and level == self.chunkDepth:
+                nodes.append((node.path, depth - level if depth >= 0 else -1))
+        return nodes
+
+    def _store(self, path, obj, boundary):
+        '''
+        Adds the given subtree to the table as children of the node of
+        the given path, or as a root if there is no such node, and remembers
+        nodes of the given boundary of the subtree.
+        '''
+        parent = self._boundaryIds.pop(str(path), None)
+        if parent is None:
+            accessibles = list(walkAccessibles(obj))
+            ids = self.table.extend(accessibles)
+            self._rootId = ids[0]
+        else:
+            accessibles = [(node, level - 1) for node, level
+                           in walkAccessibles(obj) if level]
+            ids = self.table.extend(accessibles, parent)
+        paths = set([str(nodePath) for nodePath, depth in boundary])
+        for (node, level), id in zip(accessibles, ids):
+            if str(node.path) in paths:
+                self._boundaryIds[str(node.path)] = id
+
+    def _fetch(self, path, depth, all):
+        '''
+        Fetches a subtree of the given path and stores it.
+
+        :return: The subtree and its boundary
+        :rtype: tuple
+        '''
+        chunk = self.chunkDepth if depth < 0 else min(depth, self.chunkDepth)
+        obj = self.device.getAccessible(path, chunk, all=all)
+        boundary = self._boundary(obj, depth) if obj is not None else []
+        self._lock.acquire()
+        try:
+            self.requests += 1
+            if obj is not None:
+                if self.table is not None:
+                    self._store(path, obj, boundary)
+                else:
+                    self._subtrees[str(path)] = obj
+        finally:
+            self._lock.release()
+        return obj, boundary
+
+    def fetch(self, path, depth=-1, all=False):
+        '''
+        Fetches an accessible tree of the given path and depth.
+
+        :param path: A path of the root accessible of the tree
+        :type path: tadek.core.accessible.Path
+        :param depth: A depth of the tree, -1 means the whole tree
+        :type depth: integer
+        :param all: True if all attributes of accessibles should be fetched
+        :type all: boolean
+        :return: The root accessible, or its view if the fetcher has a table,
+            or None if there is no such path
+        :rtype: tadek.core.accessible.Accessible
+        '''
+        log.debug("Fetch accessible tree of '%s' path using %d workers"
+                  % (path, self.workers))
+        root, boundary = self._fetch(path, depth, all)
+        if root is not None and self.table is not None:
+            root = self.table.view(self._rootId)
+        if root is None or depth == 0:
+            return root
+        queue = Queue.Queue()
+        errors = []
+        pending = [0]
+        done = threading.Condition()
+
+        def submit(nodes):
+            done.acquire()
+            try:
+                pending[0] += len(nodes)
+            finally:
+                done.release()
+            for node in nodes:
+                queue.put(node)
+
+        def work():
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                nodes = []
+                if not errors:
+                    try:
+                        nodes = self._fetch(item[0], item[1], all)[1]
+                    except Exception, err:
+                        log.exception(err)
+                        errors.append(err)
+                submit(nodes)
+                done.acquire()
+                try:
+                    pending[0] -= 1
+                    if not pending[0]:
+                        done.notify()
+                finally:
+                    done.release()
+
+        threads = [threading.Thread(target=work)
+                   for i in xrange(self.workers)]
+        for thread in threads:
+            thread.setDaemon(True)
+            thread.start()
+        submit(boundary)
+        done.acquire()
+        try:
+            while pending[0]:
+                done.wait()
+        finally:
+            done.release()
+            for thread in threads:
+                queue.put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        log.info("Fetched accessible tree of '%s' path in %d requests"
+                 % (path, self.requests))
+        return root
+
+    def expand(self, accessible):
+        '''
+        Returns children of the given accessible from fetched subtrees.
+        '''
+        obj = self._subtrees.get(str(accessible.path))
+        if obj is None:
+            return []
+        return obj.children(force=False)
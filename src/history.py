@@ -0,0 +1,321 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import os
+import time
+import sqlite3
+import threading
+
+from tadek.engine.testexec import STATUS_PASSED, STATUS_FAILED, \
+                                  STATUS_ERROR, STATUS_NOT_COMPLETED
+
+__all__ = ["ResultHistory", "testFilter", "testArgs"]
+
+#: A default file of the history of test results
+HISTORY_FILE = os.path.join(os.path.expanduser('~'), ".tadek",
+                            "tadek-runner", "history.db")
+
+#: A number of latest runs taken into account when ordering tests
+RECENT_RUNS = 5
+
+#: Statuses of test cases which did not pass
+STATUSES_FAILED = (STATUS_FAILED, STATUS_ERROR, STATUS_NOT_COMPLETED)
+
+# A weight of the latest duration in an average duration of a test
+_DURATION_WEIGHT = 0.3
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS durations (test TEXT PRIMARY KEY, "
+        "duration REAL, runs INTEGER)",
+    "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, "
+        "started REAL, run_time REAL)",
+    "CREATE TABLE IF NOT EXISTS results (run INTEGER, test TEXT, "
+        "device TEXT, status TEXT, duration REAL, attempt INTEGER DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS results_test ON results (test)",
+    "CREATE INDEX IF NOT EXISTS results_run ON results (run)",
+)
+
+def testFilter(column="test"):
+    '''
+    Returns an SQL condition matching a test case or test cases of a suite.
+    '''
+    return "(%s = ? OR substr(%s, 1, ?) = ?)" % (column, column)
+
+def testArgs(test):
+    '''
+    Returns arguments of the condition returned by testFilter().
+    '''
+    return (test, len(test) + 1, test + '.')
+
+class ResultHistory(object):
+    '''
+    A class of a local store of the history of test results.
+    '''
+    def __init__(self, fn=HISTORY_FILE):
+        '''
+        :param fn: A name of the store file
+        :type fn: string
+        '''
+        self.fn = fn
+        dirname = os.path.dirname(fn)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._db = sqlite3.connect(fn, check_same_thread=False)
+        self._lock = threading.Lock()
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        columns = [row[1] for row in
+                   self._db.execute("PRAGMA table_info(results)").fetchall()]
+        if "attempt" not in columns:
+            # Stores created before retries were recorded within runs
+            self._db.execute("ALTER TABLE results "
+                             "ADD COLUMN attempt INTEGER DEFAULT 0")
+        self._db.commit()
+
+    def close(self):
+        '''
+        Closes the store.
+        '''
+        self._db.close()
+
+    def startRun(self):
+        '''
+        Starts a new run of tests.
+
+        :return: An identifier of the run
+        :rtype: integer
+        '''
+        self._lock.acquire()
+        try:
+            cursor = self._db.execute("INSERT INTO runs (started) VALUES (?)",
+                                      (time.time(),))
+            self._db.commit()
+            return cursor.lastrowid
+        finally:
+            self._lock.release()
+
+    def setRunTime(self, run, runTime):
+        '''
+        Sets total execution time of the given run in seconds.
+        '''
+        self._lock.acquire()
+        try:
+            self._db.execute("UPDATE runs SET run_time = ? WHERE id = ?",
+                             (runTime, run))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def lastRun(self):
+        '''
+        Returns an identifier of the latest run or None if there is no run.
+        '''
+        self._lock.acquire()
+        try:
+            return self._db.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        finally:
+            self._lock.release()
+
+    def failedTests(self, run=None):
+        '''
+        Returns identifiers of test cases which failed, ended with an error
+        or were not completed in the last attempt of the given run, the latest
+        one by default.
+
+        :return: A sorted list of identifiers of test cases
+        :rtype: list
+        '''
+        self._lock.acquire()
+        try:
+            if run is None:
+                run = self._db.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+            rows = self._db.execute("SELECT DISTINCT test FROM results AS r "
+                                    "WHERE run=? AND status IN (%s) "
+                                    "AND attempt = (SELECT MAX(attempt) "
+                                    "FROM results WHERE run=r.run "
+                                    "AND test=r.test) ORDER BY test"
+                                    % ",".join("?" * len(STATUSES_FAILED)),
+                                    (run,) + STATUSES_FAILED).fetchall()
+        finally:
+            self._lock.release()
+        return [row[0] for row in rows]
+
+    def addResult(self, run, test, device, status, duration, attempt=0):
+        '''
+        Records a result of the given test case executed on the given device
+        in the given attempt of the run, 0 for the first one and following
+        numbers for retries, and updates its average duration if the duration
+        is known.
+        '''
+        self._lock.acquire()
+        try:
+            self._db.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                             (run, test, device, status, duration, attempt))
+            self._db.commit()
+        finally:
+            self._lock.release()
+        if duration is not None:
+            self.addDuration(test, duration)
+
+    def failureScore(self, test, runs=RECENT_RUNS):
+        '''
+        Returns a score of recent failures of the given test case or test
+        cases of the given suite. Each failure counts the more the more
+        recent its run is, and flaky test cases, which both passed and
+        failed recently, count twice.
+        '''
+        self._lock.acquire()
+        try:
+            rows = self._db.execute(
+                        "SELECT test, run, status FROM results WHERE %s "
+                        "AND run > (SELECT IFNULL(MAX(id), 0) - ? FROM runs)"
+                        % testFilter(), testArgs(test) + (runs,)).fetchall()
+            last = self._db.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        finally:
+            self._lock.release()
+        score = 0.0
+        statuses = {}
+        for case, run, status in rows:
+            statuses.setdefault(case, set()).add(status in STATUSES_FAILED)
+            if status in STATUSES_FAILED:
+                score += 1.0 / (1 + last - run)
+        for case, failed in statuses.iteritems():
+            if len(failed) > 1:
+                score *= 2
+                break
+        return score
+
+    def runTimes(self, runs=RECENT_RUNS):
+        '''
+        Returns a list of pairs of a start time and a total execution time
+        of the given number of latest runs, from the oldest one.
+        '''
+        self._lock.acquire()
+        try:
+            rows = self._db.execute("SELECT started, run_time FROM runs "
+                                    "WHERE run_time IS NOT NULL "
+                                    "ORDER BY id DESC LIMIT ?",
+                                    (runs,)).fetchall()
+        finally:
+            self._lock.release()
+        rows.reverse()
+        return rows
+
+    def durationRegressions(self, ratio=1.2, minimum=1.0, runs=RECENT_RUNS):
+        '''
+        Returns test cases whose durations in the latest run exceed their
+        average durations in the given number of preceding runs at least
+        the given times and by at least the given number of seconds.
+
+        :return: A list of tuples of a test case, a device, its latest
+            duration and its previous average duration
+        :rtype: list
+        '''
+        self._lock.acquire()
+        try:
+            rows = self._db.execute(
+                "SELECT last.test, last.device, last.duration, "
+                "AVG(prev.duration) FROM results AS last "
+                "JOIN results AS prev ON prev.test = last.test "
+                "AND prev.run < last.run AND prev.run >= last.run - ? "
+                "AND prev.status = ? "
+                "WHERE last.run = (SELECT MAX(id) FROM runs) "
+                "AND last.status = ? GROUP BY last.test, last.device",
+                (runs, STATUS_PASSED, STATUS_PASSED)).fetchall()
+        finally:
+            self._lock.release()
+        return sorted([row for row in rows if row[2] >= row[3] * ratio
+                                          and row[2] - row[3] >= minimum],
+                      key=lambda row: row[3] - row[2])
+
+    def addDuration(self, test, duration):
+        '''
+        Updates an average duration of the given test with a new one.
+
+        :param test: An identifier of the test case
+        :type test: string
+        :param duration: A duration of the test case in seconds
+        :type duration: float
+        '''
+        self._lock.acquire()
+        try:
+            row = self._db.execute("SELECT duration, runs FROM durations "
+                                   "WHERE test = ?", (test,)).fetchone()
+            if row is None:
+                self._db.execute("INSERT INTO durations VALUES (?, ?, 1)",
+                                 (test, duration))
+            else:
+                average = (_DURATION_WEIGHT * duration +
+                           (1 - _DURATION_WEIGHT) * row[0])
+                self._db.execute("UPDATE durations SET duration = ?, "
+                                 "runs = ? WHERE test = ?",
+                                 (average, row[1] + 1, test))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def duration(self, test):
+        '''
+        Returns an average duration of the given test or tests of the given
+        suite and a number of test cases it is known for.
+
+        :param test: An identifier of the test case or the test suite
+        :type test: string
+        :return: A total duration in seconds and a number of test cases
+        :rtype: tuple
+        '''
+        self._lock.acquire()
+        try:
+            total, count = self._db.execute(
+                            "SELECT SUM(duration), COUNT(*) FROM durations "
+                            "WHERE %s" % testFilter(),
+                            testArgs(test)).fetchone()
+        finally:
+            self._lock.release()
+        return total or 0.0, count
+
+    def averageDuration(self):
+        '''
+        Returns an average duration of all known test cases or None if
+        there are no such test cases.
+        '''
+        self._lock.acquire()
+        try:
+            return self._db.execute("SELECT AVG(duration) "
+                                    "FROM durations").fetchone()[0]
+        finally:
+            self._lock.release()
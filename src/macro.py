@@ -0,0 +1,233 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import time
+import shlex
+
+from tadek.core import log
+from tadek.core import constants
+from tadek.core import accessible
+
+from explore import keyCode, MOUSE_EVENTS
+from utils import exitWithStatus, printSeparator, RequestError
+
+__all__ = ["readMacro", "replayMacro", "performMacro"]
+
+#: Time in seconds before a step which is waited by spinning instead of
+#: sleeping, to send the step on time
+SPIN_TIME = 0.002
+
+#: A default tolerance in seconds of delays of steps
+TOLERANCE = 0.005
+
+# Keys of characters which have no keycodes of their own
+_CHAR_KEYS = {
+    '\n': "ENTER",
+    '\t': "TAB",
+}
+
+def _charCode(char):
+    '''
+    Converts the given character of typed text to a keycode.
+    '''
+    key = _CHAR_KEYS.get(char)
+    if key is not None and key in constants.KEY_SYMS:
+        return constants.KEY_SYMS[key]
+    return ord(char)
+
+def _parseStep(args, path, typeInterval):
+    '''
+    Parses a macro step of the given arguments and returns a list of pairs
+    of time offsets relative to the step and events.
+    '''
+    command, args = args[0].lower(), args[1:]
+    mouse = dict(MOUSE_EVENTS)
+    if command in mouse:
+        if len(args) not in (2, 3):
+            raise ValueError("%s requires X Y [BUTTON]" % command)
+        button = args[2].upper() if len(args) == 3 else ''
+        if mouse[command] in ("CLICK", "DOUBLE_CLICK", "PRESS", "RELEASE"):
+            button = button or "LEFT"
+        if button and button not in constants.BUTTONS:
+            raise ValueError("invalid button: %s" % button)
+        return [(0.0, ("mouseEvent", path, int(args[0]), int(args[1]),
+                       button, mouse[command]))]
+    elif command == "key":
+        if not args:
+            raise ValueError("key requires KEY [MODIFIER]...")
+        modifiers = []
+        for mod in args[1:]:
+            if mod.upper() not in constants.KEY_CODES:
+                raise ValueError("invalid modifier: %s" % mod)
+            modifiers.append(constants.KEY_CODES[mod.upper()])
+        return [(0.0, ("keyboardEvent", path, keyCode(args[0]), modifiers))]
+    elif command == "type":
+        if len(args) != 1:
+            raise ValueError("type requires one quoted TEXT")
+        # A keyboard event request of a device carries a single keycode, so
+        # text is typed with one request per character. Setting the text
+        # at once would skip key events which applications react to.
+        return [(i * typeInterval, ("keyboardEvent", path, _charCode(char),
+                                    []))
+                for i, char in enumerate(args[0].decode("string_escape")
+                                              .decode("utf-8"))]
+    raise ValueError("unknown step: %s" % command)
+
+def readMacro(fn, typeInterval=0.0, path=None):
+    '''
+    Reads a macro file. Each line of the file is a step of the form:
+
+        [+]SECONDS COMMAND [ARGUMENT]...
+
+    where SECONDS is a time offset of the step relative to the start of
+    the macro, or to the previous step if preceded by '+'. Commands are:
+    'path PATH' setting a path of following events, mouse events named as
+    request options, e.g. 'mouse-press X Y [BUTTON]', 'key KEY [MODIFIER]...'
+    and 'type TEXT', which types the text, in which backslash escapes like
+    '\\n' are allowed, character by character with the given interval,
+    sending a keyboard event request per character.
+    Empty lines and lines starting with '#' are skipped.
+
+    :param fn: A name of the macro file
+    :type fn: string
+    :param typeInterval: Time in seconds between typed characters
+    :type typeInterval: float
+    :param path: A path of events preceding the first 'path' step, the root
+        path by default
+    :type path: tadek.core.accessible.Path
+    :return: A list of pairs of time offsets and events, sorted by offsets
+    :rtype: list
+    '''
+    log.debug("Read macro file: %s" % fn)
+    steps = []
+    if path is None:
+        path = accessible.Path()
+    offset = 0.0
+    fd = open(fn)
+    try:
+        for n, line in enumerate(fd):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                args = shlex.split(line)
+                if len(args) < 2:
+                    raise ValueError("time and command are required")
+                if args[0].startswith('+'):
+                    offset += float(args[0][1:])
+                else:
+                    offset = float(args[0])
+                if args[1].lower() == "path":
+                    if len(args) != 3 or not args[2].startswith('/'):
+                        raise ValueError("path requires PATH")
+                    path = accessible.Path(*args[2].split('/')[1:])
+                    continue
+                events = [(offset + delay, event) for delay, event
+                          in _parseStep(args[1:], path, typeInterval)]
+                steps.extend(events)
+                if events:
+                    # Following steps are relative to the last typed character
+                    offset = events[-1][0]
+            except ValueError, err:
+                raise RequestError("Invalid step in line %d of macro: %s"
+                                   % (n + 1, err))
+    finally:
+        fd.close()
+    steps.sort(key=lambda step: step[0])
+    return steps
+
+def _waitUntil(deadline):
+    '''
+    Waits until the given time, sleeping most of the time and spinning just
+    before it.
+    '''
+    remaining = deadline - time.time()
+    if remaining > SPIN_TIME:
+        time.sleep(remaining - SPIN_TIME)
+    while time.time() < deadline:
+        pass
+
+def replayMacro(device, steps):
+    '''
+    Replays the given steps of a macro on the given connected device.
+    Steps are scheduled relative to the start of the replay, so delays of
+    single steps do not accumulate.
+
+    :param device: A device to replay the macro on
+    :type device: tadek.connection.device.Device
+    :param steps: A list of pairs of time offsets and events
+    :type steps: list
+    :return: A list of pairs of delays of steps in seconds and their statuses
+    :rtype: list
+    '''
+    log.debug("Replay macro of %d steps on '%s' device" % (len(steps), device))
+    results = []
+    started = time.time()
+    for offset, event in steps:
+        deadline = started + offset
+        _waitUntil(deadline)
+        delay = time.time() - deadline
+        status = getattr(device, event[0])(*event[1:])
+        results.append((delay, status))
+    return results
+
+def performMacro(device, fn, typeInterval=0.0, path=None,
+                 tolerance=TOLERANCE):
+    '''
+    Replays a macro read from the given file on the given device using one
+    connection and prints delays of its steps.
+
+    :param tolerance: Time in seconds steps can be delayed by
+    :type tolerance: float
+    '''
+    steps = readMacro(fn, typeInterval, path)
+    device.connect()
+    try:
+        results = replayMacro(device, steps)
+    finally:
+        if device.isConnected():
+            device.disconnect()
+    delays = [delay for delay, status in results]
+    failed = len([status for delay, status in results if not status])
+    late = len([delay for delay in delays if delay > tolerance])
+    printSeparator()
+    print "Steps replayed:\t\t%d" % len(results)
+    print "Steps failed:\t\t%d" % failed
+    if delays:
+        print "Mean delay:\t\t%.2fms" % (sum(delays) * 1000.0 / len(delays))
+        print "Maximum delay:\t\t%.2fms" % (max(delays) * 1000.0)
+    print "Steps delayed over %gms:\t%d" % (tolerance * 1000.0, late)
+    exitWithStatus("FAILURE" if failed else "SUCCESS", 1 if failed else 0)
@@ -0,0 +1,381 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+from array import array
+from xml.etree import cElementTree as etree
+
+from tadek.core import log
+from tadek.core import accessible
+
+from tree import walkAccessibles
+from dumpfile import splitAccessible
+
+__all__ = ["NodeTable", "NodeView"]
+
+#: Attributes of accessibles which are decoded from saved elements on demand
+EXTRA_ATTRS = ("description", "position", "size", "actions", "text",
+               "editable", "value", "relations")
+
+# An identifier of a missing node
+_NONE = -1
+
+class NodeTable(object):
+    '''
+    A class of compact stores of accessible trees.
+
+    Nodes are kept in arrays of integers: links to parents, first children
+    and next siblings, last indexes of paths, levels and numbers of children.
+    Names, roles, states and attributes are interned, so repeated values are
+    stored once. Other attributes are kept only if the table stores elements,
+    as serialized XML of each accessible without its children, and they are
+    decoded when they are read. Nodes are read through NodeView objects,
+    which can be used in place of accessibles.
+    '''
+    def __init__(self, elements=False):
+        '''
+        :param elements: True if serialized elements of accessibles should
+            be stored, to read all their attributes or save them
+        :type elements: boolean
+        '''
+        self.elements = elements
+        self._parents = array('i')
+        self._firstChildren = array('i')
+        self._lastChildren = array('i')
+        self._nextSiblings = array('i')
+        self._indexes = array('i')
+        self._levels = array('i')
+        self._counts = array('i')
+        self._names = array('i')
+        self._roles = array('i')
+        self._states = array('i')
+        self._attributes = array('i')
+        # Serialized elements and lengths of their parts preceding children
+        self._elements = []
+        self._splits = array('i')
+        # Paths of nodes without parents
+        self._rootPaths = {}
+        # Interned values and their identifiers
+        self._values = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._parents)
+
+    def _intern(self, value):
+        '''
+        Returns an identifier of the given hashable value, storing it first
+        if it is new.
+        '''
+        id = self._ids.get(value)
+        if id is None:
+            id = self._ids[value] = len(self._values)
+            self._values.append(value)
+        return id
+
+    def add(self, accessible, parent=_NONE, parts=None):
+        '''
+        Adds the given accessible without its children as the last child of
+        the given node, or as a root if the parent is not given.
+
+        :param accessible: An accessible to add
+        :type accessible: tadek.core.accessible.Accessible
+        :param parent: An identifier of the parent node
+        :type parent: integer
+        :param parts: Serialized parts of the accessible which precede
+            and follow its children, if they are known already
+        :type parts: tuple
+        :return: An identifier of the added node
+        :rtype: integer
+        '''
+        id = len(self._parents)
+        path = str(accessible.path)
+        self._parents.append(parent)
+        self._firstChildren.append(_NONE)
+        self._lastChildren.append(_NONE)
+        self._nextSiblings.append(_NONE)
+        self._indexes.append(int(path.rsplit('/', 1)[1] or 0))
+        if parent == _NONE:
+            self._rootPaths[id] = path
+            self._levels.append(0)
+        else:
+            self._levels.append(self._levels[parent] + 1)
+            last = self._lastChildren[parent]
+            if last == _NONE:
+                self._firstChildren[parent] = id
+            else:
+                self._nextSiblings[last] = id
+            self._lastChildren[parent] = id
+        self._counts.append(accessible.count or 0)
+        self._names.append(self._intern(accessible.name))
+        self._roles.append(self._intern(accessible.role))
+        states = accessible.states
+        self._states.append(self._intern(tuple(states)
+                                         if states is not None else None))
+        attributes = accessible.attributes
+        self._attributes.append(self._intern(
+                            tuple(sorted(dict(attributes).items()))
+                            if attributes is not None else None))
+        if self.elements:
+            head, tail = parts or splitAccessible(accessible)
+            self._elements.append(head + tail)
+            self._splits.append(len(head))
+        return id
+
+    def extend(self, accessibles, parent=_NONE):
+        '''
+        Adds accessibles from the given iterable of pairs of an accessible
+        and its level, ordered in pre-order. Accessibles of level 0 are added
+        as children of the given node, or as roots if it is not given.
+
+        :return: A list of identifiers of added nodes
+        :rtype: list
+        '''
+        ids = []
+        stack = [parent]
+        for obj, level in accessibles:
+            del stack[level + 1:]
+            id = self.add(obj, stack[-1])
+            stack.append(id)
+            ids.append(id)
+        return ids
+
+    def load(self, accessible, depth=-1, expand=None, prune=None):
+        '''
+        Adds a tree of the given accessible walking it like
+        walkAccessibles() and returns a view of its root.
+
+        :rtype: NodeView
+        '''
+        log.debug("Load accessible tree to node table: %s" % accessible)
+        ids = self.extend(walkAccessibles(accessible, depth, expand, prune))
+        return self.view(ids[0])
+
+    def view(self, id):
+        '''
+        Returns a view of a node of the given identifier.
+
+        :rtype: NodeView
+        '''
+        return NodeView(self, id)
+
+    def children(self, id):
+        '''
+        Iterates over identifiers of children of the given node.
+        '''
+        child = self._firstChildren[id]
+        while child != _NONE:
+            yield child
+            child = self._nextSiblings[child]
+
+    def indexes(self, id):
+        '''
+        Returns a tuple of indexes of a path of the given node.
+
+        :rtype: tuple
+        '''
+        indexes = []
+        while self._parents[id] != _NONE:
+            indexes.append(str(self._indexes[id]))
+            id = self._parents[id]
+        indexes.extend(reversed([index for index in
+                                 self._rootPaths[id].split('/')[1:] if index]))
+        indexes.reverse()
+        return tuple(indexes)
+
+    def records(self, id):
+        '''
+        Iterates over a tree of the given node in pre-order without creating
+        views of nodes.
+
+        :return: An iterator of tuples of a path as a string, a name, a role,
+            a number of children and a level relative to the given node
+        :rtype: iterator
+        '''
+        values, names, roles = self._values, self._names, self._roles
+        counts, indexes = self._counts, self._indexes
+        firstChildren, nextSiblings = self._firstChildren, self._nextSiblings
+        path = '/' + '/'.join(self.indexes(id))
+        stack = [(id, path, 0)]
+        while stack:
+            id, path, level = stack.pop()
+            yield (path, values[names[id]], values[roles[id]], counts[id],
+                   level)
+            # Push children in reverse order so that the first one is next
+            children = []
+            child = firstChildren[id]
+            prefix = path if path.endswith('/') else path + '/'
+            while child != _NONE:
+                children.append((child, prefix + str(indexes[child]),
+                                 level + 1))
+                child = nextSiblings[child]
+            children.reverse()
+            stack.extend(children)
+
+    def parts(self, id):
+        '''
+        Returns serialized parts of the given node which precede and follow
+        its children.
+
+        :rtype: tuple
+        '''
+        if not self.elements:
+            raise ValueError("Elements of accessibles are not stored")
+        element, split = self._elements[id], self._splits[id]
+        return element[:split], element[split:]
+
+    def serialize(self, id):
+        '''
+        Serializes a tree of the given node in the same format as
+        a marshalled tree.
+
+        :rtype: string
+        '''
+        parts = []
+        stack = [(id, False)]
+        while stack:
+            id, closing = stack.pop()
+            head, tail = self.parts(id)
+            if closing:
+                parts.append(tail)
+                continue
+            parts.append(head)
+            stack.append((id, True))
+            stack.extend([(child, False) for child in
+                          reversed(list(self.children(id)))])
+        return ''.join(parts)
+
+
+class NodeView(object):
+    '''
+    A read-only view of a node of a table, which provides the same
+    attributes and methods as an accessible.
+    '''
+    __slots__ = ("_table", "_id", "_obj", "_indexes")
+
+    def __init__(self, table, id, indexes=None):
+        '''
+        :param table: A table of the node
+        :type table: NodeTable
+        :param id: An identifier of the node
+        :type id: integer
+        :param indexes: Indexes of a path of the node, if they are known
+        :type indexes: tuple
+        '''
+        self._table = table
+        self._id = id
+        self._obj = None
+        self._indexes = indexes
+
+    def __str__(self):
+        return str(self.path)
+
+    def _pathIndexes(self):
+        if self._indexes is None:
+            self._indexes = self._table.indexes(self._id)
+        return self._indexes
+
+    @property
+    def path(self):
+        return accessible.Path(*self._pathIndexes())
+
+    @property
+    def name(self):
+        return self._table._values[self._table._names[self._id]]
+
+    @property
+    def role(self):
+        return self._table._values[self._table._roles[self._id]]
+
+    @property
+    def count(self):
+        return self._table._counts[self._id]
+
+    @property
+    def level(self):
+        return self._table._levels[self._id]
+
+    @property
+    def states(self):
+        states = self._table._values[self._table._states[self._id]]
+        return list(states) if states is not None else None
+
+    @property
+    def attributes(self):
+        items = self._table._values[self._table._attributes[self._id]]
+        return dict(items) if items is not None else None
+
+    def __getattr__(self, name):
+        if name not in EXTRA_ATTRS:
+            raise AttributeError(name)
+        if not self._table.elements:
+            return None
+        if self._obj is None:
+            head, tail = self._table.parts(self._id)
+            self._obj = accessible.Accessible.unmarshal(
+                                                etree.fromstring(head + tail))
+        return getattr(self._obj, name)
+
+    def children(self, force=False):
+        '''
+        Iterates over views of children of the node.
+        '''
+        # Children get their paths from the path of the node
+        table = self._table
+        indexes = self._pathIndexes()
+        for id in table.children(self._id):
+            yield NodeView(table, id, indexes + (str(table._indexes[id]),))
+
+    def records(self):
+        '''
+        Iterates over basic attributes of nodes of a tree of the node,
+        like NodeTable.records().
+        '''
+        return self._table.records(self._id)
+
+    def elementParts(self):
+        '''
+        Returns serialized parts of the accessible which precede and follow
+        its children.
+
+        :rtype: tuple
+        '''
+        return self._table.parts(self._id)
+
+    def marshal(self):
+        '''
+        Marshals a tree of the node like an accessible.
+        '''
+        return etree.fromstring(self._table.serialize(self._id))
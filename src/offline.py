@@ -0,0 +1,336 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import os
+import sqlite3
+from xml.etree import cElementTree as etree
+
+from tadek.core import log
+from tadek.core import accessible
+
+from dumpfile import openDump, splitElement, PLACEHOLDER_TAG
+from nodetable import NodeTable
+from utils import RequestError
+
+__all__ = ["DumpIndex", "DumpDevice"]
+
+# A version of the index format
+_INDEX_VERSION = "1"
+
+# An extension of index files
+_INDEX_EXTENSION = ".idx"
+
+_SCHEMA = (
+    "CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE nodes (id INTEGER PRIMARY KEY, parent INTEGER, "
+        "path TEXT UNIQUE, level INTEGER, last INTEGER, name TEXT, "
+        "role TEXT, head TEXT, tail TEXT)",
+    "CREATE INDEX nodes_parent ON nodes (parent)",
+)
+
+def loadAccessible(data):
+    '''
+    Unmarshals an accessible tree from the given serialized XML.
+    '''
+    return accessible.Accessible.unmarshal(etree.fromstring(data))
+
+class DumpIndex(object):
+    '''
+    A class of an on-disk index of accessibles saved in a dump file.
+
+    The index is stored next to the dump file and it is rebuilt when
+    the dump file changes. Each accessible is stored without its
+    descendants, together with its path and a position in the tree.
+    '''
+    def __init__(self, fn):
+        '''
+        :param fn: A name of the dump file
+        :type fn: string
+        '''
+        self.fn = fn
+        self.indexFn = fn + _INDEX_EXTENSION
+        self._db = None
+
+    def _stamp(self):
+        '''
+        Returns a stamp identifying the current version of the dump file.
+        '''
+        stat = os.stat(self.fn)
+        return "%s:%d:%d" % (_INDEX_VERSION, stat.st_size, stat.st_mtime)
+
+    def _isValid(self):
+        '''
+        Checks if the index file exists and matches the dump file.
+        '''
+        if not os.path.isfile(self.indexFn):
+            return False
+        db = sqlite3.connect(self.indexFn)
+        try:
+            try:
+                row = db.execute("SELECT value FROM info "
+                                 "WHERE key = 'stamp'").fetchone()
+            except sqlite3.DatabaseError:
+                return False
+        finally:
+            db.close()
+        return row is not None and row[0] == self._stamp()
+
+    def build(self):
+        '''
+        Builds the index of the dump file parsing it incrementally.
+        '''
+        log.info("Build index of dump file: %s" % self.fn)
+        tmpFn = self.indexFn + ".tmp"
+        if os.path.exists(tmpFn):
+            os.remove(tmpFn)
+        db = sqlite3.connect(tmpFn)
+        try:
+            for statement in _SCHEMA:
+                db.execute(statement)
+            count = self._parse(db)
+            db.execute("INSERT INTO info VALUES ('stamp', ?)",
+                       (self._stamp(),))
+            db.commit()
+        finally:
+            db.close()
+        os.rename(tmpFn, self.indexFn)
+        log.info("Indexed %d accessibles of dump file: %s" % (count, self.fn))
+
+    def _parse(self, db):
+        '''
+        Parses the dump file and inserts its accessibles to the database.
+        '''
+        fd = openDump(self.fn)
+        try:
+            tag = None
+            elements = []
+            # Frames of open accessibles: [id, parent id, has placeholder]
+            frames = []
+            count = 0
+            for event, element in etree.iterparse(fd, ("start", "end")):
+                if event == "start":
+                    if tag is None:
+                        tag = element.tag
+                    elements.append(element)
+                    if element.tag == tag:
+                        parent = frames[-1][0] if frames else None
+                        frames.append([count, parent, False])
+                        count += 1
+                    continue
+                elements.pop()
+                if element.tag != tag:
+                    continue
+                id, parent, placeholder = frames.pop()
+                head, tail = splitElement(element)
+                obj = loadAccessible(head + tail)
+                db.execute("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, "
+                           "?, ?)", (id, parent, str(obj.path), len(frames),
+                                     count - 1, obj.name, obj.role,
+                                     head.decode("ascii"),
+                                     tail.decode("ascii")))
+                if frames:
+                    # Replace the accessible with a placeholder of children
+                    # of its parent to keep the parent element small
+                    container = elements[-1]
+                    if not frames[-1][2]:
+                        index = list(container).index(element)
+                        container.insert(index,
+                                         etree.Element(PLACEHOLDER_TAG))
+                        frames[-1][2] = True
+                    container.remove(element)
+            return count
+        finally:
+            fd.close()
+
+    def open(self):
+        '''
+        Opens the index building it first if it does not match the dump.
+        '''
+        if not os.path.isfile(self.fn):
+            raise RequestError("There is no such file: %s" % self.fn)
+        if not self._isValid():
+            self.build()
+        self._db = sqlite3.connect(self.indexFn, check_same_thread=False)
+        self._db.text_factory = str
+
+    def close(self):
+        '''
+        Closes the index.
+        '''
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def isOpen(self):
+        '''
+        Checks if the index is open.
+        '''
+        return self._db is not None
+
+    def find(self, path):
+        '''
+        Returns an identifier, level and identifier of the last descendant
+        of an accessible of the given path or None if there is no such path.
+        '''
+        return self._db.execute("SELECT id, level, last FROM nodes "
+                                "WHERE path = ?", (str(path),)).fetchone()
+
+    def root(self):
+        '''
+        Returns a path of the root accessible of the dump.
+        '''
+        return self._db.execute("SELECT path FROM nodes "
+                                "WHERE id = 0").fetchone()[0]
+
+    def select(self, path, depth=-1, name=None):
+        '''
+        Selects accessibles of a tree of the given path and depth, optionally
+        only ones of the given name.
+
+        :return: A list of pairs of a level relative to the path and
+            a serialized accessible, or None if there is no such path
+        :rtype: list
+        '''
+        node = self.find(path)
+        if node is None:
+            return None
+        id, level, last = node
+        if depth < 0:
+            depth = last
+        query = ("SELECT level, head, tail FROM nodes WHERE id BETWEEN ? "
+                 "AND ? AND level <= ?")
+        args = [id, last, level + depth]
+        if name is not None:
+            query += " AND name = ?"
+            args.append(name)
+        return [(row[0] - level, row[1] + row[2])
+                for row in self._db.execute(query + " ORDER BY id", args)]
+
+    def rows(self, path, depth=0):
+        '''
+        Returns rows of accessibles of a tree of the given path and depth
+        ordered in pre-order.
+
+        :return: An iterable of tuples of a level relative to the path and
+            serialized parts of an accessible which precede and follow
+            its children, or None if there is no such path
+        :rtype: iterable
+        '''
+        node = self.find(path)
+        if node is None:
+            return None
+        id, level, last = node
+        if depth < 0:
+            depth = last
+        return ((row[0] - level, row[1], row[2]) for row in self._db.execute(
+                        "SELECT level, head, tail FROM nodes WHERE id "
+                        "BETWEEN ? AND ? AND level <= ? ORDER BY id",
+                        (id, last, level + depth)))
+
+    def serialize(self, path, depth=0):
+        '''
+        Serializes a tree of the given path and depth in the same format
+        as a marshalled tree.
+
+        :return: Serialized XML of the tree or None if there is no such path
+        :rtype: string
+        '''
+        rows = self.rows(path, depth)
+        if rows is None:
+            return None
+        parts = []
+        tails = []
+        for level, head, tail in rows:
+            while tails and tails[-1][0] >= level:
+                parts.append(tails.pop()[1])
+            parts.append(head)
+            tails.append((level, tail))
+        while tails:
+            parts.append(tails.pop()[1])
+        return ''.join(parts)
+
+class DumpDevice(object):
+    '''
+    A read-only stand-in for a device which serves accessibles saved
+    in a dump file.
+    '''
+    def __init__(self, fn):
+        '''
+        :param fn: A name of the dump file
+        :type fn: string
+        '''
+        self.name = fn
+        self.index = DumpIndex(fn)
+
+    def __str__(self):
+        return self.name
+
+    def connect(self):
+        self.index.open()
+
+    def disconnect(self):
+        self.index.close()
+
+    def isConnected(self):
+        return self.index.isOpen()
+
+    def getAccessible(self, path, depth=0, **attrs):
+        '''
+        Returns a tree of the given path and depth as a view of a node table,
+        which is built accessible by accessible. All saved attributes of
+        accessibles are returned regardless of given ones.
+
+        :rtype: nodetable.NodeView
+        '''
+        rows = self.index.rows(path, depth)
+        if rows is None:
+            return None
+        table = NodeTable(elements=True)
+        parents = []
+        for level, head, tail in rows:
+            del parents[level:]
+            parents.append(table.add(loadAccessible(head + tail),
+                                     parents[-1] if parents else -1,
+                                     (head, tail)))
+        return table.view(0)
+
+    def _readOnly(self, *args, **kwargs):
+        raise RequestError("Request cannot be performed on dump file: %s"
+                           % self.name)
+
+    doAccessible = setAccessible = _readOnly
+    mouseEvent = keyboardEvent = _readOnly
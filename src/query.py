@@ -0,0 +1,307 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import re
+import time
+import shlex
+from collections import namedtuple
+
+from tadek.core import log
+
+from tree import walkAccessibles, fetchChildren
+from offline import DumpDevice, loadAccessible
+from nodetable import NodeTable
+
+__all__ = ["Query", "findAccessibles", "matchAccessibles", "clearSnapshots"]
+
+#: Time in seconds for which a snapshot of accessibles is reused
+SNAPSHOT_TIMEOUT = 30
+
+#: A maximum number of cached snapshots of accessibles
+SNAPSHOT_LIMIT = 8
+
+# States which descendants of an accessible have only if it has them too
+_INHERITED_STATES = ("SHOWING", "VISIBLE")
+
+# A number of indexes of paths of applications, which are children
+# of desktops, e.g. /0/3
+_APPLICATION_LEVEL = 2
+
+# A pattern of a query term
+_TERM_PATTERN = re.compile("^(!?)(role|name|state|depth|attr:[^=~<>]+)"
+                           "(=|~|<=|>=|<|>)(.*)$", re.DOTALL)
+
+# A record of an accessible in a snapshot
+_Record = namedtuple("_Record", "path level name role count states attributes")
+
+class Query(object):
+    '''
+    A class of queries filtering accessibles. A query consists of terms
+    separated by white spaces, all of them have to be met:
+        role=ROLE, role~REGEX  - a role of an accessible
+        name=NAME, name~REGEX  - a name of an accessible
+        state=STATE            - a state an accessible has
+        attr:KEY=VALUE, attr:KEY~REGEX - an attribute of an accessible
+        depth=N, depth<=N, ... - a depth relative to the searched path
+    A term preceded by '!' is negated. Values can be quoted.
+    '''
+    def __init__(self, text):
+        '''
+        :param text: A text of the query
+        :type text: string
+        '''
+        self.text = text
+        self.terms = []
+        #: A maximum depth of matching accessibles, -1 means no limit
+        self.maxDepth = -1
+        self._required = set()
+        for term in shlex.split(text):
+            match = _TERM_PATTERN.match(term)
+            if match is None:
+                raise ValueError("invalid term: %s" % term)
+            negate, field, operator, value = match.groups()
+            negate = bool(negate)
+            if field == "depth":
+                value = self._depth(term, operator, value, negate)
+            elif operator == '~':
+                value = re.compile(value)
+            elif operator != '=':
+                raise ValueError("invalid operator of term: %s" % term)
+            elif field in ("role", "state"):
+                value = value.upper()
+            if field == "state" and not negate:
+                self._required.add(value)
+            self.terms.append((negate, field, operator, value))
+        if not self.terms:
+            raise ValueError("empty query")
+
+    def _depth(self, term, operator, value, negate):
+        '''
+        Converts a value of the given depth term and updates the maximum
+        depth of the query.
+        '''
+        if operator == '~' or not value.isdigit():
+            raise ValueError("invalid depth term: %s" % term)
+        value = int(value)
+        if not negate and operator in ('=', '<=', '<'):
+            depth = value - 1 if operator == '<' else value
+            if self.maxDepth < 0 or depth < self.maxDepth:
+                self.maxDepth = depth
+        return value
+
+    def attributes(self):
+        '''
+        Returns a dictionary of accessible attributes required to match
+        the query, which can be passed to getAccessible() of a device.
+        '''
+        attrs = {}
+        for negate, field, operator, value in self.terms:
+            if field == "state":
+                attrs["states"] = True
+            elif field.startswith("attr:"):
+                attrs["attributes"] = True
+        return attrs
+
+    def prune(self, accessible):
+        '''
+        Checks if descendants of the given accessible cannot match
+        the query, because it lacks a state inherited by them.
+
+        Desktops and applications are never pruned, since they usually
+        have no such states while windows of applications do.
+        '''
+        if len([index for index in str(accessible.path).split('/')
+                if index]) <= _APPLICATION_LEVEL:
+            return False
+        states = accessible.states or []
+        for state in _INHERITED_STATES:
+            if state in self._required and state not in states:
+                return True
+        return False
+
+    def match(self, record):
+        '''
+        Checks if the given record of an accessible matches the query.
+        '''
+        for negate, field, operator, value in self.terms:
+            if field == "depth":
+                level = record.level
+                result = {
+                    '=': level == value,
+                    '<': level < value,
+                    '<=': level <= value,
+                    '>': level > value,
+                    '>=': level >= value,
+                }[operator]
+            elif field == "state":
+                result = value in (record.states or ())
+            else:
+                if field.startswith("attr:"):
+                    item = (record.attributes or {}).get(field[5:])
+                else:
+                    item = getattr(record, field)
+                if item is None:
+                    result = False
+                elif operator == '~':
+                    result = value.search(item) is not None
+                elif field == "role":
+                    result = item.upper() == value
+                else:
+                    result = item == value
+            if result == negate:
+                return False
+        return True
+
+def _record(accessible, level):
+    '''
+    Creates a snapshot record of the given accessible.
+    '''
+    return _Record(str(accessible.path), level, accessible.name,
+                   accessible.role, accessible.count,
+                   tuple(accessible.states or ()),
+                   dict(accessible.attributes or {}))
+
+# Cached snapshots of accessibles
+_snapshots = {}
+
+def _snapshot(device, path, query):
+    '''
+    Returns a snapshot of accessibles of the given device which can match
+    the given query, reusing a cached one if it is recent enough.
+
+    Snapshots are kept in node tables, records are their views.
+    '''
+    attrs = query.attributes()
+    key = (str(device), str(path), query.maxDepth,
+           tuple(sorted(attrs)), tuple(sorted(query._required)))
+    cached = _snapshots.get(key)
+    if cached is not None and time.time() - cached[0] < SNAPSHOT_TIMEOUT:
+        log.info("Use cached snapshot of accessibles: %s" % (key,))
+        table = cached[1]
+    else:
+        root = device.getAccessible(path, 0, **attrs)
+        if root is None:
+            return None
+        table = NodeTable()
+        table.load(root, query.maxDepth, fetchChildren(device, **attrs),
+                   query.prune)
+        if len(_snapshots) >= SNAPSHOT_LIMIT:
+            del _snapshots[min(_snapshots, key=lambda k: _snapshots[k][0])]
+        _snapshots[key] = (time.time(), table)
+    # Accessibles are added to the table in pre-order
+    return (table.view(id) for id in xrange(len(table)))
+
+def clearSnapshots(device=None):
+    '''
+    Discards cached snapshots of accessibles of the given device, or of all
+    devices. Snapshots are outdated by requests changing accessibles.
+
+    :param device: A device whose snapshots are discarded
+    :type device: tadek.connection.device.Device
+    '''
+    log.debug("Clear cached snapshots of accessibles of device: %s" % device)
+    for key in _snapshots.keys():
+        if device is None or key[0] == str(device):
+            _snapshots.pop(key, None)
+
+def _dumpRecords(device, path, query):
+    '''
+    Returns records of accessibles of the given dump device which can match
+    the given query using its index.
+    '''
+    filters = {}
+    for negate, field, operator, value in query.terms:
+        if not negate and operator == '=' and field == "name":
+            filters["name"] = value
+    rows = device.index.select(path, query.maxDepth, **filters)
+    if rows is None:
+        return None
+    records = []
+    for level, data in rows:
+        records.append(_record(loadAccessible(data), level))
+    return records
+
+def matchAccessibles(accessible, query, expand=None, limit=None):
+    '''
+    Returns records of accessibles of the given tree matching the given
+    query. The tree is walked only until the given number of matching
+    accessibles is found, so the rest of it is not fetched.
+
+    :param accessible: The root accessible of the tree
+    :type accessible: tadek.core.accessible.Accessible
+    :param query: A query to match
+    :type query: Query
+    :param expand: A function which fetches children of accessibles
+        of the tree which are not fetched yet, see walkAccessibles()
+    :type expand: function
+    :param limit: A maximum number of returned records, no limit if None
+    :type limit: integer
+    :rtype: list
+    '''
+    records = []
+    for node, level in walkAccessibles(accessible, query.maxDepth, expand,
+                                       query.prune):
+        record = _record(node, level)
+        if query.match(record):
+            records.append(record)
+            if len(records) == limit:
+                break
+    return records
+
+def findAccessibles(device, path, query):
+    '''
+    Finds accessibles matching the given query in a tree of the given path.
+
+    :param device: A connected device or a dump device to search
+    :type device: tadek.connection.device.Device
+    :param path: A path of the searched tree
+    :type path: tadek.core.accessible.Path
+    :param query: A query to match
+    :type query: Query
+    :return: A list of records of matching accessibles or None if there is
+        no such path
+    :rtype: list
+    '''
+    log.debug("Find accessibles of '%s' path matching query: %s"
+              % (path, query.text))
+    if isinstance(device, DumpDevice):
+        records = _dumpRecords(device, path, query)
+    else:
+        records = _snapshot(device, path, query)
+    if records is None:
+        return None
+    return [record for record in records if query.match(record)]
@@ -0,0 +1,754 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import sys
+import json
+import time
+import Queue
+import threading
+
+from tadek.core import log
+from tadek.engine import channels
+from tadek.engine.channels import TestResultChannel
+from tadek.engine.testresult import TestCaseResult
+from tadek.engine.testexec import STATUS_NOT_COMPLETED
+
+from history import ResultHistory
+from utils import pingDevice, connectDevices, CONNECT_TIMEOUT
+
+__all__ = ["HistoryChannel", "StatusChannel", "ProgressChannel",
+           "WatchdogChannel", "closeProgress", "testStatus"]
+
+#: A maximum number of progress events waiting to be written
+PROGRESS_BUFFER = 1000
+
+#: A name of the progress output standing for the standard output
+PROGRESS_STDOUT = "-"
+
+#: A time in seconds between checks of deadlines of running tests if
+#: devices are not pinged
+WATCHDOG_INTERVAL = 5.0
+
+#: A default number of pings in a row which a device has to miss while its
+#: connection is idle to be considered hung
+WATCHDOG_MISSES = 2
+
+# Methods of devices sending requests of tests to them
+_REQUEST_METHODS = ("getAccessible", "setAccessible", "doAccessible",
+                    "mouseEvent", "keyboardEvent")
+
+# Tests aborted by watchdog channels by their identifiers and names of
+# their devices
+_aborted = set()
+
+# A lock of aborted tests
+_abortedLock = threading.Lock()
+
+def _isAborted(result, device):
+    '''
+    Checks if the given test was aborted on the given device by a watchdog
+    channel.
+    '''
+    _abortedLock.acquire()
+    try:
+        return (result.id, device.name) in _aborted
+    finally:
+        _abortedLock.release()
+
+def testStatus(result, device):
+    '''
+    Returns a status of the given test executed on the given device, which
+    is the not completed status if the test was aborted by a watchdog
+    channel. Tests are aborted before they stop, so channels get the same
+    status regardless of their order.
+
+    :param result: A result of the test
+    :param device: A result of the test on the device
+    :rtype: string
+    '''
+    if _isAborted(result, device):
+        return STATUS_NOT_COMPLETED
+    return device.status
+
+
+class HistoryChannel(TestResultChannel):
+    '''
+    A channel recording statuses, durations and devices of executed test
+    cases in the history of test results.
+    '''
+    def __init__(self, name, history, **params):
+        '''
+        :param history: A name of a file of the history of test results
+        :type history: string
+        '''
+        TestResultChannel.__init__(self, name, **params)
+        self._file = history
+        # The history is open only while the channel is started, so it is
+        # not open in processes in which the channel is not used
+        self._history = None
+        self._started = {}
+        self._lock = threading.Lock()
+        # The channel can be shared by many runners of the same result
+        self._runners = 0
+        #: An identifier of the run recorded by the channel
+        self.run = None
+        #: A number of the attempt of the run, greater than 0 for retries
+        self.attempt = 0
+
+    def start(self, result):
+        TestResultChannel.start(self, result)
+        self._lock.acquire()
+        try:
+            self._runners += 1
+            if self._history is None:
+                self._history = ResultHistory(self._file)
+            if self.run is None:
+                self.run = self._history.startRun()
+        finally:
+            self._lock.release()
+
+    def startTest(self, result, device):
+        TestResultChannel.startTest(self, result, device)
+        if not isinstance(result, TestCaseResult):
+            return
+        self._lock.acquire()
+        try:
+            self._started[(result.id, device.name)] = time.time()
+        finally:
+            self._lock.release()
+
+    def stopTest(self, result, device):
+        TestResultChannel.stopTest(self, result, device)
+        self._lock.acquire()
+        try:
+            started = self._started.pop((result.id, device.name), None)
+        finally:
+            self._lock.release()
+        if started is None:
+            return
+        duration = time.time() - started
+        status = testStatus(result, device)
+        log.debug("Record result of '%s' test on '%s' device: %s, %.3fs"
+                  % (result.id, device.name, status, duration))
+        self._history.addResult(self.run, result.id, device.name, status,
+                                duration, self.attempt)
+
+    def addUnreported(self, test, device, status):
+        '''
+        Records a status of the given test case which was not reported by
+        a test runner, like one of a crashed worker process. Its duration is
+        unknown.
+        '''
+        if self._history is not None and self.run is not None:
+            self._history.addResult(self.run, test, device, status, None,
+                                    self.attempt)
+
+    def stop(self):
+        TestResultChannel.stop(self)
+        self._lock.acquire()
+        try:
+            self._runners -= 1
+            if self._runners > 0:
+                return
+            # Runners of the result can start after others stopped
+            history, self._history = self._history, None
+        finally:
+            self._lock.release()
+        if history is not None:
+            history.close()
+
+channels.register(HistoryChannel)
+
+
+class StatusChannel(TestResultChannel):
+    '''
+    A channel collecting final statuses of executed test cases in memory.
+    '''
+    def __init__(self, name, **params):
+        TestResultChannel.__init__(self, name, **params)
+        self._lock = threading.Lock()
+        #: A dictionary of pairs of test case identifiers and names of
+        #: devices, and statuses of the test cases on the devices
+        self.statuses = {}
+        #: A number of test cases whose statuses were not reported by test
+        #: runners and are missing in the summary of the run
+        self.unreported = 0
+
+    def setStatus(self, test, device, status):
+        '''
+        Sets a status of the given test executed on the given device.
+
+        :param test: An identifier of the test
+        :type test: string
+        :param device: A name of the device
+        :type device: string
+        :param status: A status of the test
+        :type status: string
+        '''
+        self._lock.acquire()
+        try:
+            self.statuses[(test, device)] = status
+        finally:
+            self._lock.release()
+
+    def setUnreported(self, test, device, status, count=1):
+        '''
+        Sets a status of the given test which was not reported by a test
+        runner, like one of a crashed worker process.
+
+        :param count: A number of test cases the test stands for
+        :type count: integer
+        '''
+        self.setStatus(test, device, status)
+        self._lock.acquire()
+        try:
+            self.unreported += count
+        finally:
+            self._lock.release()
+
+    def stopTest(self, result, device):
+        TestResultChannel.stopTest(self, result, device)
+        if isinstance(result, TestCaseResult):
+            self.setStatus(result.id, device.name,
+                           testStatus(result, device))
+
+channels.register(StatusChannel)
+
+
+class _ProgressWriter(object):
+    '''
+    A thread writing queued progress events to an output, which stays open
+    for all attempts of a run.
+    '''
+    def __init__(self, output, buffer):
+        self.output = output
+        self.queue = Queue.Queue(int(buffer))
+        self._thread = threading.Thread(target=self._write)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _write(self):
+        '''
+        Writes queued events until the writer is closed. Opening a FIFO
+        blocks until a reader appears, so it is done in the thread as well.
+        '''
+        fd = None
+        try:
+            if self.output == PROGRESS_STDOUT:
+                fd = sys.stdout
+            else:
+                fd = open(self.output, 'w')
+        except IOError, err:
+            log.error("Failed to open progress output '%s': %s"
+                      % (self.output, err))
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            if fd is None:
+                continue
+            try:
+                fd.write(json.dumps(event) + '\n')
+                fd.flush()
+            except IOError, err:
+                log.error("Failed to write progress output '%s': %s"
+                          % (self.output, err))
+                if fd is not sys.stdout:
+                    fd.close()
+                fd = None
+        if fd is not None and fd is not sys.stdout:
+            fd.close()
+
+    def close(self):
+        '''
+        Writes remaining events and closes the output, but never waits long
+        for a consumer which does not read.
+        '''
+        try:
+            self.queue.put(None, timeout=1.0)
+        except Queue.Full:
+            log.warning("Progress output '%s' is stalled" % self.output)
+            return
+        self._thread.join(1.0)
+
+# Progress writers by their outputs
+_writers = {}
+
+# A lock of progress writers
+_writersLock = threading.Lock()
+
+def closeProgress():
+    '''
+    Closes outputs of progress channels. Outputs stay open after the channels
+    stop, so retries of a run are written to the same output.
+    '''
+    _writersLock.acquire()
+    try:
+        writers = _writers.values()
+        _writers.clear()
+    finally:
+        _writersLock.release()
+    for writer in writers:
+        writer.close()
+
+
+class ProgressChannel(TestResultChannel):
+    '''
+    A channel emitting one JSON line per test event to the standard output,
+    a file or a FIFO as soon as the event happens.
+
+    Events are written by a separate thread and at most the given number of
+    them is buffered, so a slow consumer never stalls test runners. Events
+    which do not fit in the buffer are dropped and their number is reported
+    in the last event of the run. The output is shared by channels of all
+    attempts of the run, until closeProgress() is called.
+    '''
+    def __init__(self, name, output=PROGRESS_STDOUT, buffer=PROGRESS_BUFFER,
+                 **params):
+        '''
+        :param output: A path to a file or a FIFO, or PROGRESS_STDOUT
+        :type output: string
+        :param buffer: A maximum number of buffered events
+        :type buffer: integer
+        '''
+        TestResultChannel.__init__(self, name, **params)
+        self._output = output
+        self._buffer = buffer
+        self._started = {}
+        self._lock = threading.Lock()
+        self._runners = 0
+        self._queue = None
+        #: A number of dropped events
+        self.dropped = 0
+
+    def _emit(self, event, **fields):
+        '''
+        Queues an event of the given type and fields or drops it if the buffer
+        is full.
+        '''
+        queue = self._queue
+        if queue is None:
+            return
+        fields["event"] = event
+        fields["time"] = time.time()
+        try:
+            queue.put_nowait(fields)
+        except Queue.Full:
+            self._lock.acquire()
+            try:
+                self.dropped += 1
+            finally:
+                self._lock.release()
+
+    def start(self, result):
+        TestResultChannel.start(self, result)
+        self._lock.acquire()
+        try:
+            self._runners += 1
+            if self._queue is not None:
+                return
+            _writersLock.acquire()
+            try:
+                writer = _writers.get(self._output)
+                if writer is None:
+                    writer = _ProgressWriter(self._output, self._buffer)
+                    _writers[self._output] = writer
+            finally:
+                _writersLock.release()
+            self._queue = writer.queue
+        finally:
+            self._lock.release()
+        self._emit("run-start")
+
+    def startTest(self, result, device):
+        TestResultChannel.startTest(self, result, device)
+        self._lock.acquire()
+        try:
+            self._started[(result.id, device.name)] = time.time()
+        finally:
+            self._lock.release()
+        self._emit("start", test=result.id, device=device.name,
+                   case=isinstance(result, TestCaseResult))
+
+    def stopTest(self, result, device):
+        TestResultChannel.stopTest(self, result, device)
+        self._lock.acquire()
+        try:
+            started = self._started.pop((result.id, device.name), None)
+        finally:
+            self._lock.release()
+        duration = time.time() - started if started is not None else None
+        self._emit("finish", test=result.id, device=device.name,
+                   case=isinstance(result, TestCaseResult),
+                   status=testStatus(result, device), duration=duration)
+
+    def stop(self):
+        TestResultChannel.stop(self)
+        self._lock.acquire()
+        try:
+            self._runners -= 1
+            if self._runners > 0 or self._queue is None:
+                return
+            queue, self._queue = self._queue, None
+        finally:
+            self._lock.release()
+        # The last event is queued blocking, but never waits for a consumer
+        # which does not read
+        try:
+            queue.put({"event": "run-stop", "time": time.time(),
+                       "dropped": self.dropped}, timeout=1.0)
+        except Queue.Full:
+            log.warning("Progress output '%s' is stalled" % self._output)
+
+channels.register(ProgressChannel)
+
+
+class _DeviceRequests(object):
+    '''
+    Requests of tests sent to a device, which are counted to tell if its
+    connection is idle. The device is pinged using its original methods,
+    so pings are not counted.
+    '''
+    def __init__(self, device):
+        self.name = device.name
+        self._device = device
+        self._lock = threading.Lock()
+        self._methods = {}
+        # Methods which were set on the device itself, not by its class
+        self._own = set()
+        self._pending = 0
+        self._sent = 0
+        for name in _REQUEST_METHODS:
+            method = getattr(device, name, None)
+            if method is None:
+                continue
+            if name in vars(device):
+                self._own.add(name)
+            self._methods[name] = method
+            setattr(device, name, self._counted(method))
+
+    def _counted(self, method):
+        '''
+        Wraps the given method of the device to count its requests.
+        '''
+        def wrapper(*args, **kwargs):
+            self._lock.acquire()
+            try:
+                self._pending += 1
+                self._sent += 1
+            finally:
+                self._lock.release()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._lock.acquire()
+                try:
+                    self._pending -= 1
+                finally:
+                    self._lock.release()
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def state(self):
+        '''
+        Returns numbers of requests in flight and of all sent requests.
+
+        :rtype: tuple
+        '''
+        self._lock.acquire()
+        try:
+            return self._pending, self._sent
+        finally:
+            self._lock.release()
+
+    def getAccessible(self, *args, **kwargs):
+        return self._methods["getAccessible"](*args, **kwargs)
+
+    def restore(self):
+        '''
+        Restores original methods of the device.
+        '''
+        for name, method in self._methods.iteritems():
+            if name in self._own:
+                setattr(self._device, name, method)
+            else:
+                delattr(self._device, name)
+
+
+class WatchdogChannel(TestResultChannel):
+    '''
+    A channel watching tests running on devices.
+
+    A test case or a test suite which exceeds its deadline, or a test case
+    running on a device which misses pings while its connection is idle, is
+    aborted by disconnecting the device, which makes its pending request
+    fail. When the aborted test is finished, the device is reconnected. If
+    it cannot be reconnected, it is quarantined and its further tests fail
+    at once. Aborted tests and tests started on the device until then have
+    the not completed status, see testStatus(). Other devices run their
+    tests undisturbed.
+    '''
+    def __init__(self, name, testTimeout=None, suiteTimeout=None,
+                 interval=None, misses=WATCHDOG_MISSES, **params):
+        '''
+        :param testTimeout: A deadline of a test case in seconds, none if 0
+        :type testTimeout: float
+        :param suiteTimeout: A deadline of a test suite in seconds, none if 0
+        :type suiteTimeout: float
+        :param interval: Time in seconds between pings of devices running
+            test cases, devices are not pinged if 0
+        :type interval: float
+        :param misses: A number of pings in a row which a device has to miss
+            while its connection is idle to be considered hung
+        :type misses: integer
+        '''
+        TestResultChannel.__init__(self, name, **params)
+        self._testTimeout = float(testTimeout or 0)
+        self._suiteTimeout = float(suiteTimeout or 0)
+        self._interval = float(interval or 0)
+        self._misses = int(misses)
+        self._devices = {}
+        # Requests of tests sent to pinged devices by names of the devices
+        self._requests = {}
+        # Numbers of pings in a row missed by devices
+        self._missed = {}
+        # Start times of running tests by their identifiers and device names
+        self._running = {}
+        # Devices disconnected until aborted tests are finished
+        self._suspended = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._runners = 0
+        #: A list of tuples of aborted test cases, names of their devices,
+        #: times in seconds lost to them and statuses reported by runners
+        self.hangs = []
+        #: A list of names of quarantined devices
+        self.quarantined = []
+
+    def setDevices(self, devices):
+        '''
+        Sets devices to watch. If devices are pinged, their requests are
+        counted until the channel stops.
+
+        :param devices: A list of devices
+        :type devices: list [tadek.connection.device.Device]
+        '''
+        self._restoreDevices()
+        self._devices = dict([(device.name, device) for device in devices])
+        if self._interval:
+            self._requests = dict([(device.name, _DeviceRequests(device))
+                                   for device in devices])
+
+    def _restoreDevices(self):
+        '''
+        Stops counting requests of watched devices.
+        '''
+        requests, self._requests = self._requests, {}
+        for deviceRequests in requests.itervalues():
+            deviceRequests.restore()
+
+    def _reconnect(self, device):
+        '''
+        Reconnects the given device or quarantines it if it is unreachable.
+        '''
+        connected, failed = connectDevices([device], CONNECT_TIMEOUT)
+        if failed:
+            log.error("Device '%s' is quarantined: %s"
+                      % (device.name, failed[0][1]))
+            self._lock.acquire()
+            try:
+                self.quarantined.append(device.name)
+            finally:
+                self._lock.release()
+        else:
+            log.info("Device '%s' is reconnected" % device.name)
+
+    def _abort(self, name, test, reason):
+        '''
+        Aborts tests running on the given device until the given test is
+        finished.
+        '''
+        device = self._devices.get(name)
+        if device is None:
+            return
+        log.error("Abort tests running on '%s' device: %s" % (name, reason))
+        self._lock.acquire()
+        try:
+            _abortedLock.acquire()
+            try:
+                for key in self._running:
+                    if key[1] == name:
+                        _aborted.add(key)
+            finally:
+                _abortedLock.release()
+            self._suspended[name] = test
+            self._missed.pop(name, None)
+        finally:
+            self._lock.release()
+        try:
+            device.disconnect()
+        except Exception, err:
+            log.warning("Failed to disconnect '%s' device: %s" % (name, err))
+
+    def _ping(self, requests):
+        '''
+        Pings the device of the given requests if its connection is idle.
+
+        :return: True if the device answered, False if it missed the ping
+            while its connection was idle, None otherwise
+        :rtype: boolean
+        '''
+        pending, sent = requests.state()
+        if pending:
+            return None
+        try:
+            pingDevice(requests, self._interval)
+        except Exception, err:
+            # A request of a test sent meanwhile delays the ping
+            if requests.state() != (0, sent):
+                return None
+            log.warning("Device '%s' missed a ping: %s" % (requests.name, err))
+            return False
+        return True
+
+    def _check(self):
+        '''
+        Checks deadlines of running tests and pings devices which run test
+        cases longer than the interval of pings.
+        '''
+        now = time.time()
+        self._lock.acquire()
+        _abortedLock.acquire()
+        try:
+            running = [(key, started, case) for key, (started, case)
+                       in self._running.iteritems()
+                       if key not in _aborted
+                       and key[1] not in self._suspended]
+        finally:
+            _abortedLock.release()
+            self._lock.release()
+        probed = set()
+        for (test, name), started, case in running:
+            timeout = self._testTimeout if case else self._suiteTimeout
+            if timeout and now - started > timeout:
+                self._abort(name, test, "'%s' test exceeded %gs deadline"
+                                        % (test, timeout))
+            elif (case and now - started > self._interval and
+                  name not in probed and name in self._requests):
+                probed.add(name)
+                answered = self._ping(self._requests[name])
+                if answered is None:
+                    continue
+                misses = 0 if answered else self._missed.get(name, 0) + 1
+                self._missed[name] = misses
+                if misses >= self._misses:
+                    self._abort(name, test, "device missed %d pings in a row"
+                                            % misses)
+
+    def _watch(self):
+        while not self._stopped.isSet():
+            self._stopped.wait(self._interval or WATCHDOG_INTERVAL)
+            if not self._stopped.isSet():
+                self._check()
+
+    def start(self, result):
+        TestResultChannel.start(self, result)
+        self._lock.acquire()
+        try:
+            self._runners += 1
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._watch)
+            self._thread.setDaemon(True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+
+    def startTest(self, result, device):
+        TestResultChannel.startTest(self, result, device)
+        key = (result.id, device.name)
+        self._lock.acquire()
+        try:
+            self._running[key] = (time.time(),
+                                  isinstance(result, TestCaseResult))
+            _abortedLock.acquire()
+            try:
+                # Tests started on a suspended device are not completed
+                if device.name in self._suspended:
+                    _aborted.add(key)
+                else:
+                    _aborted.discard(key)
+            finally:
+                _abortedLock.release()
+        finally:
+            self._lock.release()
+
+    def stopTest(self, result, device):
+        TestResultChannel.stopTest(self, result, device)
+        key = (result.id, device.name)
+        self._lock.acquire()
+        try:
+            started, case = self._running.pop(key, (None, None))
+            suspended = self._suspended.get(device.name)
+            if suspended == result.id:
+                del self._suspended[device.name]
+        finally:
+            self._lock.release()
+        if _isAborted(result, device) and started is not None and case:
+            self.hangs.append((result.id, device.name,
+                               time.time() - started, device.status))
+        if suspended == result.id and device.name in self._devices:
+            self._reconnect(self._devices[device.name])
+
+    def stop(self):
+        TestResultChannel.stop(self)
+        self._lock.acquire()
+        try:
+            self._runners -= 1
+            if self._runners > 0 or self._thread is None:
+                return
+            thread, self._thread = self._thread, None
+        finally:
+            self._lock.release()
+        self._stopped.set()
+        thread.join()
+        self._restoreDevices()
+
+channels.register(WatchdogChannel)
@@ -0,0 +1,108 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import heapq
+
+from tadek.core import log
+
+__all__ = ["splitSuites", "orderSuites"]
+
+def _estimate(suites, history):
+    '''
+    Estimates durations of the given test suites using the history of test
+    results. Test cases of unknown durations are estimated using an average
+    duration of known ones or count as one second if none is known.
+    '''
+    average = history.averageDuration() if history is not None else None
+    if average is None:
+        average = 1.0
+    estimates = []
+    for suite in suites:
+        count = suite.count()
+        total, known = 0.0, 0
+        if history is not None:
+            total, known = history.duration(suite.id)
+            known = min(known, count)
+        estimates.append(total + (count - known) * average)
+    return estimates
+
+def splitSuites(suites, devices, history=None):
+    '''
+    Splits the given test suites into shards of similar estimated durations,
+    one per device, assigning the longest suites first.
+
+    :param suites: Test suites to split
+    :type suites: list
+    :param devices: Devices to run the shards on
+    :type devices: list [tadek.connection.device.Device]
+    :param history: A history of test results to estimate durations with,
+        if it is not given suites are split by numbers of test cases
+    :type history: history.ResultHistory
+    :return: A list of pairs of a device and a list of its test suites
+    :rtype: list
+    '''
+    estimates = _estimate(suites, history)
+    shards = [(device, []) for device in devices]
+    loads = [(0.0, i) for i in xrange(len(devices))]
+    order = sorted(xrange(len(suites)), key=lambda i: -estimates[i])
+    for i in order:
+        load, index = heapq.heappop(loads)
+        shards[index][1].append(suites[i])
+        heapq.heappush(loads, (load + estimates[i], index))
+    for load, index in sorted(loads, key=lambda item: item[1]):
+        log.info("Shard of '%s' device: %d suites, estimated %.1fs"
+                 % (shards[index][0], len(shards[index][1]), load))
+    return shards
+
+def orderSuites(suites, history):
+    '''
+    Orders the given test suites so that ones which failed recently, and
+    flaky ones especially, are run first.
+
+    :param suites: Test suites to order
+    :type suites: list
+    :param history: A history of test results
+    :type history: history.ResultHistory
+    :return: An ordered list of the test suites
+    :rtype: list
+    '''
+    scores = dict([(id(suite), history.failureScore(suite.id))
+                   for suite in suites])
+    log.info("Failure scores of test suites: %s"
+             % ", ".join(["%s=%.2f" % (suite.id, scores[id(suite)])
+                          for suite in suites]))
+    return sorted(suites, key=lambda suite: -scores[id(suite)])
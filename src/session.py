@@ -0,0 +1,215 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import os
+import sys
+import json
+import errno
+import socket
+import threading
+import SocketServer
+
+from tadek.core import log
+
+import explore
+from utils import startCapture, stopCapture
+
+__all__ = ["SessionServer", "sendRequest"]
+
+#: Default time in seconds after which an idle client session is closed
+IDLE_TIMEOUT = 300
+
+# Options of requests which are names of files
+_FILE_OPTIONS = ("set-text-file", "output")
+
+class _SessionHandler(SocketServer.StreamRequestHandler):
+    '''
+    A handler of a client session. Each line received from the client is
+    a JSON object of request options and each reply is a JSON object too.
+    '''
+    def handle(self):
+        log.info("Client session started")
+        self.connection.settimeout(self.server.idleTimeout)
+        while True:
+            try:
+                line = self.rfile.readline()
+            except socket.timeout:
+                log.info("Client session timed out")
+                break
+            if not line:
+                break
+            try:
+                options = json.loads(line)
+            except ValueError, err:
+                reply = {"status": 2, "output": '',
+                         "errors": "Invalid request: %s\n" % err}
+            else:
+                reply = self.server.perform(options)
+            self.wfile.write(json.dumps(reply) + '\n')
+            self.wfile.flush()
+        log.info("Client session finished")
+
+class SessionServer(SocketServer.ThreadingMixIn,
+                    SocketServer.UnixStreamServer):
+    '''
+    A server which keeps a device connected and performs requests of many
+    clients received through a local UNIX socket.
+    '''
+    daemon_threads = True
+
+    def __init__(self, path, device, idleTimeout=IDLE_TIMEOUT):
+        '''
+        :param path: A path of the UNIX socket to listen on
+        :type path: string
+        :param device: A device to perform requests on
+        :type device: tadek.connection.device.Device
+        :param idleTimeout: Time in seconds after which idle sessions are closed
+        :type idleTimeout: float
+        '''
+        if os.path.exists(path):
+            self._removeStaleSocket(path)
+        SocketServer.UnixStreamServer.__init__(self, path, _SessionHandler)
+        self.path = path
+        self.device = device
+        self.idleTimeout = idleTimeout
+        self._lock = threading.Lock()
+
+    def _removeStaleSocket(self, path):
+        '''
+        Removes the given socket file if no server listens on it.
+        '''
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                sock.connect(path)
+            except socket.error:
+                log.info("Remove stale socket: %s" % path)
+                os.remove(path)
+            else:
+                raise explore.RequestError("Socket is already in use: %s"
+                                           % path)
+        finally:
+            sock.close()
+
+    def _connect(self):
+        '''
+        Connects the device if it is not connected.
+        '''
+        if not self.device.isConnected():
+            log.info("Connect to device: %s" % self.device)
+            self.device.connect()
+
+    def perform(self, options):
+        '''
+        Performs a request of the given options on the device.
+
+        :return: A reply containing a status and an output of the request
+        :rtype: dictionary
+        '''
+        log.debug("Perform a request of options: %s" % options)
+        self._lock.acquire()
+        startCapture()
+        try:
+            try:
+                self._connect()
+                status = explore.executeRequest(self.device, options)
+            except explore.RequestError, err:
+                print >> sys.stderr, err
+                status = 2
+            except Exception, err:
+                # Drop the connection so it is reestablished next time
+                log.exception(err)
+                print >> sys.stderr, err
+                if self.device.isConnected():
+                    self.device.disconnect()
+                status = 2
+        finally:
+            output, errors = stopCapture()
+            self._lock.release()
+        return {"status": status, "output": output, "errors": errors}
+
+    def serve(self):
+        '''
+        Serves requests until the server is interrupted.
+        '''
+        log.info("Serve requests on socket: %s" % self.path)
+        try:
+            self._connect()
+            self.serve_forever()
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            if self.device.isConnected():
+                self.device.disconnect()
+
+def sendRequest(path, options):
+    '''
+    Sends a request of the given options to a server listening on the
+    specified UNIX socket and prints its output. Names of files are made
+    absolute, since the server can run in another directory.
+
+    :return: An exit status of the request
+    :rtype: integer
+    '''
+    log.debug("Send a request to '%s' socket: %s" % (path, options))
+    options = dict(options)
+    for name in _FILE_OPTIONS:
+        if name in options:
+            options[name] = os.path.abspath(options[name])
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path)
+        except socket.error, err:
+            if err.args[0] in (errno.ENOENT, errno.ECONNREFUSED):
+                raise explore.RequestError("No server listens on socket: %s"
+                                           % path)
+            raise
+        fd = sock.makefile("rwb")
+        fd.write(json.dumps(options) + '\n')
+        fd.flush()
+        line = fd.readline()
+        fd.close()
+    finally:
+        sock.close()
+    if not line:
+        raise explore.RequestError("Server closed the connection")
+    reply = json.loads(line)
+    sys.stdout.write(reply["output"].encode("utf-8"))
+    sys.stderr.write(reply["errors"].encode("utf-8"))
+    return reply["status"]
@@ -34,6 +34,8 @@
 ##                                                                            ##
 ################################################################################
 
+import time
+
 from tadek.core import log
 from tadek.core import location
 from tadek.engine import channels
@@ -45,14 +47,246 @@ from tadek.engine.channels.summarychannel import COUNTER_CORE_DUMPS, \
 from tadek.engine.testexec import STATUS_NO_RUN, STATUS_NOT_COMPLETED, \
                             STATUS_PASSED, STATUS_FAILED, STATUS_ERROR
 
-from utils import exitWithStatus, printSeparator
+import timing
+# Registers channels of test runs
+import runchannels
+from history import ResultHistory, STATUSES_FAILED
+from schedule import splitSuites, orderSuites
+from workers import runWorkers
+from discovery import TestIndex, testRoots, KIND_CASE
+from utils import exitWithStatus, exitWithError, printSeparator
+from utils import connectDevices, CONNECT_TIMEOUT
 
 #: Name of a summary channel
 SUMMARY_CHANNEL = "_summary"
 
-def runTestCases(tests, locations, devices):
+#: Name of a channel recording the history of test results
+HISTORY_CHANNEL = "_history"
+
+#: Name of a channel collecting final statuses of test cases
+STATUS_CHANNEL = "_status"
+
+#: Name of a channel emitting progress of test runs
+PROGRESS_CHANNEL = "_progress"
+
+#: Name of a channel aborting hung tests
+WATCHDOG_CHANNEL = "_watchdog"
+
+#: Time in seconds between checks if test runners are finished
+JOIN_INTERVAL = 1.0
+
+@timing.timed("connect devices")
+def _connectDevices(devices, timeout):
+    '''
+    Connects the given devices and reports ones which are unreachable.
+
+    :return: A list of connected devices
+    :rtype: list
+    '''
+    connected, failed = connectDevices(devices, timeout)
+    if failed:
+        print "Devices excluded from the run:"
+        for device, error in failed:
+            log.warning("Device '%s' excluded from the run: %s"
+                        % (device, error))
+            print "\t%s (%s:%d): %s" % ((device.name,) +
+                                        tuple(device.address) + (error,))
+        printSeparator()
+        print
+    if not connected:
+        exitWithError("None of devices is available")
+    return connected
+
+def _seconds(value):
+    '''
+    Converts the given run time to seconds.
+    '''
+    if hasattr(value, "days"):
+        return value.days * 86400 + value.seconds + value.microseconds / 1e6
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        seconds = 0.0
+        for part in str(value).split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+
+def _recordRunTime(history, results):
+    '''
+    Records total execution time of the given results of a run and its
+    retries in the history of test results.
+    '''
+    run = results[0].get(name=HISTORY_CHANNEL)[0].run
+    if run is None:
+        return
+    runTime = sum([_seconds(result.get(name=SUMMARY_CHANNEL)[0]
+                                  .getSummary()[COUNTER_RUN_TIME])
+                   for result in results])
+    store = ResultHistory(history)
+    try:
+        store.setRunTime(run, runTime)
+    finally:
+        store.close()
+
+def _suiteCases(locations, index=None):
+    '''
+    Returns a function listing test cases of test suites of the given
+    locations using the given index of test cases, or a temporary one kept
+    in memory.
+    '''
+    def cases(suites):
+        store = TestIndex(index or ":memory:")
+        try:
+            store.update(testRoots(locations))
+            return dict([(suite, [name for name, kind
+                                  in store.tests([suite], KIND_CASE)])
+                         for suite in suites])
+        finally:
+            store.close()
+    return cases
+
+@timing.timed("run tests")
+def _runShards(shards, result, processes=False, cases=None):
+    '''
+    Runs the given shards of test suites, each one on its own devices,
+    storing results in the given test result. If processes are enabled,
+    each shard is run in a separate worker process, and test cases of
+    crashed workers are listed using the given function.
+
+    :return: True if the run was interrupted, False otherwise
+    :rtype: boolean
+    '''
+    if processes:
+        # Devices are watched by worker processes
+        return runWorkers(shards, result, result.get(name=STATUS_CHANNEL)[0],
+                          cases)
+    runners = [TestRunner(shardDevices, deviceSuites, result)
+               for shardDevices, deviceSuites in shards if deviceSuites]
+    for watchdog in result.get(name=WATCHDOG_CHANNEL):
+        watchdog.setDevices([device for shardDevices, deviceSuites in shards
+                             for device in shardDevices])
+    try:
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            # Joining with a timeout keeps the run interruptible
+            while runner.isAlive():
+                runner.join(JOIN_INTERVAL)
+    except KeyboardInterrupt:
+        for runner in runners:
+            runner.stop()
+        return True
+    return False
+
+def _retryShards(loader, statuses, devices):
+    '''
+    Assigns failed test cases of the given statuses to devices following
+    the ones the test cases failed on, so they are retried elsewhere if
+    only there is more than one device.
+
+    :return: A list of pairs of lists of devices and test suites
+    :rtype: list
+    '''
+    names = [device.name for device in devices]
+    cases = {}
+    for (test, name), status in sorted(statuses.iteritems()):
+        if status not in STATUSES_FAILED:
+            continue
+        index = names.index(name) + 1 if name in names else 0
+        tests = cases.setdefault(index % len(devices), [])
+        if test not in tests:
+            tests.append(test)
+    shards = []
+    for index, tests in sorted(cases.iteritems()):
+        suites, errors = loader.loadFromNames(*tests)
+        for error in errors:
+            log.warning("Failed to load '%s' test case to retry it:\n%s"
+                        % (error.name, error.traceback))
+        shards.append(([devices[index]], suites))
+    return shards
+
+def _mergeStatuses(statuses, retried):
+    '''
+    Updates the given statuses of test cases on devices with the given
+    statuses of their retries, which replace failed statuses of the same
+    test cases on any device.
+    '''
+    tests = set([test for test, device in retried])
+    for key, status in statuses.items():
+        if key[0] in tests and status in STATUSES_FAILED:
+            del statuses[key]
+    statuses.update(retried)
+
+@timing.timed("discover tests")
+def _resolveTests(index, tests, locations):
+    '''
+    Resolves the given test names using the given index of test cases.
+    '''
+    store = TestIndex(index)
+    try:
+        store.update(testRoots(locations))
+        resolved = store.resolve(tests)
+    finally:
+        store.close()
+    log.info("Resolved test names: %s" % ", ".join(resolved))
+    return resolved
+
+def listTestCases(tests, locations, index):
+    '''
+    Prints names of the given test cases, or of all ones if no test is given,
+    using the given index of test cases without importing them.
+    '''
+    log.debug("List test cases from '%s' locations: %s"
+              % (", ".join(locations), ", ".join(tests)))
+    store = TestIndex(index)
+    try:
+        store.update(testRoots(locations))
+        cases = store.tests(tests, KIND_CASE)
+    finally:
+        store.close()
+    for name, kind in cases:
+        print name
+    printSeparator()
+    print "Found %d test cases" % len(cases)
+
+def runTestCases(tests, locations, devices, history=None, shard=False,
+                 timeout=CONNECT_TIMEOUT, failedFirst=False, retries=0,
+                 progress=None, processes=0, index=None, testTimeout=None,
+                 suiteTimeout=None, watchdog=None):
     '''
     A function responsible for running the given test cases.
+
+    If a file of the history of test results is given, statuses, durations
+    and devices of test cases are recorded in it. If sharding is enabled,
+    test suites are split among devices by their durations known from
+    the history or by numbers of their test cases, and each device runs its
+    own shard. If failed tests should be run first, test suites are ordered
+    by their recent failures.
+
+    Devices are connected in parallel and ones which cannot be connected
+    within the given timeout are excluded from the run.
+
+    Test cases which failed are retried the given number of times, each
+    time on a device other than the previous one if possible.
+
+    If a progress output is given, test events are written to it as JSON
+    lines as soon as they happen.
+
+    If a number of processes is given, devices are split into that many
+    groups and test suites are split among the groups, like in the case
+    of sharding. Each group runs its shard in a separate worker process and
+    results of workers are merged into one test result.
+
+    If a file of the index of test cases is given, the index is updated and
+    only modules defining the given test cases are imported.
+
+    Test cases and test suites which exceed the given deadlines are aborted
+    as not completed and their devices are reconnected or quarantined. If
+    an interval of the watchdog is given, devices running test cases are
+    pinged that often and ones which stop answering are handled likewise.
+
+    :return: A list of test results of the run and of following retries
+    :rtype: list
     '''
     log.debug("Run test cases from '%s' locations using '%s' devices: %s"
                % (", ".join(locations), ", ".join([str(d) for d in devices]),
@@ -63,7 +297,11 @@ def runTestCases(tests, locations, devices):
         location.add(path)
     if not isinstance(tests, (list, tuple)):
         tests = [tests]
+    if index:
+        tests = _resolveTests(index, tests, locations)
+    token = timing.begin("load tests")
     suites, errors = loader.loadFromNames(*tests)
+    timing.end(token)
 
     ncases = 0
     for test in suites:
@@ -83,29 +321,139 @@ def runTestCases(tests, locations, devices):
 
     log.info("Start running tests: %s" % suites)
     channels.add("SummaryChannel", SUMMARY_CHANNEL)
+    channels.add("StatusChannel", STATUS_CHANNEL)
+    if history:
+        channels.add("HistoryChannel", HISTORY_CHANNEL, history=history)
+    if progress:
+        channels.add("ProgressChannel", PROGRESS_CHANNEL, output=progress)
+    if testTimeout or suiteTimeout or watchdog:
+        channels.add("WatchdogChannel", WATCHDOG_CHANNEL,
+                     testTimeout=testTimeout, suiteTimeout=suiteTimeout,
+                     interval=watchdog)
     result = testresult.TestResult()
-    runner = TestRunner(devices, suites, result)
-
-    for device in devices:
-        device.connect()
+    devices = _connectDevices(devices, timeout)
+    store = ResultHistory(history) if history else None
     try:
-        runner.start()
-        runner.join()
-    except KeyboardInterrupt:
-        runner.stop()
+        if processes > 0:
+            ngroups = min(processes, len(devices))
+            groups = [devices[i::ngroups] for i in xrange(ngroups)]
+            shards = splitSuites(suites, groups, store)
+        elif shard and len(devices) > 1:
+            shards = [([device], deviceSuites) for device, deviceSuites
+                        in splitSuites(suites, devices, store)]
+        else:
+            shards = [(devices, suites)]
+        if failedFirst and store is not None:
+            shards = [(deviceSuites[0], orderSuites(deviceSuites[1], store))
+                      for deviceSuites in shards]
+    finally:
+        if store is not None:
+            store.close()
+    results = [result]
+    cases = _suiteCases(locations, index)
+    try:
+        interrupted = _runShards(shards, result, processes > 0, cases)
+        if history:
+            _recordRunTime(history, results)
+        statuses = dict(result.get(name=STATUS_CHANNEL)[0].statuses)
+        attempt = 0
+        while not interrupted and attempt < retries:
+            shards = _retryShards(loader, statuses, devices)
+            if not shards:
+                break
+            attempt += 1
+            ncases = sum([test.count() for shardDevices, deviceSuites
+                          in shards for test in deviceSuites])
+            print '\n' + (" RETRY %d OF %d: %d TEST CASES "
+                          % (attempt, retries, ncases)).center(80, '-') + '\n'
+            log.info("Retry failed test cases: %s" % shards)
+            result = testresult.TestResult()
+            if history:
+                # Retries are recorded as following attempts of the run
+                channel = result.get(name=HISTORY_CHANNEL)[0]
+                channel.run = results[0].get(name=HISTORY_CHANNEL)[0].run
+                channel.attempt = attempt
+            results.append(result)
+            interrupted = _runShards(shards, result, processes > 0, cases)
+            if history:
+                _recordRunTime(history, results)
+            _mergeStatuses(statuses,
+                           result.get(name=STATUS_CHANNEL)[0].statuses)
     finally:
+        runchannels.closeProgress()
         for device in devices:
             if device.isConnected():
                 device.disconnect()
-    return result
+    return results
+
+def failedTestCases(history):
+    '''
+    Returns identifiers of test cases which failed, ended with an error or
+    were not completed in the previous run recorded in the given history.
+
+    :return: A list of identifiers of test cases
+    :rtype: list
+    '''
+    log.debug("Get failed test cases of the previous run: %s" % history)
+    store = ResultHistory(history)
+    try:
+        return store.failedTests()
+    finally:
+        store.close()
 
-def printResult(result):
+def printHistoryReport(history, runs=10):
     '''
-    Prints the given test result.
+    Prints total execution times of the given number of latest runs and
+    test cases whose durations increased in the latest run.
     '''
-    log.debug("Print test result: %s" % result)
-    summary = result.get(name=SUMMARY_CHANNEL)[0].getSummary()
+    log.debug("Print report of history of test results: %s" % history)
+    store = ResultHistory(history)
+    try:
+        runTimes = store.runTimes(runs)
+        regressions = store.durationRegressions()
+    finally:
+        store.close()
+    print " RUN TIMES ".center(80, '-')
+    previous = None
+    for started, runTime in runTimes:
+        change = ''
+        if previous:
+            change = "\t%+.1f%%" % ((runTime - previous) * 100.0 / previous)
+        print "%s\t%10.1fs%s" % (time.strftime("%Y-%m-%d %H:%M:%S",
+                                               time.localtime(started)),
+                                 runTime, change)
+        previous = runTime
+    if not runTimes:
+        print "No runs recorded"
+    print '\n' + " DURATION REGRESSIONS ".center(80, '-')
+    for test, device, duration, average in regressions:
+        print "%s [%s]\t%.1fs (was %.1fs, %+.1f%%)" % (test, device, duration,
+                            average, (duration - average) * 100.0 / average)
+    if not regressions:
+        print "No regressions found"
+    printSeparator()
+
+def printResult(results):
+    '''
+    Prints the given test results of a run and of following retries of
+    failed test cases.
+    '''
+    log.debug("Print test results: %s" % results)
+    if not isinstance(results, (list, tuple)):
+        results = [results]
+    result = results[0]
+    summary = dict(result.get(name=SUMMARY_CHANNEL)[0].getSummary())
     log.info("Print summary of test execution results: %s" % summary)
+    # Test cases aborted by the watchdog are counted in the summary with
+    # statuses reported by test runners
+    for watchdog in result.get(name=WATCHDOG_CHANNEL):
+        for test, device, lost, status in watchdog.hangs:
+            if status in (STATUS_PASSED, STATUS_FAILED, STATUS_ERROR):
+                summary[status] -= 1
+                summary[STATUS_NOT_COMPLETED] += 1
+    # Test cases of crashed worker processes are missing in the summary
+    notCompleted = (summary[STATUS_NOT_COMPLETED] +
+                    result.get(name=STATUS_CHANNEL)[0].unreported)
     report = "Ran %d of %d test cases in %s" % (summary[COUNTER_TESTS_RUN],
                                                 summary[COUNTER_N_TESTS],
                                                 summary[COUNTER_RUN_TIME])
@@ -115,21 +463,71 @@ def printResult(result):
         print "Tests passed:\t\t%d" % summary[STATUS_PASSED]
     if summary[STATUS_FAILED]:
         print "Tests failed:\t\t%d" % summary[STATUS_FAILED]
-    if summary[STATUS_NOT_COMPLETED]:
-        print "Tests not completed:\t%d" % summary[STATUS_NOT_COMPLETED]
+    if notCompleted:
+        print "Tests not completed:\t%d" % notCompleted
     if summary[COUNTER_CORE_DUMPS]:
         print "Core dumps:\t\t%d" % summary[COUNTER_CORE_DUMPS]
     if summary[STATUS_ERROR]:
         print "Tests error:\t\t%d" % summary[STATUS_ERROR]
-    filechls = [chl for chl in result.get(cls=channels.TestResultFileChannel)
-                    if chl.isActive()]
+    hangs, quarantined = [], []
+    for retry in results:
+        for watchdog in retry.get(name=WATCHDOG_CHANNEL):
+            hangs.extend(watchdog.hangs)
+            quarantined.extend(watchdog.quarantined)
+    if hangs:
+        print "Tests aborted:\t\t%d" % len(hangs)
+        print "Time lost to hangs:\t%.1fs" % sum([hang[2] for hang in hangs])
+        for test, device, lost, status in hangs:
+            print "\t%s [%s]\t%.1fs" % (test, device, lost)
+    if quarantined:
+        print "Devices quarantined:\t%s" % ", ".join(sorted(set(quarantined)))
+    failures = summary[STATUS_FAILED] + summary[STATUS_ERROR] + notCompleted
+    if len(results) > 1:
+        first = result.get(name=STATUS_CHANNEL)[0].statuses
+        final = dict(first)
+        failedOn, passedOn = {}, {}
+        for (test, device), status in first.iteritems():
+            if status in STATUSES_FAILED:
+                failedOn.setdefault(test, set()).add(device)
+        for retry in results[1:]:
+            statuses = retry.get(name=STATUS_CHANNEL)[0].statuses
+            _mergeStatuses(final, statuses)
+            for (test, device), status in statuses.iteritems():
+                if status == STATUS_PASSED:
+                    passedOn.setdefault(test, set()).add(device)
+        finalFailed = set([test for (test, device), status
+                           in final.iteritems() if status in STATUSES_FAILED])
+        retried = sorted(failedOn)
+        flaky = [test for test in retried
+                 if test in passedOn and test not in finalFailed]
+        counts = {}
+        for status in final.itervalues():
+            counts[status] = counts.get(status, 0) + 1
+        print "Retries:\t\t%d" % (len(results) - 1)
+        print "Tests retried:\t\t%d" % len(retried)
+        print "Tests flaky:\t\t%d" % len(flaky)
+        for test in flaky:
+            print "\t%s (failed on %s, passed on %s)" % (test,
+                        ", ".join(sorted(failedOn[test])),
+                        ", ".join(sorted(passedOn[test])))
+        print "Final statuses:"
+        for status, label in ((STATUS_PASSED, "passed"),
+                              (STATUS_FAILED, "failed"),
+                              (STATUS_NOT_COMPLETED, "not completed"),
+                              (STATUS_ERROR, "error")):
+            if counts.get(status):
+                print "\t%s:\t%d" % (label, counts[status])
+        failures = sum([counts.get(status, 0) for status in STATUSES_FAILED])
+    filechls = []
+    for retry in results:
+        filechls.extend([chl for chl in
+                         retry.get(cls=channels.TestResultFileChannel)
+                         if chl.isActive()])
     if filechls:
         print "Result file:" if len(filechls) == 1 else "Result files:"
         for channel in filechls:
             print "\t%s" % channel.filePath()
     printSeparator()
 
-    status = (1 if (summary[STATUS_FAILED] + summary[STATUS_ERROR] +
-                    summary[STATUS_NOT_COMPLETED]) else 0)
+    status = 1 if failures else 0
     exitWithStatus("FAILURE" if status else "SUCCESS", status)
-
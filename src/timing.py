@@ -0,0 +1,217 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import sys
+import time
+import atexit
+import threading
+
+from tadek.core import log
+
+__all__ = ["enable", "isEnabled", "begin", "end", "timed", "instrumentDevice",
+           "printReport"]
+
+#: Methods of devices sending requests to them
+DEVICE_METHODS = ("connect", "disconnect", "getAccessible", "setAccessible",
+                  "doAccessible", "mouseEvent", "keyboardEvent")
+
+#: Extensions of output files which are written by the cProfile module
+PROFILE_EXTENSIONS = (".prof", ".pstats")
+
+# Spans are recorded only if profiling is enabled, otherwise all functions
+# return at once
+_enabled = False
+_lock = threading.Lock()
+# Numbers of calls, total and maximum durations of spans by their names
+_spans = {}
+# Self durations of stacks of nested spans by their folded names
+_stacks = {}
+_local = threading.local()
+_profiler = None
+
+def enable(output=None, started=None):
+    '''
+    Enables recording of timing spans. A breakdown of recorded spans is
+    printed at exit.
+
+    :param output: A name of a file to write at exit, a cProfile statistics
+        file if the name ends with .prof or .pstats and a file of folded
+        stacks of spans, compatible with flamegraph.pl, otherwise
+    :type output: string
+    :param started: A time the program started at, if given the time up to
+        now is recorded as the 'startup' span
+    :type started: float
+    '''
+    global _enabled, _profiler
+    log.debug("Enable profiling, output: %s" % output)
+    _enabled = True
+    if started is not None:
+        _record(("startup",), time.time() - started, 0.0)
+    if output and output.endswith(PROFILE_EXTENSIONS):
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_finish, output)
+
+def isEnabled():
+    '''
+    Checks if profiling is enabled.
+
+    :rtype: boolean
+    '''
+    return _enabled
+
+def _record(stack, duration, children):
+    _lock.acquire()
+    try:
+        span = _spans.setdefault(stack[-1], [0, 0.0, 0.0])
+        span[0] += 1
+        span[1] += duration
+        span[2] = max(span[2], duration)
+        folded = ';'.join(stack)
+        _stacks[folded] = _stacks.get(folded, 0.0) + duration - children
+    finally:
+        _lock.release()
+
+def begin(name):
+    '''
+    Begins a timing span of the given name in the current thread.
+
+    :return: A token to pass to end() or None if profiling is disabled
+    '''
+    if not _enabled:
+        return None
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    # Each entry is a name, a start time and a total time of nested spans
+    stack.append([name, time.time(), 0.0])
+    return len(stack)
+
+def end(token):
+    '''
+    Ends a timing span begun with the given token and all spans nested in it
+    which were not ended.
+    '''
+    if token is None:
+        return
+    stack = _local.stack
+    while len(stack) >= token:
+        names = tuple([entry[0] for entry in stack])
+        name, started, children = stack.pop()
+        duration = time.time() - started
+        if stack:
+            stack[-1][2] += duration
+        _record(names, duration, children)
+
+def timed(name):
+    '''
+    Returns a decorator recording calls of a function as spans of the given
+    name.
+    '''
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            token = begin(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end(token)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorator
+
+def instrumentDevice(device):
+    '''
+    Records calls of methods of the given device which send requests to it
+    as spans named after the methods. Does nothing if profiling is disabled.
+
+    :param device: A device to instrument
+    :type device: tadek.connection.device.Device
+    '''
+    if not _enabled:
+        return
+    for name in DEVICE_METHODS:
+        method = getattr(device, name, None)
+        if method is not None:
+            setattr(device, name, timed(name)(method))
+
+def printReport(fd=None):
+    '''
+    Prints a breakdown of recorded timing spans ordered by their total
+    durations.
+    '''
+    fd = fd or sys.stderr
+    _lock.acquire()
+    try:
+        spans = sorted(_spans.iteritems(), key=lambda item: -item[1][1])
+    finally:
+        _lock.release()
+    print >> fd, '\n' + " PROFILE ".center(80, '-')
+    print >> fd, "%-30s%8s%14s%14s%14s" % ("SPAN", "CALLS", "TOTAL [s]",
+                                           "AVERAGE [ms]", "MAX [ms]")
+    for name, (calls, total, maximum) in spans:
+        print >> fd, "%-30s%8d%14.3f%14.2f%14.2f" % (name[:29], calls, total,
+                                             total * 1000.0 / calls,
+                                             maximum * 1000.0)
+    print >> fd, '-' * 80
+
+def _writeStacks(fn):
+    '''
+    Writes self durations of stacks of spans in microseconds to the given
+    file in the folded format of flamegraph.pl.
+    '''
+    fd = open(fn, 'w')
+    try:
+        for folded, duration in sorted(_stacks.iteritems()):
+            fd.write("%s %d\n" % (folded, int(duration * 1000000)))
+    finally:
+        fd.close()
+
+def _finish(output):
+    '''
+    Prints the breakdown of spans and writes the output file at exit.
+    '''
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(output)
+    elif output:
+        _writeStacks(output)
+    printReport()
+    if output:
+        print >> sys.stderr, "Profile written to %s" % output
@@ -0,0 +1,80 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+__all__ = ["walkAccessibles", "fetchChildren"]
+
+def walkAccessibles(accessible, depth=-1, expand=None, prune=None):
+    '''
+    Iterates over the given accessible tree in pre-order without recursion.
+
+    Yields pairs of an accessible and its level relative to the given one.
+    If the expand function is specified, it is called for each accessible
+    which has children that have not been fetched yet and should return
+    a list of them. If the prune function is specified, descendants of
+    accessibles below the given one for which it returns True are skipped.
+    '''
+    stack = [iter([accessible])]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        level = len(stack) - 1
+        yield node, level
+        if depth >= 0 and level >= depth:
+            continue
+        if prune is not None and level and prune(node):
+            continue
+        children = list(node.children(force=False))
+        if not children and expand is not None and node.count:
+            children = list(expand(node))
+        if children:
+            stack.append(iter(children))
+
+def fetchChildren(device, all=False, depth=1, **attrs):
+    '''
+    Returns an expand function for walkAccessibles() which fetches children
+    of an accessible from the given device together with the specified
+    attributes. Descendants of the accessible down to the given depth are
+    fetched by the same request, so deeper levels are expanded in chunks.
+    '''
+    def expand(accessible):
+        obj = device.getAccessible(accessible.path, depth, all=all, **attrs)
+        if obj is None:
+            return []
+        return obj.children(force=False)
+    return expand
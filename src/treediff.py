@@ -0,0 +1,359 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+
+import re
+import json
+import bisect
+from collections import deque
+
+from tadek.core import log
+from tadek.core import accessible
+from tadek.core import utils
+
+from tree import fetchChildren
+from offline import DumpDevice
+from utils import exitWithStatus, printSeparator
+
+__all__ = ["CHANGE_INSERTED", "CHANGE_REMOVED", "CHANGE_MOVED",
+           "CHANGE_CHANGED", "DIFF_ATTRS", "compareAccessibles",
+           "stableIndexes", "matchChildren", "printChange", "printChangeJson",
+           "jsonValue", "diffTrees", "performDiff"]
+
+#: Kinds of changes between accessible trees
+CHANGE_INSERTED = "inserted"
+CHANGE_REMOVED = "removed"
+CHANGE_MOVED = "moved"
+CHANGE_CHANGED = "changed"
+
+#: Accessible attributes compared between matched accessibles
+DIFF_ATTRS = (
+    "name",
+    "description",
+    "position",
+    "size",
+    "text",
+    "value",
+    "actions",
+    "states",
+    "attributes",
+)
+
+# Symbols of changes in the human-readable output
+_CHANGE_SYMBOLS = {
+    CHANGE_INSERTED: '+',
+    CHANGE_REMOVED: '-',
+    CHANGE_MOVED: '>',
+    CHANGE_CHANGED: '~',
+}
+
+def _children(node, expand):
+    '''
+    Returns a list of children of the given accessible.
+    '''
+    children = list(node.children(force=False))
+    if not children and expand is not None and node.count:
+        children = list(expand(node))
+    return children
+
+def compareAccessibles(a, b):
+    '''
+    Compares attributes of the given accessibles.
+
+    :return: A dictionary of changed attributes and their old and new values
+    :rtype: dictionary
+    '''
+    changes = {}
+    for attr in DIFF_ATTRS:
+        old, new = getattr(a, attr, None), getattr(b, attr, None)
+        if attr in ("states", "actions"):
+            old, new = sorted(old or []), sorted(new or [])
+        elif attr == "attributes":
+            old, new = dict(old or {}), dict(new or {})
+        if old != new:
+            changes[attr] = (old, new)
+    return changes
+
+def stableIndexes(matched):
+    '''
+    Returns indexes of pairs of matched children which keep their relative
+    order, using the longest increasing subsequence of their new positions.
+    '''
+    tails, tailIndexes = [], []
+    previous = [None] * len(matched)
+    for i, (j, k) in enumerate(matched):
+        pos = bisect.bisect_left(tails, k)
+        if pos == len(tails):
+            tails.append(k)
+            tailIndexes.append(i)
+        else:
+            tails[pos] = k
+            tailIndexes[pos] = i
+        previous[i] = tailIndexes[pos - 1] if pos else None
+    stable = set()
+    i = tailIndexes[-1] if tailIndexes else None
+    while i is not None:
+        stable.add(i)
+        i = previous[i]
+    return stable
+
+def matchChildren(childrenA, childrenB):
+    '''
+    Matches the given lists of children by role and name, then by role
+    and position.
+
+    :return: A list of pairs of indexes of matched children, and lists
+        of indexes of unmatched children of both lists
+    :rtype: tuple
+    '''
+    byKey = {}
+    for k, child in enumerate(childrenB):
+        byKey.setdefault((child.role, child.name), deque()).append(k)
+    matched, unmatchedA = [], []
+    for j, child in enumerate(childrenA):
+        indexes = byKey.get((child.role, child.name))
+        if indexes:
+            matched.append((j, indexes.popleft()))
+        else:
+            unmatchedA.append(j)
+    used = set([k for j, k in matched])
+    unmatchedB = [k for k in xrange(len(childrenB)) if k not in used]
+    # Accessibles of the same role at the same position are considered
+    # the same accessibles of changed names
+    byPosition = dict([((childrenB[k].role, k), k) for k in unmatchedB])
+    removed = []
+    for j in unmatchedA:
+        k = byPosition.pop((childrenA[j].role, j), None)
+        if k is None:
+            removed.append(j)
+        else:
+            matched.append((j, k))
+    inserted = sorted(byPosition.values())
+    matched.sort()
+    return matched, removed, inserted
+
+def diffTrees(a, b, expandA=None, expandB=None):
+    '''
+    Compares the given accessible trees matching accessibles by role, name
+    and position. The comparison takes time linear in the size of the trees.
+
+    Generates changes as tuples of a kind of the change, an accessible of
+    the first tree, an accessible of the second tree and a dictionary
+    of changed attributes. Accessibles are None if not applicable.
+    '''
+    queue = deque([(a, b)])
+    while queue:
+        nodeA, nodeB = queue.popleft()
+        changes = compareAccessibles(nodeA, nodeB)
+        if changes:
+            yield CHANGE_CHANGED, nodeA, nodeB, changes
+        childrenA = _children(nodeA, expandA)
+        childrenB = _children(nodeB, expandB)
+        matched, removed, inserted = matchChildren(childrenA, childrenB)
+        for j in removed:
+            yield CHANGE_REMOVED, childrenA[j], None, {}
+        for k in inserted:
+            yield CHANGE_INSERTED, None, childrenB[k], {}
+        stable = stableIndexes(matched)
+        for i, (j, k) in enumerate(matched):
+            if i not in stable:
+                yield CHANGE_MOVED, childrenA[j], childrenB[k], {}
+            queue.append((childrenA[j], childrenB[k]))
+
+def _formatValue(value):
+    '''
+    Formats the given attribute value in the human-readable output.
+    '''
+    if isinstance(value, basestring):
+        return repr(utils.encode(value))
+    return str(value)
+
+def _formatChanges(changes):
+    '''
+    Formats the given changed attributes in the human-readable output.
+    '''
+    items = []
+    for attr in sorted(changes):
+        old, new = changes[attr]
+        if attr in ("states", "actions"):
+            diff = (["+%s" % item for item in new if item not in old] +
+                    ["-%s" % item for item in old if item not in new])
+            items.append("%s: %s" % (attr, ' '.join(diff)))
+        elif attr == "attributes":
+            keys = sorted(set(old) | set(new))
+            diff = ["%s=%s->%s" % (key, _formatValue(old.get(key)),
+                                   _formatValue(new.get(key)))
+                    for key in keys if old.get(key) != new.get(key)]
+            items.append("%s: %s" % (attr, ' '.join(diff)))
+        else:
+            items.append("%s: %s -> %s" % (attr, _formatValue(old),
+                                           _formatValue(new)))
+    return "; ".join(items)
+
+def printChange(kind, a, b, changes, prefix=''):
+    '''
+    Prints the given change in the human-readable format, preceded by
+    the given prefix.
+    '''
+    node = b if b is not None else a
+    if kind == CHANGE_INSERTED:
+        path = str(b.path)
+    elif kind == CHANGE_REMOVED:
+        path = str(a.path)
+    else:
+        path = "%s -> %s" % (a.path, b.path)
+    line = "%s%s %s %s %s" % (prefix, _CHANGE_SYMBOLS[kind], path, node.role,
+                               _formatValue(node.name))
+    if changes:
+        line += ": " + _formatChanges(changes)
+    print line
+
+def jsonValue(value):
+    '''
+    Converts the given attribute value to a JSON-compatible one.
+    '''
+    if value is None or isinstance(value, (basestring, int, long, float,
+                                           bool, list, dict)):
+        return value
+    return str(value)
+
+def printChangeJson(kind, a, b, changes, **fields):
+    '''
+    Prints the given change as a line of JSON, with the given additional
+    fields.
+    '''
+    node = b if b is not None else a
+    change = {
+        "change": kind,
+        "role": node.role,
+        "name": node.name,
+    }
+    if a is not None:
+        change["old-path"] = str(a.path)
+    if b is not None:
+        change["new-path"] = str(b.path)
+    if changes:
+        change["attributes"] = dict([(attr, [jsonValue(old), jsonValue(new)])
+                                     for attr, (old, new)
+                                        in changes.iteritems()])
+    change.update(fields)
+    print json.dumps(change)
+
+# A pattern of an accessible path
+_PATH_PATTERN = re.compile("^(\/|(\/(\d|([1-9]\d+)))+)$")
+
+def _parsePath(path):
+    '''
+    Converts the given string to an accessible path.
+    '''
+    return accessible.Path(*path.split('/')[1:])
+
+class _Source(object):
+    '''
+    A source of an accessible tree: a path of a device or of a dump file
+    given as FILE[:PATH].
+    '''
+    def __init__(self, spec, device):
+        self.spec = spec
+        if _PATH_PATTERN.match(spec):
+            self.device, self.path = device, _parsePath(spec)
+            self.live = True
+        else:
+            fn, sep, path = spec.rpartition(':')
+            if not sep or not _PATH_PATTERN.match(path):
+                fn, path = spec, None
+            self.device = DumpDevice(fn)
+            self.path = _parsePath(path) if path else None
+            self.live = False
+
+    def fetch(self):
+        '''
+        Fetches the root accessible of the tree.
+
+        :return: The root accessible and an expand function of the tree
+        :rtype: tuple
+        '''
+        if not self.device.isConnected():
+            self.device.connect()
+        if self.live:
+            # A whole tree of a device is fetched at once
+            return self.device.getAccessible(self.path, -1, all=True), None
+        if self.path is None:
+            self.path = _parsePath(self.device.index.root())
+        return (self.device.getAccessible(self.path, 0, all=True),
+                fetchChildren(self.device, True))
+
+    def close(self):
+        if self.device.isConnected():
+            self.device.disconnect()
+
+def performDiff(device, specs, format="text"):
+    '''
+    Compares accessible trees of the given sources and prints differences.
+
+    :param device: A device of sources given as paths
+    :type device: tadek.connection.device.Device
+    :param specs: Two sources to compare, each is either an accessible path
+        of the device or a dump file name followed by an optional path
+    :type specs: tuple
+    :param format: A format of the output: 'text' or 'json'
+    :type format: string
+    '''
+    log.debug("Compare accessible trees: %s, %s" % tuple(specs))
+    sources = [_Source(spec, device) for spec in specs]
+    printer = printChangeJson if format == "json" else printChange
+    counts = dict([(kind, 0) for kind in _CHANGE_SYMBOLS])
+    try:
+        roots = []
+        for source in sources:
+            root, expand = source.fetch()
+            if root is None:
+                exitWithStatus("There is no such path: %s" % source.spec, 2)
+            roots.extend((root, expand))
+        a, expandA, b, expandB = roots
+        for kind, nodeA, nodeB, changes in diffTrees(a, b, expandA, expandB):
+            counts[kind] += 1
+            printer(kind, nodeA, nodeB, changes)
+    finally:
+        for source in sources:
+            source.close()
+    total = sum(counts.values())
+    if format != "json":
+        printSeparator()
+        print "Inserted: %d, removed: %d, moved: %d, changed: %d" % (
+                        counts[CHANGE_INSERTED], counts[CHANGE_REMOVED],
+                        counts[CHANGE_MOVED], counts[CHANGE_CHANGED])
+    exitWithStatus(status=1 if total else 0)
@@ -35,16 +35,26 @@
 ################################################################################
 
 import sys
+import time
+import socket
 import optparse
 import textwrap
+import threading
+from cStringIO import StringIO
 
 from tadek.core import log
+from tadek.core import config
 from tadek.core import devices
+from tadek.core import accessible
+from tadek.core.utils import encode
 from tadek.connection.device import Device
 
+import bulkconf
+
 def getDevices(deviceArgs):
     '''
-    Converts command-line arguments representing devices.
+    Converts command-line arguments representing devices. Devices of user
+    settings are read through the cache of parsed configuration files.
 
     :param deviceArgs: Devices identifiers
     :type deviceArgs: list [string]
@@ -59,8 +69,20 @@ def getDevices(deviceArgs):
         deviceList.append(Device('localhost', devices.DEFAULT_IP,
                                  devices.DEFAULT_PORT))
     else:
+        userDevices = bulkconf.loadSettings(devices.CONFIG_NAME,
+                                            config.getProgramName()) or {}
         for arg in deviceArgs:
-            device = devices.get(arg)
+            device = None
+            options = userDevices.get(arg)
+            if options is not None and "address" in options:
+                try:
+                    device = Device(arg, options["address"],
+                                    int(options.get("port",
+                                                    devices.DEFAULT_PORT)))
+                except ValueError:
+                    log.warning("Invalid port of device: %s" % arg)
+            if device is None:
+                device = devices.get(arg)
             if device is None:
                 address = arg.split(':')
                 if len(address) == 2:
@@ -76,6 +98,104 @@ def getDevices(deviceArgs):
             deviceList.append(device)
     return deviceList
 
+class RequestError(Exception):
+    '''
+    An exception raised when a request cannot be performed.
+    '''
+    pass
+
+#: Default time in seconds for probing and connecting a device
+CONNECT_TIMEOUT = 10.0
+
+def probeDevice(device, timeout=CONNECT_TIMEOUT):
+    '''
+    Checks if the given device accepts connections on its address.
+
+    :raise socket.error: If the device is unreachable
+    '''
+    sock = socket.create_connection(tuple(device.address), timeout)
+    sock.close()
+
+def pingDevice(device, timeout=CONNECT_TIMEOUT):
+    '''
+    Checks if the given connected device answers a lightweight request for
+    the root accessible without its descendants within the given time.
+    The request is sent using the existing connection to the device.
+
+    :raise RequestError: If the device does not answer in time
+    '''
+    replies = []
+
+    def request():
+        try:
+            device.getAccessible(accessible.Path(), 0)
+            replies.append(None)
+        except Exception, err:
+            replies.append(err)
+
+    thread = threading.Thread(target=request, name="ping-%s" % device.name)
+    thread.setDaemon(True)
+    thread.start()
+    thread.join(timeout)
+    if not replies:
+        raise RequestError("No answer within %gs" % timeout)
+    if replies[0] is not None:
+        raise replies[0]
+
+class _Connector(threading.Thread):
+    '''
+    A thread probing and connecting a device.
+    '''
+    def __init__(self, device, timeout):
+        threading.Thread.__init__(self, name="connect-%s" % device.name)
+        self.setDaemon(True)
+        self.device = device
+        self.timeout = timeout
+        self.error = None
+        self.abandoned = False
+
+    def run(self):
+        try:
+            probeDevice(self.device, self.timeout)
+            self.device.connect()
+        except Exception, err:
+            log.info("Connecting device '%s' failed: %s" % (self.device, err))
+            self.error = err
+            return
+        if self.abandoned and self.device.isConnected():
+            self.device.disconnect()
+
+def connectDevices(devices, timeout=CONNECT_TIMEOUT):
+    '''
+    Probes and connects the given devices in parallel, waiting at most
+    the given time for all of them.
+
+    :param devices: Devices to connect
+    :type devices: list [tadek.connection.device.Device]
+    :param timeout: Time in seconds to wait for devices
+    :type timeout: float
+    :return: A list of connected devices and a list of pairs of devices
+        which failed to connect and their errors
+    :rtype: tuple
+    '''
+    log.debug("Connect devices: %s" % ", ".join([str(d) for d in devices]))
+    connectors = [_Connector(device, timeout) for device in devices]
+    for connector in connectors:
+        connector.start()
+    deadline = time.time() + timeout
+    for connector in connectors:
+        connector.join(max(deadline - time.time(), 0))
+    connected, failed = [], []
+    for connector in connectors:
+        if connector.isAlive():
+            connector.abandoned = True
+            failed.append((connector.device, "connection timed out"))
+        elif connector.error is not None:
+            failed.append((connector.device, connector.error))
+        else:
+            connected.append(connector.device)
+    return connected, failed
+
 def exitWithStatus(message=None, status=0):
     '''
     Logs and prints the given message and exits with the specified status code.
@@ -104,6 +224,57 @@ def printSeparator(length=80):
     '''
     print length * '-'
 
+class _ThreadStream(object):
+    '''
+    A stream redirecting writes of threads which capture their output.
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def write(self, data):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            self.stream.write(data)
+        else:
+            # Buffers accept non-ASCII characters only in byte strings
+            buffer.write(encode(data))
+
+    def flush(self):
+        getattr(self.local, "buffer", self.stream).flush()
+
+_captureLock = threading.Lock()
+
+def startCapture():
+    '''
+    Starts capturing the standard output and error of the current thread.
+    '''
+    _captureLock.acquire()
+    try:
+        for name in ("stdout", "stderr"):
+            if not isinstance(getattr(sys, name), _ThreadStream):
+                setattr(sys, name, _ThreadStream(getattr(sys, name)))
+    finally:
+        _captureLock.release()
+    sys.stdout.local.buffer = StringIO()
+    sys.stderr.local.buffer = StringIO()
+
+def stopCapture():
+    '''
+    Stops capturing the output of the current thread.
+
+    :return: Captured standard output and error
+    :rtype: tuple
+    '''
+    output = []
+    for stream in (sys.stdout, sys.stderr):
+        output.append(stream.local.buffer.getvalue())
+        del stream.local.buffer
+    return tuple(output)
+
 class LineFormatter(optparse.IndentedHelpFormatter):
     '''
     A class for formatting tools help messages.
@@ -0,0 +1,158 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import time
+
+from tadek.core import log
+
+from query import Query, matchAccessibles
+from tree import fetchChildren
+from fetch import CHUNK_DEPTH
+
+__all__ = ["Condition", "waitFor"]
+
+#: A default time in seconds after which waiting fails
+TIMEOUT = 30.0
+
+#: A default interval in seconds between the first and the second check
+INTERVAL = 0.1
+
+#: The maximum interval in seconds between checks
+MAX_INTERVAL = 2.0
+
+#: Conditions met when an accessible of the path exists or does not exist
+CONDITION_EXISTS = "exists"
+CONDITION_GONE = "gone"
+
+# A prefix of conditions met when no accessible matches a query
+_GONE_PREFIX = "gone:"
+
+class Condition(object):
+    '''
+    A class of conditions waited for. A condition is one of:
+        exists      - an accessible of the path exists
+        gone        - an accessible of the path does not exist
+        QUERY       - an accessible of a tree of the path matches the query
+        gone:QUERY  - no accessible of a tree of the path matches the query
+    '''
+    def __init__(self, text):
+        '''
+        :param text: A text of the condition
+        :type text: string
+        '''
+        self.text = text
+        self.query = None
+        self.gone = False
+        if text in (CONDITION_EXISTS, CONDITION_GONE):
+            self.gone = text == CONDITION_GONE
+        else:
+            if text.startswith(_GONE_PREFIX):
+                self.gone = True
+                text = text[len(_GONE_PREFIX):]
+            self.query = Query(text)
+
+    def check(self, device, path):
+        '''
+        Checks the condition on a tree of the given path. The tree is
+        fetched in subtrees of CHUNK_DEPTH levels, like by TreeFetcher,
+        skipping subtrees which cannot match the query, and only until
+        the first matching accessible, which decides the result.
+
+        :return: A pair of a boolean telling if the condition is met and
+            a list of records of accessibles matching the query, with
+            the first matching one at most
+        :rtype: tuple
+        '''
+        if self.query is None:
+            obj = device.getAccessible(path, 0)
+            records = []
+            found = obj is not None
+        else:
+            attrs = self.query.attributes()
+            depth = CHUNK_DEPTH
+            if self.query.maxDepth >= 0:
+                depth = min(depth, self.query.maxDepth)
+            obj = device.getAccessible(path, depth, **attrs)
+            records = []
+            if obj is not None:
+                records = matchAccessibles(obj, self.query,
+                                fetchChildren(device, depth=CHUNK_DEPTH,
+                                              **attrs), limit=1)
+            found = bool(records)
+        return found != self.gone, records
+
+
+def waitFor(device, path, condition, timeout=TIMEOUT, interval=INTERVAL):
+    '''
+    Waits until the given condition is met on a tree of the given path.
+
+    The condition is checked over the connection of the device at once and
+    then again and again, with intervals doubled after each check up to
+    MAX_INTERVAL, so short waits end quickly and long ones do not load
+    the device. The last check is done when the time runs out.
+
+    :param device: A connected device
+    :type device: tadek.connection.device.Device
+    :param path: A path of the checked accessible or tree
+    :type path: tadek.core.accessible.Path
+    :param condition: A condition to wait for
+    :type condition: Condition
+    :param timeout: Time in seconds after which waiting fails
+    :type timeout: float
+    :param interval: An interval in seconds after the first check
+    :type interval: float
+    :return: A tuple of a boolean telling if the condition is met, records
+        of accessibles matching its query, the waiting time in seconds
+        and a number of checks
+    :rtype: tuple
+    '''
+    log.debug("Wait for '%s' condition on '%s' path of '%s' device"
+              % (condition.text, path, device))
+    started = time.time()
+    deadline = started + timeout
+    checks = 0
+    while True:
+        met, records = condition.check(device, path)
+        checks += 1
+        now = time.time()
+        if met or now >= deadline:
+            break
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * 2, max(MAX_INTERVAL, interval))
+    elapsed = time.time() - started
+    log.info("Condition '%s' %s after %.3fs and %d checks"
+             % (condition.text, "met" if met else "not met", elapsed, checks))
+    return met, records, elapsed, checks
@@ -0,0 +1,362 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import sys
+import time
+import heapq
+
+from tadek.core import log
+from tadek.core import accessible
+
+from treediff import DIFF_ATTRS, compareAccessibles, matchChildren, \
+                     stableIndexes, printChange, printChangeJson
+from treediff import CHANGE_INSERTED, CHANGE_REMOVED, CHANGE_MOVED, \
+                     CHANGE_CHANGED
+from utils import printSeparator
+
+__all__ = ["TreeWatcher", "performWatch"]
+
+#: A default minimum interval in seconds between polls of an accessible
+MIN_INTERVAL = 0.5
+
+#: A ratio of the maximum interval to the minimum one
+MAX_INTERVAL_RATIO = 16
+
+def _fingerprint(obj):
+    '''
+    Returns a fingerprint of compared attributes, a role and a number of
+    children of the given accessible.
+    '''
+    values = [obj.role, obj.count]
+    for attr in DIFF_ATTRS:
+        value = getattr(obj, attr, None)
+        if attr in ("states", "actions"):
+            value = sorted(value or [])
+        elif attr == "attributes":
+            value = sorted(dict(value or {}).items())
+        values.append(value)
+    return hash(repr(values))
+
+
+class _Node(object):
+    '''
+    A class of watched accessibles.
+    '''
+    __slots__ = ("parent", "index", "level", "snapshot", "fingerprint",
+                 "children", "interval", "due", "alive")
+
+    def __init__(self, parent, index, snapshot, interval):
+        self.parent = parent
+        self.index = index
+        self.level = parent.level + 1 if parent is not None else 0
+        self.snapshot = snapshot
+        self.fingerprint = _fingerprint(snapshot)
+        self.children = []
+        self.interval = interval
+        self.due = None
+        self.alive = True
+
+    def indexes(self):
+        '''
+        Returns indexes of the current path of the accessible.
+        '''
+        if self.parent is None:
+            return list(self.index)
+        return self.parent.indexes() + [self.index]
+
+    def path(self):
+        return accessible.Path(*[str(index) for index in self.indexes()])
+
+    def kill(self):
+        '''
+        Marks the node and all its descendants as removed.
+        '''
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.alive = False
+            stack.extend(node.children)
+
+
+class TreeWatcher(object):
+    '''
+    A class watching changes of an accessible tree of a device.
+
+    After the tree is fetched once, each accessible which has children is
+    polled on its own, with a request of depth 1. The request returns its
+    attributes and attributes of its children, which are compared with
+    cached fingerprints. Accessibles which do not change are polled less
+    and less often, from the minimum interval up to the maximum one, and
+    changed ones are polled again at once, so unchanged subtrees are not
+    fetched again and again.
+    '''
+    def __init__(self, device, path, depth=-1, minInterval=MIN_INTERVAL,
+                 maxInterval=None):
+        '''
+        :param device: A device to watch
+        :type device: tadek.connection.device.Device
+        :param path: A path of the root of the watched tree
+        :type path: tadek.core.accessible.Path
+        :param depth: A depth of the watched tree, -1 for all descendants
+        :type depth: integer
+        :param minInterval: The minimum interval between polls in seconds
+        :type minInterval: float
+        :param maxInterval: The maximum interval between polls in seconds,
+            MAX_INTERVAL_RATIO times the minimum one by default
+        :type maxInterval: float
+        '''
+        self.device = device
+        self.path = path
+        self.depth = depth
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval or minInterval * MAX_INTERVAL_RATIO
+        self._root = None
+        self._queue = []
+        self._seq = 0
+        #: A number of sent requests
+        self.requests = 0
+        #: A number of fetched accessibles
+        self.fetched = 0
+
+    def _fetch(self, path, depth):
+        obj = self.device.getAccessible(path, depth, all=True)
+        self.requests += 1
+        return obj
+
+    def _leaf(self, node):
+        '''
+        Checks if the given node is at the maximum depth of the tree.
+        '''
+        return self.depth >= 0 and node.level >= self.depth
+
+    def _watched(self, node):
+        '''
+        Checks if the given node is polled. Other nodes are watched through
+        polls of their parents.
+        '''
+        if node.parent is None:
+            return True
+        return node.snapshot.count > 0 and not self._leaf(node)
+
+    def _schedule(self, node, due):
+        if not self._watched(node):
+            return
+        node.due = due
+        self._seq += 1
+        heapq.heappush(self._queue, (due, self._seq, node))
+
+    def start(self):
+        '''
+        Fetches the watched tree and schedules polls of its accessibles.
+
+        :return: True if the root of the tree exists, False otherwise
+        :rtype: boolean
+        '''
+        log.debug("Start watching '%s' path of '%s' device"
+                  % (self.path, self.device))
+        obj = self._fetch(self.path, self.depth)
+        indexes = [int(index) for index in str(self.path).split('/')[1:]
+                   if index]
+        if obj is None:
+            return False
+        self._root = _Node(None, indexes, obj, self.minInterval)
+        nodes, stack = [], [(self._root, obj)]
+        while stack:
+            node, obj = stack.pop()
+            nodes.append(node)
+            if self._leaf(node):
+                continue
+            for index, child in enumerate(obj.children(force=False)):
+                childNode = _Node(node, index, child, self.minInterval)
+                node.children.append(childNode)
+                stack.append((childNode, child))
+        self.fetched += len(nodes)
+        # Spread first polls over the minimum interval
+        now = time.time()
+        watched = [node for node in nodes if self._watched(node)]
+        for i, node in enumerate(watched):
+            self._schedule(node, now + self.minInterval * (i + 1)
+                                       / len(watched))
+        return True
+
+    def _poll(self, node):
+        '''
+        Polls the given node and generates changes of it and its children.
+
+        :return: True if anything changed, False otherwise
+        :rtype: boolean
+        '''
+        fresh = self._fetch(node.path(), 0 if self._leaf(node) else 1)
+        if fresh is None:
+            # The accessible is removed, which is detected by its parent
+            if node.parent is not None:
+                self._schedule(node.parent, time.time())
+            elif node.alive:
+                node.alive = False
+                yield CHANGE_REMOVED, node.snapshot, None, {}
+            return
+        if node.parent is not None and (fresh.role != node.snapshot.role
+                                        or fresh.name != node.snapshot.name):
+            # Siblings are probably inserted, removed or reordered, so
+            # the parent has to match the accessibles again first
+            self._schedule(node.parent, time.time())
+            return
+        if not node.alive:
+            # The removed root is back
+            node.alive = True
+            node.children = []
+            yield CHANGE_INSERTED, None, fresh, {}
+        freshChildren = []
+        if not self._leaf(node):
+            freshChildren = list(fresh.children(force=False))
+        self.fetched += 1 + len(freshChildren)
+        fingerprint = _fingerprint(fresh)
+        if fingerprint != node.fingerprint:
+            changes = compareAccessibles(node.snapshot, fresh)
+            if changes:
+                yield CHANGE_CHANGED, node.snapshot, fresh, changes
+        oldChildren = [child.snapshot for child in node.children]
+        matched, removed, inserted = matchChildren(oldChildren, freshChildren)
+        children = [None] * len(freshChildren)
+        for j in removed:
+            node.children[j].kill()
+            yield CHANGE_REMOVED, oldChildren[j], None, {}
+        for k in inserted:
+            child = _Node(node, k, freshChildren[k], self.minInterval)
+            # Children of the new accessible are reported by its first poll
+            children[k] = child
+            yield CHANGE_INSERTED, None, freshChildren[k], {}
+        stable = stableIndexes(matched)
+        for i, (j, k) in enumerate(matched):
+            child, obj = node.children[j], freshChildren[k]
+            if i not in stable:
+                yield CHANGE_MOVED, oldChildren[j], obj, {}
+            child.index = k
+            childFingerprint = _fingerprint(obj)
+            if childFingerprint != child.fingerprint:
+                changes = compareAccessibles(oldChildren[j], obj)
+                if changes:
+                    yield CHANGE_CHANGED, oldChildren[j], obj, changes
+            child.snapshot, child.fingerprint = obj, childFingerprint
+            children[k] = child
+        node.children = children
+        node.snapshot, node.fingerprint = fresh, fingerprint
+        now = time.time()
+        for k in inserted:
+            self._schedule(children[k], now)
+        for i, (j, k) in enumerate(matched):
+            if oldChildren[j].count != freshChildren[k].count:
+                children[k].interval = self.minInterval
+                self._schedule(children[k], now)
+
+    def changes(self):
+        '''
+        Polls accessibles when they are due and generates changes of the tree
+        as tuples of a kind of the change, an old accessible, a new one and
+        a dictionary of changed attributes, like treediff.diffTrees().
+        '''
+        while self._queue:
+            due, seq, node = heapq.heappop(self._queue)
+            if not node.alive and node.parent is not None or node.due != due:
+                continue
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            changed = False
+            for change in self._poll(node):
+                changed = True
+                yield change
+            if changed:
+                node.interval = self.minInterval
+            else:
+                node.interval = min(node.interval * 2, self.maxInterval)
+            self._schedule(node, time.time() + node.interval)
+
+    def count(self):
+        '''
+        Returns a number of watched accessibles.
+
+        :rtype: integer
+        '''
+        stack, count = [self._root], 0
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend([child for child in node.children if child])
+        return count
+
+
+def performWatch(device, path, depth=-1, interval=MIN_INTERVAL,
+                 format="text"):
+    '''
+    Watches an accessible tree of the given path and prints its changes
+    until interrupted.
+
+    :param format: A format of the output: 'text' or 'json'
+    :type format: string
+    :return: A status of the request
+    :rtype: integer
+    '''
+    watcher = TreeWatcher(device, path, depth, interval)
+    started = time.time()
+    if not watcher.start():
+        print "There is no such path: %s" % path
+        return 1
+    if format != "json":
+        print "Watching %d accessibles of %s" % (watcher.count(), path)
+    events = 0
+    try:
+        for kind, a, b, changes in watcher.changes():
+            events += 1
+            now = time.time()
+            if format == "json":
+                printChangeJson(kind, a, b, changes, time=now)
+            else:
+                printChange(kind, a, b, changes, "%s.%03d " % (
+                    time.strftime("%H:%M:%S", time.localtime(now)),
+                    int(now * 1000) % 1000))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    if format != "json":
+        elapsed = time.time() - started
+        printSeparator()
+        print "Changes: %d in %.1fs" % (events, elapsed)
+        print "Requests: %d, accessibles fetched: %d" % (watcher.requests,
+                                                         watcher.fetched)
+        print "Full dumps every %gs would fetch: %d" % (interval,
+                    watcher.count() * (1 + int(elapsed / interval)))
+    return 0
@@ -0,0 +1,297 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import select
+import threading
+import multiprocessing
+
+from tadek.core import log
+from tadek.engine import channels
+from tadek.engine import testresult
+from tadek.engine.channels import TestResultChannel
+from tadek.engine.loader import TestLoader
+from tadek.engine.runner import TestRunner
+from tadek.engine.testexec import STATUS_NOT_COMPLETED
+from tadek.engine.testresult import TestCaseResult
+
+from runchannels import WatchdogChannel, HistoryChannel, testStatus
+from utils import printSeparator
+
+__all__ = ["runWorkers"]
+
+#: Name of a channel forwarding test events of a worker process
+FORWARD_CHANNEL = "_forward"
+
+#: Time in seconds between checks of worker processes
+POLL_INTERVAL = 1.0
+
+# A connection to the parent process of a worker process
+_connection = None
+
+class ForwardChannel(TestResultChannel):
+    '''
+    A channel of a worker process sending test events to the parent process.
+    '''
+    def __init__(self, name, **params):
+        TestResultChannel.__init__(self, name, **params)
+        self._lock = threading.Lock()
+
+    def _send(self, *message):
+        self._lock.acquire()
+        try:
+            _connection.send(message)
+        finally:
+            self._lock.release()
+
+    def startTest(self, result, device):
+        TestResultChannel.startTest(self, result, device)
+        self._send("startTest", result, device)
+
+    def stopTest(self, result, device):
+        TestResultChannel.stopTest(self, result, device)
+        # Tests aborted by the watchdog of the worker are not completed
+        self._send("stopTest", result, device, testStatus(result, device))
+
+channels.register(ForwardChannel)
+
+
+def _runWorker(connection, devices, tests):
+    '''
+    Runs the given tests on the given devices in a worker process sending
+    test events to the parent process through the given connection.
+    '''
+    global _connection
+    _connection = connection
+    log.info("Worker process %d runs tests on devices %s: %s"
+             % (os.getpid(), ", ".join([device.name for device in devices]),
+                ", ".join(tests)))
+    channels.add("ForwardChannel", FORWARD_CHANNEL)
+    result = testresult.TestResult()
+    # Results are merged and stored by the parent process, but devices
+    # of the worker are watched by the worker itself. Disabled channels
+    # are never started, so they open no history stores nor outputs
+    watchdogs = result.get(cls=WatchdogChannel)
+    for channel in result.get():
+        if channel in watchdogs:
+            channel.setDevices(devices)
+        elif channel.name != FORWARD_CHANNEL:
+            channel.setEnabled(False)
+    suites, errors = TestLoader().loadFromNames(*tests)
+    for error in errors:
+        log.error("Worker process %d failed to load '%s' test:\n%s"
+                  % (os.getpid(), error.name, error.traceback))
+    try:
+        for device in devices:
+            device.connect()
+        runner = TestRunner(devices, suites, result)
+        runner.start()
+        runner.join()
+    finally:
+        for device in devices:
+            if device.isConnected():
+                device.disconnect()
+    hangs, quarantined = [], []
+    for channel in watchdogs:
+        hangs.extend(channel.hangs)
+        quarantined.extend(channel.quarantined)
+    connection.send(("done", hangs, quarantined))
+    connection.close()
+
+
+class _Worker(object):
+    '''
+    A class of a worker process running a shard of test suites.
+    '''
+    def __init__(self, devices, suites):
+        self.devices = devices
+        self.suites = suites
+        self.done = False
+        # Tests which are started and not stopped yet, in order of starting
+        self.running = []
+        # Pairs of finished test cases and names of their devices
+        self.finished = set()
+        self.connection, connection = multiprocessing.Pipe(False)
+        self.process = multiprocessing.Process(target=_runWorker,
+                        args=(connection, devices,
+                              [suite.id for suite in suites]))
+        self.process.start()
+        connection.close()
+
+    def __str__(self):
+        return ", ".join([device.name for device in self.devices])
+
+    def notRun(self, cases):
+        '''
+        Returns test cases of the worker which were not run on its devices.
+        Test suites whose test cases are not known are returned instead of
+        their test cases.
+
+        :param cases: A dictionary of identifiers of test suites and lists
+            of identifiers of their test cases
+        :type cases: dictionary
+        :return: A list of tuples of identifiers of tests, names of devices
+            and numbers of test cases the tests stand for
+        :rtype: list
+        '''
+        tests = []
+        for suite in self.suites:
+            for device in self.devices:
+                if cases.get(suite.id):
+                    tests.extend([(case, device.name, 1)
+                                  for case in cases[suite.id]
+                                  if (case, device.name) not in self.finished])
+                    continue
+                prefix = suite.id + '.'
+                finished = len([test for test, name in self.finished
+                                if name == device.name and (test == suite.id
+                                    or test.startswith(prefix))])
+                if finished < suite.count():
+                    tests.append((suite.id, device.name,
+                                  suite.count() - finished))
+        return tests
+
+
+def _dispatch(worker, result, message):
+    '''
+    Passes a test event received from the given worker to channels of
+    the given test result. Events of stopped tests carry their statuses in
+    the worker.
+    '''
+    event, test, device = message[:3]
+    if event == "startTest":
+        worker.running.append((test, device))
+    else:
+        device.status = message[3]
+        worker.running = [(t, d) for t, d in worker.running
+                          if (t.id, d.name) != (test.id, device.name)]
+        if isinstance(test, TestCaseResult):
+            worker.finished.add((test.id, device.name))
+    for channel in result.get():
+        getattr(channel, event)(test, device)
+
+def _finish(worker, result, status, cases=None):
+    '''
+    Waits for the given worker to exit. If it did not finish its shard,
+    its running tests are stopped with the not completed status and its
+    remaining test cases are recorded with it in the given status channel
+    and in the history of test results.
+    '''
+    worker.process.join()
+    if not worker.done:
+        log.error("Worker process of devices %s exited with code %s"
+                  % (worker, worker.process.exitcode))
+        for test, device in reversed(worker.running):
+            _dispatch(worker, result, ("stopTest", test, device,
+                                       STATUS_NOT_COMPLETED))
+        notRun = worker.notRun(cases([suite.id for suite in worker.suites])
+                               if cases is not None else {})
+        for test, device, count in notRun:
+            status.setUnreported(test, device, STATUS_NOT_COMPLETED, count)
+            for channel in result.get(cls=HistoryChannel):
+                channel.addUnreported(test, device, STATUS_NOT_COMPLETED)
+        print "Worker process of devices %s exited with code %s" \
+                % (worker, worker.process.exitcode)
+        print "Test cases not completed:\t%d" \
+                % sum([count for test, device, count in notRun])
+        printSeparator()
+    for channel in result.get():
+        channel.stop()
+
+def runWorkers(shards, result, status, cases=None):
+    '''
+    Runs the given shards of test suites in separate worker processes, each
+    one on its own devices, and merges test events of the workers into
+    the given test result.
+
+    A worker which crashes does not stop the run, its test cases which were
+    not completed are reported with the not completed status in the given
+    status channel.
+
+    :param shards: A list of pairs of lists of devices and test suites
+    :type shards: list
+    :param result: A test result to merge results of workers into
+    :type result: tadek.engine.testresult.TestResult
+    :param status: A channel collecting final statuses of test cases
+    :type status: runchannels.StatusChannel
+    :param cases: A function returning a dictionary of identifiers of
+        the given test suites and lists of identifiers of their test cases,
+        used to report test cases of crashed workers
+    :type cases: function
+    :return: True if the run was interrupted, False otherwise
+    :rtype: boolean
+    '''
+    log.debug("Run shards of tests in worker processes: %s" % shards)
+    workers = []
+    for devices, suites in shards:
+        if not suites:
+            continue
+        # Workers use their own connections to devices
+        for device in devices:
+            if device.isConnected():
+                device.disconnect()
+        workers.append(_Worker(devices, suites))
+    # Channels are started once per worker after all workers are forked,
+    # so the workers do not inherit history stores nor outputs they open
+    for worker in workers:
+        for channel in result.get():
+            channel.start(result)
+    try:
+        while workers:
+            ready = select.select([worker.connection for worker in workers],
+                                  [], [], POLL_INTERVAL)[0]
+            for worker in workers[:]:
+                if worker.connection not in ready:
+                    continue
+                try:
+                    message = worker.connection.recv()
+                except (EOFError, IOError):
+                    workers.remove(worker)
+                    _finish(worker, result, status, cases)
+                    continue
+                if message[0] == "done":
+                    worker.done = True
+                    for channel in result.get(cls=WatchdogChannel):
+                        channel.hangs.extend(message[1])
+                        channel.quarantined.extend(message[2])
+                else:
+                    _dispatch(worker, result, message)
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.process.terminate()
+            _finish(worker, result, status, cases)
+        return True
+    return False
@@ -0,0 +1,208 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+import utils
+import bulkconf
+
+_DEVICES = '''[DEFAULT]
+port = 9000
+
+[phone]
+address = 10.0.0.2
+
+[tablet]
+address = 10.0.0.3
+port = 9001
+'''
+
+class BulkConfTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = bulkconf.SettingsCache(os.path.join(self.dir, "cache",
+                                                         "cache.db"))
+        self.confDir = os.path.join(self.dir, "config")
+        self.file = os.path.join(self.confDir, "tool", "devices.conf")
+        os.makedirs(os.path.dirname(self.file))
+        fd = open(self.file, 'w')
+        fd.write(_DEVICES)
+        fd.close()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def _transaction(self):
+        return bulkconf.SettingsTransaction("tool", self.cache, self.confDir)
+
+    def testDefaultsNotCopied(self):
+        transaction = self._transaction()
+        self.assertEqual(transaction.get("devices", "phone"), ["address"])
+        transaction.set("devices", "phone", "address", "10.0.0.4")
+        transaction.commit()
+        data = dict(bulkconf.parseSettings(self.file))
+        self.assertEqual(data["DEFAULT"], [("port", "9000")])
+        self.assertEqual(data["phone"], [("address", "10.0.0.4")])
+        self.assertEqual(data["tablet"], [("address", "10.0.0.3"),
+                                          ("port", "9001")])
+
+    def testFileReplacedOnce(self):
+        inode = os.stat(self.file).st_ino
+        transaction = self._transaction()
+        transaction.set("devices", "phone", "port", "9002")
+        transaction.remove("devices", "tablet")
+        transaction.set("other", "section", "option", "value")
+        transaction.commit()
+        self.assertNotEqual(os.stat(self.file).st_ino, inode)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.file))),
+                         ["devices.conf", "other.conf"])
+        transaction = self._transaction()
+        self.assertEqual(transaction.get("devices"), ["DEFAULT", "phone"])
+        self.assertEqual(transaction.get("devices", "phone", "port"), "9002")
+        self.assertEqual(transaction.get("other", "section", "option"),
+                         "value")
+
+    def testFailedCommitRestored(self):
+        transaction = self._transaction()
+        transaction.set("devices", "phone", "port", "9002")
+        transaction.remove("other")
+        transaction.set("zzz", "section", "option", "value")
+        rename = os.rename
+        def failingRename(src, dst):
+            if dst.endswith("zzz.conf"):
+                raise OSError("Rename failed")
+            rename(src, dst)
+        os.rename = failingRename
+        try:
+            self.assertRaises(OSError, transaction.commit)
+        finally:
+            os.rename = rename
+        fd = open(self.file)
+        self.assertEqual(fd.read(), _DEVICES)
+        fd.close()
+        self.assertEqual(os.listdir(os.path.dirname(self.file)),
+                         ["devices.conf"])
+
+    def testInterruptedCommitRecovered(self):
+        pid = os.fork()
+        if pid == 0:
+            # The commit is interrupted after the first file is replaced
+            transaction = self._transaction()
+            transaction.set("devices", "phone", "port", "9002")
+            transaction.set("zzz", "section", "option", "value")
+            rename = os.rename
+            def crashingRename(src, dst):
+                if dst.endswith("zzz.conf"):
+                    os._exit(0)
+                rename(src, dst)
+            os.rename = crashingRename
+            transaction.commit()
+            os._exit(1)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        dirname = os.path.dirname(self.file)
+        self.failUnless(bulkconf.JOURNAL_NAME in os.listdir(dirname))
+        self.assertNotEqual(open(self.file).read(), _DEVICES)
+        transaction = self._transaction()
+        self.assertEqual(transaction.get("devices", "phone", "port"), None)
+        fd = open(self.file)
+        self.assertEqual(fd.read(), _DEVICES)
+        fd.close()
+        self.assertEqual(os.listdir(dirname), ["devices.conf"])
+
+    def testCacheValidated(self):
+        self.assertEqual(len(self.cache.load(self.file)), 3)
+        self.assertEqual(self.cache.load(self.file),
+                         bulkconf.parseSettings(self.file))
+        self.assertEqual(self.cache.parsed, 1)
+        transaction = self._transaction()
+        transaction.set("devices", "phone", "port", "9002")
+        transaction.commit()
+        self.assertEqual(dict(self.cache.load(self.file))["phone"],
+                         [("address", "10.0.0.2"), ("port", "9002")])
+        self.assertEqual(self.cache.parsed, 1)
+        fd = open(self.file, 'a')
+        fd.write("[laptop]\naddress = 10.0.0.5\n")
+        fd.close()
+        self.assertEqual(len(self.cache.load(self.file)), 4)
+        self.assertEqual(self.cache.parsed, 2)
+
+    def testLoadSettings(self):
+        settings = bulkconf.loadSettings("devices", "tool", self.cache,
+                                         self.confDir)
+        self.assertEqual(settings, {
+            "phone": {"address": "10.0.0.2", "port": "9000"},
+            "tablet": {"address": "10.0.0.3", "port": "9001"},
+        })
+        os.makedirs(os.path.join(self.confDir, bulkconf.COMMON))
+        os.rename(self.file, os.path.join(self.confDir, bulkconf.COMMON,
+                                          "devices.conf"))
+        self.assertEqual(bulkconf.loadSettings("devices", "tool", self.cache,
+                                               self.confDir), settings)
+        self.assertEqual(bulkconf.loadSettings("other", "tool", self.cache,
+                                               self.confDir), None)
+        self.assertEqual(self.cache.parsed, 2)
+
+    def testDevicesReadThroughCache(self):
+        configDir, cacheFile = bulkconf.CONFIG_DIR, bulkconf.CACHE_FILE
+        bulkconf.CONFIG_DIR = self.confDir
+        bulkconf.CACHE_FILE = self.cache.fn
+        programName = utils.config.getProgramName()
+        utils.config.setProgramName("tool")
+        try:
+            devices = utils.getDevices(["phone", "tablet", "10.0.0.9:1"])
+        finally:
+            bulkconf.CONFIG_DIR, bulkconf.CACHE_FILE = configDir, cacheFile
+            utils.config.setProgramName(programName)
+        self.assertEqual([(device.name, device.address)
+                          for device in devices],
+                         [("phone", ("10.0.0.2", 9000)),
+                          ("tablet", ("10.0.0.3", 9001)),
+                          ("10.0.0.9:1", ("10.0.0.9", 1))])
+        self.assertEqual(self.cache.load(self.file)[0][0], "DEFAULT")
+        self.assertEqual(self.cache.parsed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
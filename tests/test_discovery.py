@@ -0,0 +1,151 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from discovery import (KIND_MODULE, KIND_SUITE, KIND_CASE, TestIndex,
+                       parseModule, testRoots)
+
+_SUITES = '''
+from tadek.engine.testdefs import TestSuite, TestCase
+
+def step(test, device):
+    pass
+
+class BaseSuite(TestSuite):
+    caseBase = TestCase(step)
+
+class DialogSuite(BaseSuite):
+    caseOpen = TestCase(step)
+
+    class Nested(TestSuite):
+        caseClose = TestCase(step)
+
+class Helper(object):
+    caseIgnored = TestCase(step)
+'''
+
+def _write(fn, source):
+    dirname = os.path.dirname(fn)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    fd = open(fn, 'w')
+    try:
+        fd.write(source)
+    finally:
+        fd.close()
+
+
+class DiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.dir, "testcases")
+        _write(os.path.join(self.root, "ui", "__init__.py"), '')
+        _write(os.path.join(self.root, "ui", "dialogs.py"), _SUITES)
+        _write(os.path.join(self.root, "helpers.py"), "import os\n")
+        self.index = TestIndex(os.path.join(self.dir, "index",
+                                            "discovery.db"))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir)
+
+    def testParseModule(self):
+        self.assertEqual(parseModule(_SUITES, "dialogs"), [
+            ("dialogs", KIND_MODULE),
+            ("dialogs.BaseSuite", KIND_SUITE),
+            ("dialogs.BaseSuite.caseBase", KIND_CASE),
+            ("dialogs.DialogSuite", KIND_SUITE),
+            ("dialogs.DialogSuite.caseBase", KIND_CASE),
+            ("dialogs.DialogSuite.caseOpen", KIND_CASE),
+            ("dialogs.DialogSuite.Nested", KIND_SUITE),
+            ("dialogs.DialogSuite.Nested.caseClose", KIND_CASE),
+        ])
+        self.assertEqual(parseModule("import os\n", "helpers"), [])
+
+    def testRoots(self):
+        self.assertEqual(testRoots([self.dir, self.root]), [self.root])
+
+    def testTests(self):
+        self.assertEqual(self.index.update([self.root]), 3)
+        self.assertEqual(self.index.tests(kind=KIND_MODULE),
+                         [("ui.dialogs", KIND_MODULE)])
+        self.assertEqual(self.index.tests(["ui.dialogs.DialogSuite.Nested"]),
+                         [("ui.dialogs.DialogSuite.Nested", KIND_SUITE),
+                          ("ui.dialogs.DialogSuite.Nested.caseClose",
+                           KIND_CASE)])
+        self.assertEqual(self.index.tests(["ui.dialogs.Dialog"]), [])
+
+    def testResolve(self):
+        self.index.update([self.root])
+        self.assertEqual(self.index.resolve(), ["ui.dialogs"])
+        self.assertEqual(self.index.resolve(["ui", "ui.dialogs.BaseSuite",
+                                             "unknown"]),
+                         ["ui.dialogs", "ui.dialogs.BaseSuite", "unknown"])
+
+    def testUnchangedModulesNotParsed(self):
+        self.assertEqual(self.index.update([self.root]), 3)
+        self.assertEqual(self.index.update([self.root]), 0)
+        # A module of a new modification time but the same content
+        fn = os.path.join(self.root, "ui", "dialogs.py")
+        stat = os.stat(fn)
+        os.utime(fn, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(self.index.update([self.root]), 0)
+        _write(fn, _SUITES.replace("caseOpen", "caseShow"))
+        self.assertEqual(self.index.update([self.root]), 1)
+        self.assertEqual(self.index.tests(["ui.dialogs.DialogSuite.caseOpen"]),
+                         [])
+        os.remove(fn)
+        self.assertEqual(self.index.update([self.root]), 0)
+        self.assertEqual(self.index.tests(), [])
+
+    def testInvalidModule(self):
+        _write(os.path.join(self.root, "broken.py"), "class (:\n")
+        self.index.update([self.root])
+        # Such a module is left to be imported to report its error
+        self.assertEqual(self.index.resolve(), ["broken", "ui.dialogs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+from xml.etree import cElementTree as etree
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+import explore
+from fetch import TreeFetcher
+from tree import walkAccessibles
+from dumpfile import DumpWriter, openDump, splitAccessible
+from nodetable import NodeTable
+from offline import DumpDevice
+from fakedevice import FakeDevice
+
+def _read(fn):
+    fd = openDump(fn)
+    try:
+        return fd.read()
+    finally:
+        fd.close()
+
+def _nodes(root):
+    return [(str(node.path), node.name, node.role, node.description,
+             list(node.states), level)
+            for node, level in walkAccessibles(root)]
+
+def _load(fn):
+    return _nodes(accessible.Accessible.unmarshal(
+                                            etree.fromstring(_read(fn))))
+
+
+class DumpTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.device = FakeDevice(fanout=3, depth=3)
+        self.root = self.device.getAccessible(accessible.Path(), -1)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, name, root):
+        fn = os.path.join(self.dir, name)
+        DumpWriter(fn).write(walkAccessibles(root))
+        return fn
+
+    def testWrittenDumpIsMarshalledTree(self):
+        fn = self._write("dump.xml", self.root)
+        self.assertEqual(_load(fn), _nodes(self.root))
+
+    def testCompressedDumps(self):
+        plain = _read(self._write("dump.xml", self.root))
+        for ext in (".gz", ".bz2"):
+            self.assertEqual(_read(self._write("dump.xml" + ext, self.root)),
+                             plain)
+
+    def testSplitViews(self):
+        parts = splitAccessible(self.root)
+        self.assertEqual(splitAccessible(NodeTable(True).load(self.root)),
+                         parts)
+        # Views of tables without elements are marshalled from attributes
+        head, tail = splitAccessible(NodeTable(False).load(self.root))
+        element = etree.fromstring(head + tail)
+        self.assertEqual(element.get("path"), "/")
+        self.assertEqual(element.findtext("name"), "node-")
+        self.assertEqual(element.findall(".//accessible"), [])
+
+
+class DumpDeviceTest(DumpTest):
+    def setUp(self):
+        DumpTest.setUp(self)
+        self.fn = self._write("dump.xml", self.root)
+        self.dumpDevice = DumpDevice(self.fn)
+        self.dumpDevice.connect()
+
+    def tearDown(self):
+        self.dumpDevice.disconnect()
+        DumpTest.tearDown(self)
+
+    def testIndexIsBuiltOnce(self):
+        self.assertTrue(os.path.isfile(self.fn + ".idx"))
+        stamp = os.stat(self.fn + ".idx").st_mtime
+        device = DumpDevice(self.fn)
+        device.connect()
+        device.disconnect()
+        self.assertEqual(os.stat(self.fn + ".idx").st_mtime, stamp)
+
+    def testSubtree(self):
+        obj = self.dumpDevice.getAccessible(accessible.Path("1"), 1)
+        self.assertEqual([str(node.path) for node, level
+                          in walkAccessibles(obj)],
+                         ["/1", "/1/0", "/1/1", "/1/2"])
+        self.assertEqual(self.dumpDevice.getAccessible(accessible.Path("5")),
+                         None)
+
+    def testWriteDumpLoadedFromIndex(self):
+        root = self.dumpDevice.getAccessible(accessible.Path(), -1)
+        fn = self._write("copy.xml", root)
+        self.assertEqual(_load(fn), _nodes(self.root))
+
+    def testWriteDumpFetchedFromIndex(self):
+        table = NodeTable(elements=True)
+        fetcher = TreeFetcher(self.dumpDevice, 2, 1, table)
+        root = fetcher.fetch(accessible.Path(), all=True)
+        fn = self._write("copy.xml", root)
+        self.assertEqual(_load(fn), _nodes(self.root))
+
+    def testSaveDumpOfDump(self):
+        fn = os.path.join(self.dir, "copy.xml.gz")
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            status = explore.executeRequest(self.dumpDevice,
+                                            {"path": "/", "dump": "-1",
+                                             "output": fn, "parallel": 2})
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(status, 0)
+        self.assertEqual(_load(fn), _nodes(self.root))
+
+    def testReadOnly(self):
+        self.assertRaises(Exception, self.dumpDevice.doAccessible,
+                          accessible.Path("0"), "click")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from fetch import TreeFetcher
+from tree import walkAccessibles
+from nodetable import NodeTable
+from fakedevice import FakeDevice
+
+def _paths(obj, depth=-1, expand=None):
+    return [str(node.path) for node, level in
+            walkAccessibles(obj, depth, expand)]
+
+
+class TreeFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=3, depth=4)
+        self.expected = _paths(self.device.getAccessible(accessible.Path(),
+                                                         -1))
+
+    def testWholeTree(self):
+        for workers in (1, 4):
+            for chunkDepth in (1, 2, 3):
+                fetcher = TreeFetcher(self.device, workers, chunkDepth)
+                root = fetcher.fetch(accessible.Path())
+                self.assertEqual(_paths(root, expand=fetcher.expand),
+                                 self.expected)
+
+    def testNumberOfRequests(self):
+        fetcher = TreeFetcher(self.device, 2, 2)
+        fetcher.fetch(accessible.Path())
+        # The root subtree and subtrees of accessibles of the level 2
+        self.assertEqual(fetcher.requests, 1 + 3 ** 2)
+
+    def testDepth(self):
+        fetcher = TreeFetcher(self.device, 2, 1)
+        root = fetcher.fetch(accessible.Path(), 2)
+        self.assertEqual(_paths(root, 2, fetcher.expand),
+                         _paths(self.device.getAccessible(accessible.Path(),
+                                                          2)))
+        self.assertEqual(fetcher.requests, 1 + 3)
+
+    def testTable(self):
+        table = NodeTable()
+        fetcher = TreeFetcher(self.device, 3, 2, table)
+        root = fetcher.fetch(accessible.Path())
+        self.assertEqual(len(table), self.device.size())
+        self.assertEqual(_paths(root), self.expected)
+
+    def testNoSuchPath(self):
+        fetcher = TreeFetcher(self.device)
+        self.assertEqual(fetcher.fetch(accessible.Path("7")), None)
+
+    def testInvalidArguments(self):
+        self.assertRaises(ValueError, TreeFetcher, self.device, 0)
+        self.assertRaises(ValueError, TreeFetcher, self.device, 1, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.engine.testresult import TestCaseResult
+
+from history import ResultHistory
+from runchannels import HistoryChannel
+
+class _Device(object):
+    '''
+    A stand-in for a device result of a test case.
+    '''
+    def __init__(self, name, status):
+        self.name = name
+        self.status = status
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "store", "history.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testFailedInLastAttempt(self):
+        history = ResultHistory(self.file)
+        self.failUnless(os.path.isfile(self.file))
+        self.assertEqual(history.lastRun(), None)
+        run = history.startRun()
+        history.addResult(run, "t.a", "dev", "FAILED", 1.0)
+        history.addResult(run, "t.b", "dev", "FAILED", 1.0)
+        history.addResult(run, "t.c", "dev", "PASSED", 1.0)
+        history.addResult(run, "t.a", "dev", "PASSED", 1.0, attempt=1)
+        self.assertEqual(history.lastRun(), run)
+        self.assertEqual(history.failedTests(), ["t.b"])
+        history.close()
+
+    def testDurations(self):
+        history = ResultHistory(self.file)
+        run = history.startRun()
+        history.addResult(run, "t.a", "dev", "PASSED", 2.0)
+        history.addResult(run, "t.b", "dev", "ERROR", None)
+        history.addDuration("t.a", 4.0)
+        self.assertEqual(history.duration("t.a")[1], 1)
+        self.failUnless(2.0 < history.duration("t.a")[0] < 4.0)
+        # Durations of tests reported by crashed workers are unknown
+        self.assertEqual(history.duration("t.b"), (0.0, 0))
+        self.assertEqual(history.duration("t")[1], 1)
+        self.assertEqual(history.averageDuration(),
+                         history.duration("t.a")[0])
+        history.close()
+
+
+class HistoryChannelTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "history.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _execute(self, channel, test, status):
+        result = TestCaseResult(test)
+        device = _Device("dev", status)
+        channel.startTest(result, device)
+        channel.stopTest(result, device)
+
+    def testNotOpenUntilStarted(self):
+        channel = HistoryChannel("history", self.file)
+        channel.addUnreported("t.a", "dev", "ERROR")
+        self.failIf(os.path.exists(self.file))
+
+    def testRunnersStartedAfterOthersStopped(self):
+        channel = HistoryChannel("history", self.file)
+        channel.start(None)
+        self._execute(channel, "t.a", "FAILED")
+        channel.stop()
+        # A retry of the same run
+        channel.attempt = 1
+        channel.start(None)
+        self._execute(channel, "t.a", "PASSED")
+        channel.addUnreported("t.b", "dev", "ERROR")
+        channel.stop()
+        history = ResultHistory(self.file)
+        self.assertEqual(history.lastRun(), channel.run)
+        self.assertEqual(history.failedTests(), ["t.b"])
+        history.close()
+
+    def testSharedByRunners(self):
+        channel = HistoryChannel("history", self.file)
+        channel.start(None)
+        channel.start(None)
+        channel.stop()
+        self._execute(channel, "t.a", "FAILED")
+        channel.stop()
+        history = ResultHistory(self.file)
+        self.assertEqual(history.failedTests(), ["t.a"])
+        history.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
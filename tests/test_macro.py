@@ -0,0 +1,147 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import constants
+
+from macro import readMacro, replayMacro
+from explore import keyCode, MOUSE_EVENTS
+from utils import RequestError
+from fakedevice import FakeDevice
+
+class _RecordingDevice(FakeDevice):
+    '''
+    A fake device recording events sent to it.
+    '''
+    def __init__(self, *args, **kwargs):
+        FakeDevice.__init__(self, *args, **kwargs)
+        self.events = []
+
+    def mouseEvent(self, path, x, y, button, event):
+        FakeDevice.mouseEvent(self, path, x, y, button, event)
+        self.events.append((str(path), event, x, y, button))
+        return True
+
+    def keyboardEvent(self, path, keycode, modifiers=()):
+        FakeDevice.keyboardEvent(self, path, keycode, modifiers)
+        self.events.append((str(path), keycode, list(modifiers)))
+        return keycode != 0
+
+
+class KeyCodeTest(unittest.TestCase):
+    def testKeys(self):
+        self.assertEqual(keyCode("enter"), constants.KEY_SYMS["ENTER"])
+        self.assertEqual(keyCode("a"), ord('A'))
+        self.assertEqual(keyCode("0x41"), 0x41)
+        self.assertEqual(keyCode("65"), 65)
+        self.assertRaises(ValueError, keyCode, "nokey")
+
+    def testMouseEvents(self):
+        self.failUnless(("mouse-click", "CLICK") in MOUSE_EVENTS)
+
+
+class MacroTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "macro")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _read(self, text, typeInterval=0.0):
+        fd = open(self.file, 'w')
+        try:
+            fd.write(text)
+        finally:
+            fd.close()
+        return readMacro(self.file, typeInterval)
+
+    def testRead(self):
+        steps = self._read("# A comment\n"
+                           "\n"
+                           "0.1 mouse-click 10 20\n"
+                           "+0.0 path /0/1\n"
+                           "+0.1 key enter left_shift\n"
+                           "+0.1 type 'ab\\n'\n"
+                           "+0.05 mouse-release 1 2 right\n", 0.01)
+        self.assertEqual([round(offset, 3) for offset, event in steps],
+                         [0.1, 0.2, 0.3, 0.31, 0.32, 0.37])
+        self.assertEqual([event[0] for offset, event in steps],
+                         ["mouseEvent"] + ["keyboardEvent"] * 4 +
+                         ["mouseEvent"])
+        self.assertEqual(str(steps[0][1][1]), "/")
+        self.assertEqual(steps[0][1][2:], (10, 20, "LEFT", "CLICK"))
+        self.assertEqual(str(steps[1][1][1]), "/0/1")
+        self.assertEqual(steps[1][1][2:],
+                         (constants.KEY_SYMS["ENTER"],
+                          [constants.KEY_CODES["LEFT_SHIFT"]]))
+        # Typed text is sent as a keyboard event per character
+        self.assertEqual([event[2] for offset, event in steps[2:5]],
+                         [ord('a'), ord('b'), constants.KEY_SYMS["ENTER"]])
+        self.assertEqual(steps[5][1][2:], (1, 2, "RIGHT", "RELEASE"))
+
+    def testInvalidSteps(self):
+        for text in ("1.0\n", "1.0 path 0/1\n", "1.0 mouse-click 10\n",
+                     "1.0 mouse-click 1 2 middle\n", "1.0 key a nomod\n",
+                     "1.0 type a b\n", "1.0 scroll 1\n", "now key a\n"):
+            self.assertRaises(RequestError, self._read, text)
+
+    def testReplay(self):
+        device = _RecordingDevice()
+        steps = self._read("0.0 path /1\n"
+                           "0.0 key a\n"
+                           "+0.02 key 0x0\n"
+                           "+0.02 mouse-press 5 6\n")
+        results = replayMacro(device, steps)
+        self.assertEqual(device.events,
+                         [("/1", ord('A'), []), ("/1", 0, []),
+                          ("/1", "PRESS", 5, 6, "LEFT")])
+        self.assertEqual([status for delay, status in results],
+                         [True, False, True])
+        self.failUnless(max([delay for delay, status in results]) < 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+from cStringIO import StringIO
+from xml.etree import cElementTree as etree
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+import explore
+from tree import walkAccessibles
+from nodetable import NodeTable, NodeView
+from fakedevice import FakeDevice
+
+def _nodes(obj):
+    return [(str(node.path), node.name, node.role, node.count, level)
+            for node, level in walkAccessibles(obj)]
+
+
+class NodeTableTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=3, depth=3)
+        self.tree = self.device.getAccessible(accessible.Path(), -1)
+
+    def testLoad(self):
+        table = NodeTable()
+        root = table.load(self.tree)
+        self.failUnless(isinstance(root, NodeView))
+        self.assertEqual(len(table), self.device.size())
+        self.assertEqual(_nodes(root), _nodes(self.tree))
+        self.assertEqual(list(root.records()), _nodes(self.tree))
+
+    def testViews(self):
+        table = NodeTable()
+        root = table.load(self.tree)
+        node = list(list(root.children())[1].children())[0]
+        self.assertEqual(str(node.path), "/1/0")
+        self.assertEqual(node.name, "node-1-0")
+        self.assertEqual(node.level, 2)
+        self.assertEqual(node.states, ["ENABLED", "SHOWING", "VISIBLE",
+                                       "FOCUSABLE"])
+        # Other attributes are not stored without elements
+        self.assertEqual(node.description, None)
+        self.assertRaises(ValueError, node.elementParts)
+        self.assertRaises(AttributeError, getattr, node, "nosuchattr")
+
+    def testElements(self):
+        table = NodeTable(elements=True)
+        root = table.load(self.tree)
+        node = list(root.children())[2]
+        self.assertEqual(node.description, "Synthetic node-2")
+        self.assertEqual(etree.tostring(root.marshal()),
+                         etree.tostring(self.tree.marshal()))
+
+    def testSubtree(self):
+        table = NodeTable()
+        subtree = self.device.getAccessible(accessible.Path(2, 1), -1)
+        root = table.load(subtree, depth=0)
+        self.assertEqual(_nodes(root), [("/2/1", "node-2-1", "PANEL", 3, 0)])
+        # Nodes of many trees can be stored in one table
+        other = table.load(subtree)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(_nodes(other), _nodes(subtree))
+
+
+class DumpTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=3, depth=3)
+
+    def _dump(self, **options):
+        options.update({"path": "/", "dump-all": True})
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            status = explore.executeRequest(self.device, options)
+            return status, sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def testSingleRequest(self):
+        status, output = self._dump()
+        self.assertEqual(status, 0)
+        # A dump is fetched by a single request by default
+        self.assertEqual(self.device.requests, 1)
+        self.failUnless("node-2-2-2" in output)
+        self.failIf("requests" in output)
+
+    def testChunks(self):
+        status, output = self._dump(parallel="2", chunk_depth="1")
+        self.assertEqual(status, 0)
+        self.assertEqual(self.device.requests, 1 + 3 + 3 ** 2)
+        self.failUnless("Fetched in 13 requests" in output)
+        # The same tree is printed
+        self.failUnless(output.startswith(self._dump()[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
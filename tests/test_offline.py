@@ -0,0 +1,124 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from xml.etree import cElementTree as etree
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from tree import walkAccessibles
+from utils import RequestError
+from dumpfile import DumpWriter
+from offline import DumpIndex, loadAccessible
+from fakedevice import FakeDevice
+
+def _nodes(root):
+    return [(str(node.path), node.name, level)
+            for node, level in walkAccessibles(root)]
+
+
+class DumpIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.dir, "dump.xml.gz")
+        self.device = FakeDevice(fanout=3, depth=3)
+        self._write(self.device)
+        self.index = DumpIndex(self.fn)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir)
+
+    def _write(self, device):
+        root = device.getAccessible(accessible.Path(), -1)
+        DumpWriter(self.fn).write(walkAccessibles(root))
+
+    def testIndexReused(self):
+        self.index.open()
+        self.failUnless(self.index.isOpen())
+        self.assertEqual(self.index.root(), "/")
+        self.index.close()
+        inode = os.stat(self.index.indexFn).st_ino
+        self.index.open()
+        self.assertEqual(os.stat(self.index.indexFn).st_ino, inode)
+        self.failIf(os.path.exists(self.index.indexFn + ".tmp"))
+
+    def testIndexRebuilt(self):
+        self.index.open()
+        self.index.close()
+        self._write(FakeDevice(fanout=2, depth=2))
+        # Modification times in stamps of dumps are whole seconds
+        os.utime(self.fn, (0, 0))
+        self.index.open()
+        self.assertEqual(len(self.index.select(accessible.Path())), 7)
+
+    def testSelect(self):
+        self.index.open()
+        path = accessible.Path("1")
+        self.assertEqual([level for level, data in self.index.select(path)],
+                         [0, 1, 2, 2, 2, 1, 2, 2, 2, 1, 2, 2, 2])
+        self.assertEqual(len(self.index.select(path, 1)), 4)
+        selected = self.index.select(path, name="node-1-2-0")
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(selected[0][0], 2)
+        self.assertEqual(str(loadAccessible(selected[0][1]).path), "/1/2/0")
+        self.assertEqual(self.index.select(accessible.Path("3")), None)
+
+    def testSerialize(self):
+        self.index.open()
+        for path, depth in (((), -1), (("2",), 1), (("0", "1", "2"), 0)):
+            path = accessible.Path(*path)
+            expected = self.device.getAccessible(path, depth)
+            data = self.index.serialize(path, depth)
+            self.assertEqual(_nodes(loadAccessible(data)), _nodes(expected))
+            self.assertEqual(etree.fromstring(data).tag,
+                             expected.marshal().tag)
+        self.assertEqual(self.index.serialize(accessible.Path("9")), None)
+
+    def testMissingDump(self):
+        self.assertRaises(RequestError, DumpIndex(self.fn + ".xml").open)
+
+
+if __name__ == "__main__":
+    unittest.main()
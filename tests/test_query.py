@@ -0,0 +1,125 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from query import Query, findAccessibles, matchAccessibles, clearSnapshots
+from fakedevice import FakeDevice
+
+class _Desktop(FakeDevice):
+    '''
+    A fake device whose applications, at /0/N, are not showing like
+    real ones, and whose windows /0/N/1 are hidden with their contents.
+    '''
+    def _accessible(self, indexes, depth):
+        obj = FakeDevice._accessible(self, indexes, depth)
+        if len(indexes) == 2 or (len(indexes) >= 3 and indexes[2] == 1):
+            obj.states = [state for state in obj.states
+                          if state not in ("SHOWING", "VISIBLE")]
+        return obj
+
+
+def _paths(records):
+    return [str(record.path) for record in records]
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        clearSnapshots()
+
+    def testInvalidQueries(self):
+        for text in ('', "bogus", "depth~1", "depth=a", "role<PANEL"):
+            self.assertRaises(ValueError, Query, text)
+
+    def testMaxDepth(self):
+        self.assertEqual(Query("role=PANEL").maxDepth, -1)
+        self.assertEqual(Query("depth<=3 depth<2").maxDepth, 1)
+        self.assertEqual(Query("!depth<=3").maxDepth, -1)
+
+    def testFind(self):
+        device = FakeDevice(fanout=3, depth=3)
+        records = findAccessibles(device, accessible.Path("1"),
+                                  Query("name~^node-1-.-2$ role=push_button"))
+        self.assertEqual(_paths(records), ["/1/0/2", "/1/1/2", "/1/2/2"])
+        self.assertEqual([record.level for record in records], [2, 2, 2])
+        records = findAccessibles(device, accessible.Path(),
+                                  Query("state=FOCUSABLE depth=1"))
+        self.assertEqual(_paths(records), ["/0"])
+        self.assertEqual(findAccessibles(device, accessible.Path("7"),
+                                         Query("role=PANEL")), None)
+
+    def testApplicationsAreNotPruned(self):
+        device = _Desktop(fanout=2, depth=4)
+        records = findAccessibles(device, accessible.Path("0"),
+                                  Query("state=SHOWING depth=2"))
+        self.assertEqual(_paths(records), ["/0/0/0", "/0/1/0"])
+
+    def testHiddenWindowsArePruned(self):
+        device = _Desktop(fanout=2, depth=4)
+        query = Query("state=SHOWING")
+        window = device.getAccessible(accessible.Path("0", "0", "1"))
+        self.assertTrue(query.prune(window))
+        application = device.getAccessible(accessible.Path("0", "0"))
+        self.assertFalse(query.prune(application))
+        root = device.getAccessible(accessible.Path(), -1)
+        records = matchAccessibles(root, query)
+        self.assertEqual([path for path in _paths(records)
+                          if path.startswith("/0/0/1/")], [])
+        self.assertTrue("/0/0/0/1" in _paths(records))
+
+    def testSnapshotIsReused(self):
+        device = FakeDevice(fanout=2, depth=3)
+        query = Query("role=PUSH_BUTTON")
+        first = _paths(findAccessibles(device, accessible.Path(), query))
+        requests = device.requests
+        self.assertEqual(_paths(findAccessibles(device, accessible.Path(),
+                                                query)), first)
+        self.assertEqual(device.requests, requests)
+        clearSnapshots(device)
+        findAccessibles(device, accessible.Path(), query)
+        self.assertTrue(device.requests > requests)
+
+
+if __name__ == "__main__":
+    unittest.main()
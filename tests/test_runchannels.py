@@ -0,0 +1,227 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import threading
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.engine.testresult import TestCaseResult
+
+import runchannels
+from runchannels import StatusChannel, ProgressChannel, WatchdogChannel
+from runchannels import closeProgress, testStatus
+from fakedevice import FakeDevice
+
+class _Device(object):
+    '''
+    A stand-in for a device result of a test.
+    '''
+    def __init__(self, name, status):
+        self.name = name
+        self.status = status
+
+
+class _SuiteResult(object):
+    '''
+    A stand-in for a result of a test suite.
+    '''
+    def __init__(self, id):
+        self.id = id
+
+
+def _execute(channel, test, status, case=True):
+    result = TestCaseResult(test) if case else _SuiteResult(test)
+    device = _Device("dev", status)
+    channel.startTest(result, device)
+    channel.stopTest(result, device)
+
+
+class StatusChannelTest(unittest.TestCase):
+    def testStatuses(self):
+        channel = StatusChannel("status")
+        _execute(channel, "t.a", "FAILED")
+        _execute(channel, "t", "PASSED", case=False)
+        _execute(channel, "t.a", "PASSED")
+        channel.setUnreported("t.b", "dev", "NOT_COMPLETED", 3)
+        self.assertEqual(channel.statuses, {("t.a", "dev"): "PASSED",
+                                            ("t.b", "dev"): "NOT_COMPLETED"})
+        self.assertEqual(channel.unreported, 3)
+
+
+class ProgressChannelTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "progress")
+
+    def tearDown(self):
+        closeProgress()
+        shutil.rmtree(self.dir)
+
+    def _events(self):
+        fd = open(self.file)
+        try:
+            return [json.loads(line) for line in fd]
+        finally:
+            fd.close()
+
+    def testNotOpenUntilStarted(self):
+        ProgressChannel("progress", output=self.file)
+        closeProgress()
+        self.failIf(os.path.exists(self.file))
+
+    def testAttemptsShareOutput(self):
+        for attempt, status in enumerate(("FAILED", "PASSED")):
+            channel = ProgressChannel("progress", output=self.file)
+            channel.start(None)
+            _execute(channel, "t.a", status)
+            channel.stop()
+        closeProgress()
+        events = self._events()
+        self.assertEqual([event["event"] for event in events],
+                         ["run-start", "start", "finish", "run-stop"] * 2)
+        self.assertEqual([event["status"] for event in events
+                          if event["event"] == "finish"],
+                         ["FAILED", "PASSED"])
+        self.failUnless(events[2]["case"])
+        self.failUnless(events[2]["duration"] >= 0)
+        self.assertEqual(events[3]["dropped"], 0)
+
+
+class WatchdogChannelTest(unittest.TestCase):
+    def setUp(self):
+        self._interval = runchannels.WATCHDOG_INTERVAL
+        runchannels.WATCHDOG_INTERVAL = 0.05
+        # Aborted devices are reconnected to the address of the server
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(5)
+        self.device = FakeDevice("dev")
+        self.device.address = self.server.getsockname()
+        self.device.connect()
+        # A channel added before the watchdog gets statuses of aborted tests
+        self.status = StatusChannel("status")
+        self.watchdog = None
+
+    def tearDown(self):
+        runchannels.WATCHDOG_INTERVAL = self._interval
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.server.close()
+
+    def _start(self, **params):
+        self.watchdog = WatchdogChannel("watchdog", **params)
+        self.watchdog.setDevices([self.device])
+        self.watchdog.start(None)
+        self.result = TestCaseResult("t.a")
+        self.deviceResult = _Device("dev", None)
+        for channel in (self.status, self.watchdog):
+            channel.startTest(self.result, self.deviceResult)
+
+    def _stop(self, status):
+        self.deviceResult.status = status
+        for channel in (self.status, self.watchdog):
+            channel.stopTest(self.result, self.deviceResult)
+
+    def _wait(self, timeout):
+        deadline = time.time() + timeout
+        while self.device.isConnected() and time.time() < deadline:
+            time.sleep(0.01)
+        return not self.device.isConnected()
+
+    def testDeadline(self):
+        self._start(testTimeout=0.1)
+        self.failUnless(self._wait(1.0))
+        self._stop("ERROR")
+        self.assertEqual(testStatus(self.result, self.deviceResult),
+                         "NOT_COMPLETED")
+        self.assertEqual(self.status.statuses,
+                         {("t.a", "dev"): "NOT_COMPLETED"})
+        self.assertEqual([(test, status) for test, device, lost, status
+                          in self.watchdog.hangs],
+                         [("t.a", "ERROR")])
+        self.failUnless(self.device.isConnected())
+        self.assertEqual(self.watchdog.quarantined, [])
+        # The test is completed when it is run again
+        self._start()
+        self._stop("PASSED")
+        self.assertEqual(self.status.statuses, {("t.a", "dev"): "PASSED"})
+
+    def testNoPingsByDefault(self):
+        self._start()
+        self.device.latency = 0.2
+        self.failIf(self._wait(0.5))
+        self.watchdog.stop()
+        self.watchdog = None
+        self.failIf("getAccessible" in vars(self.device))
+
+    def testIdleDeviceMissingPings(self):
+        self._start(interval=0.05, misses=2)
+        self.device.latency = 0.2
+        self.failUnless(self._wait(2.0))
+        self._stop("ERROR")
+        self.assertEqual(self.status.statuses,
+                         {("t.a", "dev"): "NOT_COMPLETED"})
+
+    def testRequestInFlight(self):
+        self._start(interval=0.05, misses=2)
+        self.device.latency = 1.0
+        # A long request of the test delays pings, which are not missed
+        request = threading.Thread(target=self.device.getAccessible,
+                                   args=("/",))
+        request.start()
+        self.failIf(self._wait(0.8))
+        request.join()
+        self.device.latency = 0.0
+        self.failIf(self._wait(0.3))
+        self._stop("PASSED")
+        self.assertEqual(self.status.statuses, {("t.a", "dev"): "PASSED"})
+        self.watchdog.stop()
+        self.watchdog = None
+        self.failIf("getAccessible" in vars(self.device))
+
+
+if __name__ == "__main__":
+    unittest.main()
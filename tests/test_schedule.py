@@ -0,0 +1,104 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from history import ResultHistory
+from schedule import splitSuites, orderSuites
+from fakedevice import FakeDevice
+
+class _Suite(object):
+    '''
+    A stand-in for a test suite of the given number of test cases.
+    '''
+    def __init__(self, id, count):
+        self.id = id
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+class ScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.history = ResultHistory(":memory:")
+        self.devices = [FakeDevice("a"), FakeDevice("b")]
+
+    def tearDown(self):
+        self.history.close()
+
+    def _ids(self, shards):
+        return [(str(device), [suite.id for suite in suites])
+                for device, suites in shards]
+
+    def testSplitByCounts(self):
+        suites = [_Suite("s1", 1), _Suite("s2", 5), _Suite("s3", 3),
+                  _Suite("s4", 2)]
+        self.assertEqual(self._ids(splitSuites(suites, self.devices)),
+                         [("a", ["s2", "s1"]), ("b", ["s3", "s4"])])
+
+    def testSplitByDurations(self):
+        for test, duration in (("s1.a", 10.0), ("s1.b", 10.0),
+                               ("s2.a", 1.0), ("s3.a", 1.0)):
+            self.history.addDuration(test, duration)
+        suites = [_Suite("s1", 2), _Suite("s2", 3), _Suite("s3", 1)]
+        # Unknown test cases of s2 are estimated by the average duration
+        self.assertEqual(self._ids(splitSuites(suites, self.devices,
+                                               self.history)),
+                         [("a", ["s1"]), ("b", ["s2", "s3"])])
+
+    def testOrderByFailures(self):
+        for status in ("FAILED", "PASSED"):
+            run = self.history.startRun()
+            self.history.addResult(run, "s2.a", "a", status, 1.0)
+            self.history.addResult(run, "s3.a", "a", "PASSED", 1.0)
+        run = self.history.startRun()
+        self.history.addResult(run, "s1.a", "a", "ERROR", 1.0)
+        suites = [_Suite("s3", 1), _Suite("s2", 1), _Suite("s1", 1)]
+        # The recent error counts more than the flaky failure
+        self.assertEqual([suite.id for suite in orderSuites(suites,
+                                                            self.history)],
+                         ["s1", "s2", "s3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from cStringIO import StringIO
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+import session
+from fakedevice import FakeDevice
+
+class _RecordingServer(session.SessionServer):
+    '''
+    A session server which records requests instead of performing them.
+    '''
+    def perform(self, options):
+        self.options = options
+        return {"status": 0, "output": '', "errors": ''}
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "socket")
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def _serve(self, cls=session.SessionServer):
+        self.device = FakeDevice(fanout=2, depth=2)
+        self.server = cls(self.path, self.device)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+    def _send(self, options):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            status = session.sendRequest(self.path, options)
+            return status, sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def testRequestIsPerformedOnServerDevice(self):
+        self._serve()
+        status, output = self._send({"path": "/1", "dump": "1"})
+        self.assertEqual(status, 0)
+        self.assertTrue("node-1-1" in output)
+        self.assertTrue(self.device.isConnected())
+
+    def testNamesOfFilesAreMadeAbsolute(self):
+        self._serve(_RecordingServer)
+        self._send({"path": "/", "dump": "0", "output": "dump.xml",
+                    "set-text-file": os.path.join("texts", "a.txt")})
+        self.assertEqual(self.server.options["output"],
+                         os.path.abspath("dump.xml"))
+        self.assertEqual(self.server.options["set-text-file"],
+                         os.path.abspath(os.path.join("texts", "a.txt")))
+
+    def testNoServer(self):
+        self.assertRaises(session.explore.RequestError, self._send,
+                          {"path": "/"})
+
+
+if __name__ == "__main__":
+    unittest.main()
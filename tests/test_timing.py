@@ -0,0 +1,129 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+import timing
+from fakedevice import FakeDevice
+
+class TimingTest(unittest.TestCase):
+    def setUp(self):
+        # Spans are enabled without enable(), which would print a report
+        # at exit
+        self.dir = tempfile.mkdtemp()
+        timing._enabled = True
+        timing._spans.clear()
+        timing._stacks.clear()
+
+    def tearDown(self):
+        timing._enabled = False
+        timing._spans.clear()
+        timing._stacks.clear()
+        shutil.rmtree(self.dir)
+
+    def testDisabled(self):
+        timing._enabled = False
+        self.assertEqual(timing.begin("span"), None)
+        timing.end(None)
+        device = FakeDevice()
+        getAccessible = device.getAccessible
+        timing.instrumentDevice(device)
+        self.assertEqual(device.getAccessible, getAccessible)
+        self.assertEqual(timing._spans, {})
+
+    def testNestedSpans(self):
+        outer = timing.begin("outer")
+        timing.begin("inner")
+        timing.begin("innermost")
+        # Nested spans which were not ended are ended with the outer one
+        timing.end(outer)
+        timing.end(timing.begin("outer"))
+        self.assertEqual(sorted([(name, span[0]) for name, span
+                                 in timing._spans.iteritems()]),
+                         [("inner", 1), ("innermost", 1), ("outer", 2)])
+        self.assertEqual(sorted(timing._stacks), ["outer", "outer;inner",
+                                                  "outer;inner;innermost"])
+        calls, total, maximum = timing._spans["outer"]
+        self.failUnless(0 <= maximum <= total)
+
+    def testInstrumentedDevice(self):
+        device = FakeDevice(fanout=2, depth=2)
+        timing.instrumentDevice(device)
+        @timing.timed("dump")
+        def dump(path):
+            '''
+            Dumps the path.
+            '''
+            device.connect()
+            return device.getAccessible(path, -1)
+        self.assertEqual(dump.__name__, "dump")
+        self.assertEqual(dump.__doc__.strip(), "Dumps the path.")
+        self.assertEqual(dump(accessible.Path()).count, 2)
+        dump(accessible.Path("1"))
+        self.assertEqual(device.requests, 4)
+        self.assertEqual(dict([(name, span[0]) for name, span
+                               in timing._spans.iteritems()]),
+                         {"dump": 2, "connect": 2, "getAccessible": 2})
+        fn = os.path.join(self.dir, "spans.folded")
+        timing._writeStacks(fn)
+        fd = open(fn)
+        try:
+            lines = fd.read().splitlines()
+        finally:
+            fd.close()
+        self.assertEqual([line.split(' ')[0] for line in lines],
+                         ["dump", "dump;connect", "dump;getAccessible"])
+        fd = StringIO()
+        timing.printReport(fd)
+        report = fd.getvalue().splitlines()
+        self.assertEqual(report[2].split()[0], "SPAN")
+        self.assertEqual(report[3].split()[:2], ["dump", "2"])
+        self.assertEqual(len(report), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
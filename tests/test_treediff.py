@@ -0,0 +1,169 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from tree import walkAccessibles
+from dumpfile import DumpWriter
+from treediff import (CHANGE_INSERTED, CHANGE_REMOVED, CHANGE_MOVED,
+                      CHANGE_CHANGED, diffTrees, matchChildren,
+                      stableIndexes, performDiff)
+from fakedevice import FakeDevice
+
+def _changes(a, b):
+    return [(kind, nodeA and str(nodeA.path), nodeB and str(nodeB.path),
+             sorted(changes)) for kind, nodeA, nodeB, changes
+                                in diffTrees(a, b)]
+
+
+class TreeDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=3, depth=2)
+        self.a = self.device.getAccessible(accessible.Path(), -1)
+        self.b = self.device.getAccessible(accessible.Path(), -1)
+
+    def testIdenticalTrees(self):
+        self.assertEqual(_changes(self.a, self.b), [])
+
+    def testStableIndexes(self):
+        self.assertEqual(stableIndexes([]), set())
+        self.assertEqual(stableIndexes([(0, 0), (1, 1), (2, 2)]),
+                         set([0, 1, 2]))
+        self.assertEqual(stableIndexes([(0, 1), (1, 0), (2, 2)]),
+                         set([1, 2]))
+
+    def testMatchChildren(self):
+        children = self.a._fakeChildren
+        # A renamed child is matched by its role and position
+        renamed = self.device.getAccessible(accessible.Path("0"))
+        renamed.name = "renamed"
+        matched, removed, inserted = matchChildren(children,
+                                                   [children[2], renamed])
+        self.assertEqual((matched, removed, inserted), ([(1, 1), (2, 0)],
+                                                        [0], []))
+        matched, removed, inserted = matchChildren(children[:1], children)
+        self.assertEqual((matched, removed, inserted), ([(0, 0)], [],
+                                                        [1, 2]))
+
+    def testChanges(self):
+        children = self.b._fakeChildren
+        children[0].name = "renamed"
+        children[0].states = children[0].states + ["FOCUSED"]
+        children[0]._fakeChildren.append(FakeDevice(fanout=4, depth=2)
+                                    .getAccessible(accessible.Path("0", "3")))
+        grandchildren = children[1]._fakeChildren
+        grandchildren[0], grandchildren[1] = grandchildren[1], grandchildren[0]
+        del children[2]
+        self.assertEqual(_changes(self.a, self.b), [
+            (CHANGE_REMOVED, "/2", None, []),
+            (CHANGE_CHANGED, "/0", "/0", ["name", "states"]),
+            (CHANGE_INSERTED, None, "/0/3", []),
+            (CHANGE_MOVED, "/1/0", "/1/0", []),
+        ])
+
+    def testExpandedTrees(self):
+        root = self.device.getAccessible(accessible.Path(), 0)
+        expand = lambda node: self.device.getAccessible(node.path,
+                                                        1)._fakeChildren
+        self.assertEqual([change for change in diffTrees(self.a, root,
+                                                         expandB=expand)],
+                         [])
+        # The root and each of its children are expanded once
+        self.assertEqual(self.device.requests, 2 + 1 + 1 + 3)
+
+
+class PerformDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.device = FakeDevice(fanout=2, depth=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _diff(self, specs, format="text"):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            try:
+                performDiff(self.device, specs, format)
+            except SystemExit, exc:
+                return exc.code, sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def testLivePaths(self):
+        status, output = self._diff(("/0", "/1"), "json")
+        self.assertEqual(status, 1)
+        changes = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([(change["change"], change["old-path"],
+                           change["new-path"]) for change in changes], [
+            (CHANGE_CHANGED, "/0", "/1"),
+            (CHANGE_CHANGED, "/0/0", "/1/0"),
+            (CHANGE_CHANGED, "/0/1", "/1/1"),
+        ])
+        self.assertEqual(changes[0]["attributes"]["name"],
+                         ["node-0", "node-1"])
+
+    def testDumpAndLivePath(self):
+        fn = os.path.join(self.dir, "dump.xml")
+        root = self.device.getAccessible(accessible.Path(), -1)
+        DumpWriter(fn).write(walkAccessibles(root))
+        status, output = self._diff((fn, "/"))
+        self.assertEqual(status, 0)
+        self.failUnless("Inserted: 0, removed: 0, moved: 0, changed: 0"
+                        in output)
+        status, output = self._diff((fn + ":/1", "/0"))
+        self.assertEqual(status, 1)
+        self.failUnless(output.startswith("~ /1 -> /0 PANEL 'node-0': "))
+        self.failUnless("name: 'node-1' -> 'node-0'" in output)
+        self.failUnless("Inserted: 0, removed: 0, moved: 0, changed: 3"
+                        in output)
+
+
+if __name__ == "__main__":
+    unittest.main()
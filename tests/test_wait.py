@@ -0,0 +1,120 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from wait import Condition, waitFor
+from fakedevice import FakeDevice
+
+class ConditionTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=3, depth=4)
+        self.root = accessible.Path()
+
+    def _check(self, text, path=None):
+        self.device.requests = 0
+        met, records = Condition(text).check(self.device, path or self.root)
+        return met, [str(record.path) for record in records]
+
+    def testPaths(self):
+        self.assertEqual(self._check("exists", accessible.Path(1, 2)),
+                         (True, []))
+        self.assertEqual(self._check("gone", accessible.Path(1, 2)),
+                         (False, []))
+        self.assertEqual(self._check("exists", accessible.Path(5)),
+                         (False, []))
+        self.assertEqual(self.device.requests, 1)
+
+    def testFirstMatch(self):
+        # The first chunk of the tree contains the element
+        self.assertEqual(self._check("name=node-0-0"), (True, ["/0/0"]))
+        self.assertEqual(self.device.requests, 1)
+        self.assertEqual(self._check("role=push_button"),
+                         (True, ["/0/0/0/0"]))
+        self.assertEqual(self.device.requests, 2)
+        self.assertEqual(self._check("gone:role=push_button"),
+                         (False, ["/0/0/0/0"]))
+        self.assertEqual(self.device.requests, 2)
+
+    def testChunks(self):
+        self.assertEqual(self._check("name=node-2-2-2-2"),
+                         (True, ["/2/2/2/2"]))
+        # The root chunk and chunks of all 9 accessibles of the level 2,
+        # instead of a request per accessible
+        self.assertEqual(self.device.requests, 1 + 3 ** 2)
+
+    def testNotMatching(self):
+        self.assertEqual(self._check("gone:name=nosuchnode"), (True, []))
+        self.assertEqual(self._check("name=node-0-0-0 depth<=2"),
+                         (False, []))
+        # Deeper levels are not fetched
+        self.assertEqual(self.device.requests, 1)
+
+
+class WaitForTest(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice(fanout=2, depth=2)
+
+    def testMet(self):
+        met, records, elapsed, checks = waitFor(self.device,
+                                                accessible.Path(),
+                                                Condition("name=node-1"))
+        self.failUnless(met)
+        self.assertEqual([str(record.path) for record in records], ["/1"])
+        self.assertEqual(checks, 1)
+
+    def testTimeout(self):
+        met, records, elapsed, checks = waitFor(self.device,
+                                                accessible.Path(),
+                                                Condition("name=nosuchnode"),
+                                                0.1, 0.02)
+        self.failIf(met)
+        self.assertEqual(records, [])
+        self.failUnless(0.1 <= elapsed < 0.5)
+        # Intervals of 0.02, 0.04 and the remaining time
+        self.failUnless(3 <= checks <= 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
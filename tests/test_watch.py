@@ -0,0 +1,164 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import unittest
+from itertools import islice
+from cStringIO import StringIO
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.core import accessible
+
+from treediff import CHANGE_INSERTED, CHANGE_REMOVED, CHANGE_CHANGED
+from watch import TreeWatcher, performWatch
+from fakedevice import FakeDevice
+
+class _ChangingDevice(FakeDevice):
+    '''
+    A fake device which calls the given function of the device before the
+    request of the given number, and which serves no accessibles of missing
+    paths.
+    '''
+    def __init__(self, changeAt, change, **kwargs):
+        FakeDevice.__init__(self, **kwargs)
+        self.changeAt = changeAt
+        self.change = change
+        self.names = {}
+        self.missing = set()
+
+    def _accessible(self, indexes, depth):
+        obj = FakeDevice._accessible(self, indexes, depth)
+        obj.name = self.names.get(tuple(indexes), obj.name)
+        return obj
+
+    def getAccessible(self, path, depth=0, **attrs):
+        if self.requests + 1 == self.changeAt:
+            self.change(self)
+        if str(path) in self.missing:
+            self._request()
+            return None
+        return FakeDevice.getAccessible(self, path, depth, **attrs)
+
+
+def _paths(changes):
+    return [(kind, a and str(a.path), b and str(b.path))
+            for kind, a, b, attrs in changes]
+
+
+class TreeWatcherTest(unittest.TestCase):
+    def _watcher(self, device, path="/"):
+        watcher = TreeWatcher(device, accessible.Path(*path.split('/')[1:]),
+                              minInterval=0.001, maxInterval=0.004)
+        self.failUnless(watcher.start())
+        return watcher
+
+    def testStart(self):
+        device = FakeDevice(fanout=2, depth=2)
+        watcher = self._watcher(device)
+        self.assertEqual(watcher.count(), device.size())
+        self.assertEqual((watcher.requests, watcher.fetched),
+                         (1, device.size()))
+        # Leaves are watched through polls of their parents
+        self.assertEqual(len(watcher._queue), 3)
+        self.failIf(TreeWatcher(device, accessible.Path("5")).start())
+
+    def testChangedLeaf(self):
+        def rename(device):
+            device.names[(1, 0)] = "renamed"
+        device = _ChangingDevice(10, rename, fanout=2, depth=2)
+        watcher = self._watcher(device)
+        kind, a, b, attrs = watcher.changes().next()
+        self.assertEqual((kind, str(a.path), str(b.path)),
+                         (CHANGE_CHANGED, "/1/0", "/1/0"))
+        self.assertEqual(attrs, {"name": ("node-1-0", "renamed")})
+        self.assertEqual(watcher.requests, device.requests)
+        # Unchanged accessibles are polled less often
+        self.failUnless(watcher._root.interval > watcher.minInterval)
+        self.assertEqual(watcher._root.children[0].interval,
+                         watcher.maxInterval)
+
+    def testInsertedAccessibles(self):
+        def grow(device):
+            device.fanout = 3
+        device = _ChangingDevice(5, grow, fanout=2, depth=2)
+        watcher = self._watcher(device)
+        changes = _paths(islice(watcher.changes(), 6))
+        self.assertEqual(sorted(changes), [(CHANGE_INSERTED, None, path)
+                                           for path in ("/0/2", "/1/2", "/2",
+                                                        "/2/0", "/2/1",
+                                                        "/2/2")])
+
+    def testRemovedRoot(self):
+        def remove(device):
+            device.missing.add("/1")
+        device = _ChangingDevice(3, remove, fanout=2, depth=2)
+        watcher = self._watcher(device, "/1")
+        changes = watcher.changes()
+        self.assertEqual(_paths([changes.next()]),
+                         [(CHANGE_REMOVED, "/1", None)])
+        device.missing.clear()
+        self.assertEqual(_paths([changes.next()]),
+                         [(CHANGE_INSERTED, None, "/1")])
+
+
+class PerformWatchTest(unittest.TestCase):
+    def testInterrupted(self):
+        def interrupt(device):
+            raise KeyboardInterrupt()
+        def rename(device):
+            device.names[(0,)] = "renamed"
+            device.changeAt, device.change = device.changeAt + 2, interrupt
+        device = _ChangingDevice(4, rename, fanout=2, depth=1)
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            status = performWatch(device, accessible.Path(), interval=0.001)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(status, 0)
+        self.failUnless(output.startswith("Watching 3 accessibles of /\n"))
+        self.failUnless("name: 'node-0' -> 'renamed'" in output)
+        self.failUnless("Changes: 1 in " in output)
+        self.failUnless("Requests: 5, " in output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+################################################################################
+##                                                                            ##
+## This file is a part of TADEK.                                              ##
+##                                                                            ##
+## TADEK - Test Automation in a Distributed Environment                       ##
+## (http://tadek.comarch.com)                                                 ##
+##                                                                            ##
+## Copyright (C) 2011,2012 Comarch S.A.                                       ##
+## All rights reserved.                                                       ##
+##                                                                            ##
+## TADEK is free software for non-commercial purposes. For commercial ones    ##
+## we offer a commercial license. Please check http://tadek.comarch.com for   ##
+## details or write to tadek-licenses@comarch.com                             ##
+##                                                                            ##
+## You can redistribute it and/or modify it under the terms of the            ##
+## GNU General Public License as published by the Free Software Foundation,   ##
+## either version 3 of the License, or (at your option) any later version.    ##
+##                                                                            ##
+## TADEK is distributed in the hope that it will be useful,                   ##
+## but WITHOUT ANY WARRANTY; without even the implied warranty of             ##
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the              ##
+## GNU General Public License for more details.                               ##
+##                                                                            ##
+## You should have received a copy of the GNU General Public License          ##
+## along with TADEK bundled with this file in the file LICENSE.               ##
+## If not, see http://www.gnu.org/licenses/.                                  ##
+##                                                                            ##
+## Please notice that Contributor Agreement applies to any contribution       ##
+## you make to TADEK. The Agreement must be completed, signed and sent        ##
+## to Comarch before any contribution is made. You should have received       ##
+## a copy of Contribution Agreement along with TADEK bundled with this file   ##
+## in the file CONTRIBUTION_AGREEMENT.pdf or see http://tadek.comarch.com     ##
+## or write to tadek-licenses@comarch.com                                     ##
+##                                                                            ##
+################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(_DIR, os.pardir, "src"),
+                os.path.join(_DIR, os.pardir, "benchmarks")]
+
+from tadek.engine import channels
+from tadek.engine import testresult
+from tadek.engine.testexec import STATUS_NOT_COMPLETED
+
+from history import ResultHistory
+from runchannels import StatusChannel, HistoryChannel
+from workers import runWorkers
+from fakedevice import FakeDevice
+
+class _Suite(object):
+    '''
+    A stand-in for a loaded test suite of a single test case.
+    '''
+    def __init__(self, id):
+        self.id = id
+
+    def count(self):
+        return 1
+
+
+class WorkersTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "history.db")
+        channels.add("StatusChannel", "_status")
+        channels.add("HistoryChannel", "_history", history=self.file)
+        self.result = testresult.TestResult()
+        self.status = self.result.get(cls=StatusChannel)[0]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _run(self, shards):
+        return runWorkers([([FakeDevice(name)], [_Suite(id) for id in ids])
+                           for name, ids in shards],
+                          self.result, self.status)
+
+    def testMergeResults(self):
+        self.failIf(self._run([("d1", ["t.a", "t.b"]), ("d2", ["t.c"])]))
+        self.assertEqual(self.status.statuses,
+                         {("t.a", "d1"): "PASSED", ("t.b", "d1"): "FAILED",
+                          ("t.c", "d2"): "PASSED"})
+        self.assertEqual(self.status.unreported, 0)
+        # Results are recorded in the history once, by the parent process
+        run = self.result.get(cls=HistoryChannel)[0].run
+        history = ResultHistory(self.file)
+        self.assertEqual(history.lastRun(), run)
+        self.assertEqual(history.failedTests(run), ["t.b"])
+        self.assertEqual(history.duration("t")[1], 3)
+        history.close()
+
+    def testCrashedWorker(self):
+        self.failIf(self._run([("d1", ["t.a", "t.crash", "t.b"]),
+                               ("d2", ["t.c"])]))
+        self.assertEqual(self.status.statuses,
+                         {("t.a", "d1"): "PASSED",
+                          ("t.crash", "d1"): STATUS_NOT_COMPLETED,
+                          ("t.b", "d1"): STATUS_NOT_COMPLETED,
+                          ("t.c", "d2"): "PASSED"})
+        self.assertEqual(self.status.unreported, 1)
+        history = ResultHistory(self.file)
+        self.assertEqual(history.failedTests(), ["t.b", "t.crash"])
+        history.close()
+
+
+if __name__ == "__main__":
+    unittest.main()